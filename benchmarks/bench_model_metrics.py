@@ -0,0 +1,90 @@
+"""
+Benchmark the vectorized overall model metrics used by the dashboard against the
+original per-model loop (with its iterrows MAPE).
+
+The original loop is far too slow for the full synthetic frame, so it is timed and
+checked on a subsample and its full-size time is extrapolated.
+
+Usage:
+    python benchmarks/bench_model_metrics.py --rows 1000000 --models 50
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'dashboard'))
+
+from model_metrics import overall_metrics
+
+
+def make_results_frame(n_rows, n_models, nan_fraction=0.2, seed=0):
+    """Synthetic collated results: player_id, datetime, minutes and n_models prediction columns."""
+    rng = np.random.default_rng(seed)
+    minutes = rng.choice([0, 90, 45, 70, 10], size=n_rows, p=[0.4, 0.35, 0.1, 0.1, 0.05])
+    predictions = np.clip(minutes[:, None] + rng.normal(0, 20, (n_rows, n_models)), 0, 90)
+    predictions[rng.random((n_rows, n_models)) < nan_fraction] = np.nan
+    df = pd.DataFrame(predictions, columns=[f'model_{i}' for i in range(n_models)])
+    df.insert(0, 'minutes', minutes)
+    df.insert(0, 'datetime', pd.Timestamp('2023-08-01') + pd.to_timedelta(rng.integers(0, 700, n_rows), unit='D'))
+    df.insert(0, 'player_id', rng.integers(1, 800, n_rows))
+    return df
+
+
+def overall_metrics_loop(df, model_columns):
+    """The original dashboard implementation, kept as the reference."""
+    overall_performance = []
+    for model_col in model_columns:
+        valid_data = df.dropna(subset=['minutes', model_col])
+        if len(valid_data) > 0:
+            mae = abs(valid_data['minutes'] - valid_data[model_col]).mean()
+            rmse = ((valid_data['minutes'] - valid_data[model_col]) ** 2).mean() ** 0.5
+            mape_values = []
+            for idx, row in valid_data.iterrows():
+                if row['minutes'] != 0:
+                    mape_values.append(abs((row['minutes'] - row[model_col]) / row['minutes']) * 100)
+            mape = sum(mape_values) / len(mape_values) if mape_values else float('inf')
+            ss_res = ((valid_data['minutes'] - valid_data[model_col]) ** 2).sum()
+            ss_tot = ((valid_data['minutes'] - valid_data['minutes'].mean()) ** 2).sum()
+            r_squared = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0
+            correlation = valid_data['minutes'].corr(valid_data[model_col])
+            overall_performance.append({
+                'Model': model_col, 'MAE': mae, 'RMSE': rmse, 'MAPE (%)': mape,
+                'R²': r_squared, 'Correlation': correlation, 'Data Points': len(valid_data)
+            })
+    return pd.DataFrame(overall_performance)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark overall model metrics.')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Rows in the synthetic frame.')
+    parser.add_argument('--models', type=int, default=50, help='Model columns in the synthetic frame.')
+    parser.add_argument('--reference_rows', type=int, default=20_000, help='Rows used to time the original loop.')
+    parser.add_argument('--reference_models', type=int, default=3, help='Models used to time the original loop.')
+    args = parser.parse_args()
+
+    df = make_results_frame(args.rows, args.models)
+    model_columns = [col for col in df.columns if col.startswith('model_')]
+
+    # Check and time the original loop on a subsample
+    sample = df.iloc[:args.reference_rows]
+    sample_models = model_columns[:args.reference_models]
+    start = time.perf_counter()
+    expected = overall_metrics_loop(sample, sample_models)
+    t_loop = time.perf_counter() - start
+    result = overall_metrics(sample, sample_models)
+    for col in ['MAE', 'RMSE', 'MAPE (%)', 'R²', 'Correlation', 'Data Points']:
+        assert np.allclose(expected[col].astype(float), result[col].astype(float)), col
+    t_loop_full = t_loop * (args.rows / args.reference_rows) * (args.models / args.reference_models)
+
+    start = time.perf_counter()
+    overall_metrics(df, model_columns)
+    t_vectorized = time.perf_counter() - start
+
+    print(f"Frame: {args.rows:,} rows x {args.models} models")
+    print(f"Original loop: {t_loop:.2f}s on {args.reference_rows:,} rows x {args.reference_models} models "
+          f"(~{t_loop_full:.0f}s extrapolated to the full frame)")
+    print(f"Vectorized:    {t_vectorized:.2f}s on the full frame")
@@ -0,0 +1,83 @@
+"""
+Benchmark the vectorized rolling-feature engine against the original groupby-lambda
+implementation of utils.last_weeks_avg.
+
+The 2024/25 player minutes file is replicated to simulate ten seasons of data.
+
+Usage:
+    python benchmarks/bench_rolling_features.py --seasons 10
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from rolling_features import rolling_features
+from utils import last_weeks_avg
+
+DATA_FILE = os.path.join(os.path.dirname(__file__), '..', 'data_from_airsenal',
+                         'player_minutes_with_extra_columns_2425.csv')
+
+
+def last_weeks_avg_groupby(df, weeks=5):
+    """The original groupby-lambda implementation, kept as the reference."""
+    df = df.sort_values(['player', 'week', 'date'])
+    df[f'avg_weeks_last_{weeks}_mean'] = df.groupby('player')['minutes'].transform(
+        lambda x: x.shift(1).rolling(window=weeks, min_periods=1).mean())
+    df[f'avg_weeks_last_{weeks}_median'] = df.groupby('player')['minutes'].transform(
+        lambda x: x.shift(1).rolling(window=weeks, min_periods=1).median())
+    return df
+
+
+def load_scaled_data(n_seasons):
+    """Replicate one season n_seasons times, numbering weeks consecutively."""
+    season = pd.read_csv(DATA_FILE, index_col=0)
+    frames = []
+    for i in range(n_seasons):
+        frame = season.copy()
+        frame['season'] = i
+        frame['week'] = frame['week'] + 38 * i
+        frames.append(frame)
+    df = pd.concat(frames, ignore_index=True)
+    df['date'] = pd.Timestamp('2015-08-01') + pd.to_timedelta(df['week'] * 7, unit='D')
+    return df
+
+
+def time_it(func, repeat=3):
+    """Best wall time over `repeat` calls, plus the last result."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark rolling feature computation.')
+    parser.add_argument('--seasons', type=int, default=10, help='Number of seasons to simulate.')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions per measurement.')
+    args = parser.parse_args()
+
+    df = load_scaled_data(args.seasons)
+    print(f"Rows: {len(df):,}, players: {df['player'].nunique():,}")
+
+    t_old, old = time_it(lambda: last_weeks_avg_groupby(df.copy()), args.repeat)
+    t_new, new = time_it(lambda: last_weeks_avg(df.copy()), args.repeat)
+    for col in ['avg_weeks_last_5_mean', 'avg_weeks_last_5_median']:
+        assert np.allclose(old[col].to_numpy(), new[col].to_numpy(), equal_nan=True), col
+    print(f"last_weeks_avg (groupby-lambda): {t_old:.3f}s")
+    print(f"last_weeks_avg (vectorized):     {t_new:.3f}s  ({t_old / t_new:.1f}x)")
+
+    columns = ['minutes', 'xG', 'xA', 'bps']
+    windows = [3, 5, 10, 'season']
+    stats = ['mean', 'median', 'std', 'sum']
+    t_all, features = time_it(lambda: rolling_features(df, columns, windows, stats,
+                                                       order_cols=['week', 'date']), args.repeat)
+    n_features = len(columns) * len(windows) * len(stats)
+    print(f"rolling_features, {n_features} features: {t_all:.3f}s")
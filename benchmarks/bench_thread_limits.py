@@ -0,0 +1,75 @@
+"""
+Benchmark experiment throughput for combinations of worker processes and threads per
+worker, including the unlimited default where every worker's BLAS uses all cores.
+
+Each task mimics the ridge stage of an experiment (a Gram matrix and a linear solve
+on a ROCKET-sized feature matrix), so it is dominated by multi-threaded BLAS.
+
+Usage:
+    python benchmarks/bench_thread_limits.py --tasks 16 --rows 4000 --features 2000
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from parallel_resources import available_cores, make_executor
+
+
+def ridge_task(seed, n_rows, n_features):
+    """Fit a ridge regression on random features; returns the sum of the weights."""
+    rng = np.random.default_rng(seed)
+    X = rng.standard_normal((n_rows, n_features))
+    y = rng.standard_normal(n_rows)
+    gram = X.T @ X + np.eye(n_features)
+    return float(np.linalg.solve(gram, X.T @ y).sum())
+
+
+def run_combination(n_workers, n_threads, n_tasks, n_rows, n_features):
+    """Seconds to run n_tasks tasks with n_workers processes of n_threads threads (None: no limit)."""
+    if n_threads is None:
+        executor = ProcessPoolExecutor(max_workers=n_workers)
+    else:
+        executor = make_executor(n_workers, n_threads)
+
+    with executor:
+        # Start the workers before timing
+        list(executor.map(ridge_task, range(n_workers), [10] * n_workers, [10] * n_workers))
+        start = time.perf_counter()
+        list(executor.map(ridge_task, range(n_tasks), [n_rows] * n_tasks, [n_features] * n_tasks))
+        return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=16, help="Number of tasks per combination")
+    parser.add_argument('--rows', type=int, default=4000, help="Rows of each task's feature matrix")
+    parser.add_argument('--features', type=int, default=2000, help="Columns of each task's feature matrix")
+    args = parser.parse_args()
+
+    n_cores = available_cores()
+    workers_options = sorted({1, 2, 4, n_cores})
+    print(f"{n_cores} cores, {args.tasks} tasks of {args.rows} x {args.features}\n")
+
+    rows = []
+    for n_workers in workers_options:
+        threads_options = sorted({1, max(1, n_cores // n_workers), n_cores})
+        for n_threads in threads_options + [None]:
+            seconds = run_combination(n_workers, n_threads, args.tasks, args.rows, args.features)
+            rows.append({
+                'workers': n_workers,
+                'threads per worker': 'unlimited' if n_threads is None else n_threads,
+                'total threads': n_workers * (n_cores if n_threads is None else n_threads),
+                'seconds': round(seconds, 2),
+                'tasks/s': round(args.tasks / seconds, 2),
+            })
+            print(rows[-1])
+
+    results = pd.DataFrame(rows).sort_values('tasks/s', ascending=False)
+    print("\n" + results.to_string(index=False))
@@ -0,0 +1,295 @@
+"""
+Benchmark suite for the hot paths of the minutes-prediction pipeline.
+
+Every benchmark runs at several data scales (see synthetic.SCALES) and its timings
+are saved as JSON under benchmarks/results/, one file per commit and machine, in
+the spirit of asv. Two result files (or commits) can then be compared to spot
+regressions.
+
+Usage:
+    python benchmarks/run_benchmarks.py                        # run everything, save results
+    python benchmarks/run_benchmarks.py -b rolling collate -s season
+    python benchmarks/run_benchmarks.py --compare HEAD~1 HEAD  # compare two saved commits
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'dashboard'))
+sys.path.insert(0, os.path.join(ROOT, 'results'))
+
+import synthetic
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# name -> (setup function, scales); setup(scale) prepares the inputs and returns the
+# function to time, so data generation is not part of the measurement
+BENCHMARKS = {}
+
+
+def benchmark(name, scales=tuple(synthetic.SCALES)):
+    """Register a benchmark setup function under `name`."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, list(scales))
+        return setup
+    return register
+
+
+@benchmark('features.last_weeks_avg')
+def setup_last_weeks_avg(scale):
+    from utils import last_weeks_avg
+    df = synthetic.player_minutes_frame(scale)
+    return lambda: last_weeks_avg(df, weeks=5)
+
+
+@benchmark('features.rolling_features')
+def setup_rolling_features(scale):
+    from rolling_features import rolling_features
+    df = synthetic.player_minutes_frame(scale)
+    return lambda: rolling_features(df, ['minutes', 'xG', 'bps'], [3, 5, 10, 'season'],
+                                    ['mean', 'median', 'std', 'sum'], order_cols=['week', 'date'])
+
+
+@benchmark('features.training_windows')
+def setup_training_windows(scale):
+    from training_windows import build_training_dictionaries
+    df = synthetic.player_minutes_frame(scale)
+    return lambda: build_training_dictionaries(df, 20, ['minutes', 'xg', 'bonus'], order_cols=['season', 'week'])
+
+
+@benchmark('rocket.fit_predict', scales=['team_season', 'season'])
+def setup_rocket(scale):
+    from apply_rocket import fit_predict_rocket
+    X, y = synthetic.lag_windows(scale, window_length=20 if scale != 'team_season' else 10)
+    n_train = int(len(y) * 0.8)
+    return lambda: fit_predict_rocket(X[:n_train], y[:n_train], X[n_train:], rocket_model='minirocket',
+                                      num_kernels=1000, random_state=42)
+
+
+@benchmark('rocket.ridge_head', scales=['team_season', 'season', 'seasons_3'])
+def setup_ridge_head(scale):
+    from rocket_cache import fit_predict_ridge
+    rng = np.random.default_rng(0)
+    _, y = synthetic.lag_windows(scale)
+    n_train = int(len(y) * 0.8)
+    F = rng.standard_normal((len(y), 500))
+    return lambda: fit_predict_ridge(F[:n_train], y[:n_train], F[n_train:])
+
+
+@benchmark('collate.run', scales=['team_season', 'season', 'seasons_3'])
+def setup_collate_run(scale):
+    from collate_results import run
+    directory = tempfile.mkdtemp(prefix='bench_collate_')
+    synthetic.write_model_files(directory, scale, n_models=5)
+    return lambda: run(directory)
+
+
+@benchmark('collate.streaming')
+def setup_collate_streaming(scale):
+    from collate_results import collate_streaming
+    directory = tempfile.mkdtemp(prefix='bench_collate_')
+    synthetic.write_model_files(directory, scale, n_models=5)
+    output = os.path.join(directory, 'collated.out')
+    return lambda: collate_streaming(directory, output, max_workers=1)
+
+
+@benchmark('metrics.overall_metrics')
+def setup_overall_metrics(scale):
+    from model_metrics import overall_metrics
+    df = synthetic.results_frame(scale, n_models=20)
+    model_columns = [col for col in df.columns if col.startswith('model_')]
+    return lambda: overall_metrics(df, model_columns)
+
+
+@benchmark('metrics.grouped_metrics')
+def setup_grouped_metrics(scale):
+    from model_metrics import grouped_metrics
+    df = synthetic.results_frame(scale, n_models=20)
+    model_columns = [col for col in df.columns if col.startswith('model_')]
+    return lambda: grouped_metrics(df, model_columns, 'player_id')
+
+
+@benchmark('metrics.bootstrap_comparison')
+def setup_bootstrap_comparison(scale):
+    from model_comparison import compare_models
+    df = synthetic.results_frame(scale, n_models=20)
+    model_columns = [col for col in df.columns if col.startswith('model_')]
+    return lambda: compare_models(df, model_columns, cluster='player_id', n_resamples=2000)
+
+
+def time_function(func, min_repeat=3, max_repeat=20, target_seconds=1.0):
+    """
+    Time func like asv: one warm-up call, then repeats until min_repeat calls and
+    target_seconds have passed (at most max_repeat calls).
+
+    Returns:
+    dict: min, median and max seconds and the number of timed calls.
+    """
+    func()
+    times = []
+    total = 0.0
+    while len(times) < max_repeat and (len(times) < min_repeat or total < target_seconds):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        times.append(elapsed)
+        total += elapsed
+        # Slow benchmarks are timed once after the warm-up
+        if elapsed > target_seconds:
+            break
+    return {'min': min(times), 'median': float(np.median(times)), 'max': max(times), 'repeat': len(times)}
+
+
+def run_benchmarks(names=None, scales=None, min_repeat=3):
+    """
+    Run the selected benchmarks at the selected scales.
+
+    A benchmark whose optional dependency (e.g. sktime) is missing is recorded as
+    skipped instead of failing the run.
+
+    Returns:
+    list: One result dict per benchmark and scale.
+    """
+    results = []
+    for name, (setup, bench_scales) in BENCHMARKS.items():
+        if names and not any(name.startswith(n) or n in name for n in names):
+            continue
+        for scale in bench_scales:
+            if scales and scale not in scales:
+                continue
+            result = {'benchmark': name, 'scale': scale}
+            try:
+                result.update(time_function(setup(scale), min_repeat=min_repeat), status='ok')
+                print(f"{name:32s} {scale:12s} {result['min']:10.4f}s  (median {result['median']:.4f}s, "
+                      f"n={result['repeat']})")
+            except ImportError as e:
+                result.update(status='skipped', error=str(e))
+                print(f"{name:32s} {scale:12s}    skipped: {e}")
+            except Exception as e:
+                result.update(status='error', error=str(e))
+                print(f"{name:32s} {scale:12s}      error: {e}")
+            results.append(result)
+    return results
+
+
+def git_commit(ref='HEAD'):
+    """Short hash of a git ref, or 'unknown' outside a repository."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', ref], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return 'unknown'
+
+
+def machine_info():
+    """Machine description stored with the results; only like-for-like machines should be compared."""
+    return {
+        'machine': platform.node(),
+        'processor': platform.processor() or platform.machine(),
+        'cores': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+    }
+
+
+def save_results(results, results_dir=RESULTS_DIR):
+    """
+    Write results to <results_dir>/<commit>_<machine>.json and return the path.
+
+    Results already saved for the same commit and machine are kept, except for the
+    benchmarks and scales that were run again, so partial runs add up.
+    """
+    os.makedirs(results_dir, exist_ok=True)
+    info = machine_info()
+    commit = git_commit()
+    dirty = subprocess.run(['git', 'diff', '--quiet', 'HEAD'], cwd=ROOT).returncode != 0
+    path = os.path.join(results_dir, f"{commit}{'-dirty' if dirty else ''}_{info['machine']}.json")
+
+    if os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)['results']
+        rerun = {(r['benchmark'], r['scale']) for r in results}
+        results = [r for r in previous if (r['benchmark'], r['scale']) not in rerun] + results
+
+    with open(path, 'w') as f:
+        json.dump({'commit': commit, 'dirty': dirty, 'date': datetime.now().isoformat(),
+                   'info': info, 'results': results}, f, indent=2)
+    return path
+
+
+def find_results(ref, results_dir=RESULTS_DIR):
+    """Result file of a path, or of a git ref (the newest file saved for that commit)."""
+    if os.path.exists(ref):
+        return ref
+    commit = git_commit(ref)
+    paths = sorted(glob.glob(os.path.join(results_dir, f'{commit}*.json')), key=os.path.getmtime)
+    if not paths:
+        raise FileNotFoundError(f"No benchmark results for {ref} ({commit}) in {results_dir}")
+    return paths[-1]
+
+
+def compare_results(before_path, after_path, threshold=1.1):
+    """
+    Compare the minimum times of two result files.
+
+    Parameters:
+    before_path, after_path (str): Result JSON files.
+    threshold (float): Ratio above which a benchmark counts as slower (below 1/threshold: faster).
+
+    Returns:
+    pd.DataFrame: before/after seconds, ratio and a change flag per benchmark and scale.
+    """
+    frames = []
+    for path in (before_path, after_path):
+        with open(path) as f:
+            data = json.load(f)
+        df = pd.DataFrame(data['results'])
+        df = df[df['status'] == 'ok'].set_index(['benchmark', 'scale'])['min']
+        frames.append(df)
+
+    comparison = pd.concat(frames, axis=1, keys=['before', 'after']).dropna()
+    comparison['ratio'] = comparison['after'] / comparison['before']
+    comparison['change'] = np.select([comparison['ratio'] > threshold, comparison['ratio'] < 1 / threshold],
+                                     ['slower', 'faster'], '')
+    return comparison
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run or compare the pipeline benchmarks.")
+    parser.add_argument("--bench", "-b", nargs="+", default=None,
+                        help=f"Benchmarks to run (name or prefix): {', '.join(BENCHMARKS)}")
+    parser.add_argument("--scales", "-s", nargs="+", default=None, choices=list(synthetic.SCALES),
+                        help="Data scales to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Minimum timed calls per benchmark")
+    parser.add_argument("--no_save", action="store_true", help="Print the timings without saving them")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), default=None,
+                        help="Compare two result files or git refs instead of running")
+    parser.add_argument("--threshold", type=float, default=1.1, help="Ratio reported as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        before, after = (find_results(ref) for ref in args.compare)
+        comparison = compare_results(before, after, args.threshold)
+        print(f"{before} -> {after}\n")
+        print(comparison.round(4).to_string())
+        n_slower = (comparison['change'] == 'slower').sum()
+        print(f"\n{n_slower} slower, {(comparison['change'] == 'faster').sum()} faster "
+              f"(threshold {args.threshold}x)")
+        sys.exit(1 if n_slower else 0)
+
+    results = run_benchmarks(args.bench, args.scales, args.repeat)
+    if not args.no_save:
+        print(f"\nSaved results to {save_results(results)}")
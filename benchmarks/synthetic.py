@@ -0,0 +1,143 @@
+"""
+Synthetic data for the benchmark suite, at scales from one team-season to ten
+seasons of every team and position.
+
+All generators are deterministic for a given scale and seed, so timings of
+different commits are measured on identical inputs.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# scale -> (seasons, teams, players per team)
+SCALES = {
+    'team_season': (1, 1, 25),
+    'season': (1, 20, 25),
+    'seasons_3': (3, 20, 25),
+    'seasons_10': (10, 20, 25),
+}
+
+POSITIONS = ['GK', 'DEF', 'MID', 'FWD']
+TEAMS = ['ARS', 'AVL', 'BHA', 'BOU', 'BRE', 'CHE', 'CRY', 'EVE', 'FUL', 'IPS',
+         'LEI', 'LIV', 'MCI', 'MUN', 'NEW', 'NFO', 'SOU', 'TOT', 'WHU', 'WOL']
+N_WEEKS = 38
+
+
+def player_minutes_frame(scale='season', seed=0):
+    """
+    Per-player, per-week frame in the player_minutes_with_extra_columns layout.
+
+    Each player has a 'regularity' so minutes are mostly 0 or 90 with some
+    substitute appearances, like the real data.
+
+    Parameters:
+    scale (str): Key of SCALES.
+    seed (int): Random seed.
+
+    Returns:
+    pd.DataFrame: One row per player per week, plus player_id, position and date.
+    """
+    n_seasons, n_teams, n_players = SCALES[scale]
+    rng = np.random.default_rng(seed)
+
+    n_team_players = n_teams * n_players
+    player = np.arange(n_team_players)
+    team = player // n_players
+    # Squad of 3 GK, 8 DEF, 8 MID and 6 FWD per team
+    position = np.resize(np.repeat(POSITIONS, [3, 8, 8, 6]), n_players)[player % n_players]
+    regularity = rng.beta(1.2, 1.0, n_team_players)
+
+    season_idx, player_idx, week = (a.ravel() for a in np.meshgrid(
+        np.arange(n_seasons), player, np.arange(1, N_WEEKS + 1), indexing='ij'))
+    n_rows = len(week)
+
+    plays = rng.random(n_rows) < regularity[player_idx]
+    sub = rng.random(n_rows) < 0.15
+    minutes = np.where(plays, np.where(sub, rng.integers(1, 45, n_rows), 90), 0)
+    played = minutes > 0
+
+    opponent = (team[player_idx] + week) % max(n_teams, 2)
+    opponent = np.where(opponent == team[player_idx], (opponent + 1) % len(TEAMS), opponent)
+    season = 1516 + 101 * season_idx
+
+    return pd.DataFrame({
+        'season': season,
+        'team': np.array(TEAMS)[team[player_idx]],
+        'week': week,
+        'opponent': np.array(TEAMS)[opponent],
+        'home_or_away': np.where(week % 2 == 0, 'home', 'away'),
+        'player': np.char.add('Player ', player_idx.astype(str)),
+        'injured_or_suspended': (~plays) & (rng.random(n_rows) < 0.3),
+        'reason': np.where((~plays) & (rng.random(n_rows) < 0.3), 'injury', 'n/a'),
+        'minutes': minutes,
+        'xG': np.round(played * rng.exponential(0.1, n_rows), 2),
+        'xA': np.round(played * rng.exponential(0.08, n_rows), 2),
+        'xGC': np.round(played * rng.exponential(0.6, n_rows), 2),
+        'bps': played * rng.integers(-3, 40, n_rows),
+        'goals': played * rng.poisson(0.1, n_rows),
+        'assists': played * rng.poisson(0.08, n_rows),
+        'goals_conceded': played * rng.poisson(1.2, n_rows),
+        'player_id': player_idx + 1,
+        'position': position[player_idx],
+        'date': pd.Timestamp('2015-08-08') + pd.to_timedelta((season_idx * 52 + week) * 7, unit='D'),
+    })
+
+
+def lag_windows(scale='season', window_length=5, seed=0):
+    """
+    Minutes lag windows and targets of the synthetic history (all positions).
+
+    Returns:
+    tuple: (X, y) float64 arrays of shape (n, window_length) and (n,).
+    """
+    df = player_minutes_frame(scale, seed).sort_values(['player_id', 'season', 'week'])
+    minutes = df['minutes'].to_numpy(dtype=np.float64).reshape(-1, N_WEEKS)
+    windows = np.lib.stride_tricks.sliding_window_view(minutes, window_length + 1, axis=1)
+    windows = windows.reshape(-1, window_length + 1)
+    return np.ascontiguousarray(windows[:, :-1]), np.ascontiguousarray(windows[:, -1])
+
+
+def results_frame(scale='season', n_models=10, nan_fraction=0.1, seed=0):
+    """
+    Collated results in the dashboard layout: player_id, datetime, minutes and n_models predictions.
+
+    Returns:
+    pd.DataFrame: One row per player per week.
+    """
+    rng = np.random.default_rng(seed + 1)
+    df = player_minutes_frame(scale, seed)
+    minutes = df['minutes'].to_numpy(dtype=np.float64)
+    predictions = np.clip(minutes[:, None] + rng.normal(0, 20, (len(df), n_models)), 0, 90)
+    predictions[rng.random(predictions.shape) < nan_fraction] = np.nan
+
+    results = pd.DataFrame(predictions, columns=[f'model_{i}' for i in range(n_models)])
+    results.insert(0, 'minutes', df['minutes'].to_numpy())
+    results.insert(0, 'datetime', df['date'].dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy())
+    results.insert(0, 'player_id', df['player_id'].to_numpy())
+    return results
+
+
+def write_model_files(directory, scale='season', n_models=5, seed=0):
+    """
+    Write one CSV per model in the layout read by results/collate_results.py.
+
+    Each file holds an index, player_id, datetime, minutes and 'predmin', in its own
+    row order and missing some rows, like files produced by different people.
+
+    Returns:
+    list: Paths of the written files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = np.random.default_rng(seed + 2)
+    results = results_frame(scale, n_models, nan_fraction=0.0, seed=seed)
+
+    paths = []
+    for i in range(n_models):
+        keep = rng.random(len(results)) > 0.05
+        df = results.loc[keep, ['player_id', 'datetime', 'minutes', f'model_{i}']]
+        df = df.rename(columns={f'model_{i}': 'predmin'}).sample(frac=1, random_state=i)
+        path = os.path.join(directory, f'model_{i}.csv')
+        df.reset_index(drop=True).to_csv(path)
+        paths.append(path)
+    return paths
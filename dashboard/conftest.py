@@ -0,0 +1,11 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'results'))
+sys.path.insert(0, os.path.join(ROOT, 'dashboard'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# A Streamlit app (run with `streamlit run`), not a pytest module
+collect_ignore = ['test_dashboard.py']
@@ -1,60 +1,159 @@
+import hashlib
+import io
+import os
+import sys
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import streamlit as st
 
+from model_comparison import compare_models
+from model_metrics import gameweek_start, grouped_metrics, model_leaderboard, overall_metrics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from schema import compact_frame
+
+# Parsed uploads are kept in memory; limit how many distinct files are cached
+MAX_CACHED_FILES = 4
+
+
+@st.cache_resource(max_entries=MAX_CACHED_FILES, show_spinner="Parsing uploaded file...")
+def parse_results_csv(file_hash, _file_bytes):
+    """Parse and validate uploaded CSV bytes, cached by the file's content hash.
+
+    The parsed frame is shared between reruns without copying, so callers must not modify it.
+    """
+    df = pd.read_csv(io.BytesIO(_file_bytes))
+    df = df.iloc[:, 1:] # Remove the first column if it's an index or unwanted column
+    
+    # Check if required columns exist
+    required_columns = ['player_id', 'datetime', 'minutes']
+    if not all(col in df.columns for col in required_columns):
+        raise ValueError(f"CSV must contain at least these columns: {required_columns}")
+    
+    # Convert Date column to datetime
+    df['datetime'] = pd.to_datetime(df['datetime'])
+    
+    # Small integer ids and minutes; the model columns keep their float64 predictions
+    return compact_frame(df)
 
 def load_data(uploaded_file):
-    """Load and validate the CSV data"""
+    """Load and validate the CSV data, returning the frame and its content hash"""
     try:
-        df = pd.read_csv(uploaded_file)
-        df = df.iloc[:, 1:] # Remove the first column if it's an index or unwanted column
-        
-        # Check if required columns exist
-        required_columns = ['player_id', 'datetime', 'minutes']
-        if not all(col in df.columns for col in required_columns):
-            st.error(f"CSV must contain at least these columns: {required_columns}")
-            return None
+        file_bytes = uploaded_file.getvalue()
+        file_hash = hashlib.sha256(file_bytes).hexdigest()
+        df = parse_results_csv(file_hash, file_bytes)
         
         # Check if there are additional columns (model predictions)
-        model_columns = [col for col in df.columns if col not in required_columns]
+        model_columns = get_model_columns(df)
         if not model_columns:
             st.warning("No model prediction columns found. Only 'minutes' will be plotted.")
         
-        # Convert Date column to datetime
-        df['datetime'] = pd.to_datetime(df['datetime'])
-        
-        return df
+        return df, file_hash
+    except ValueError as e:
+        st.error(str(e))
+        return None, None
     except Exception as e:
         st.error(f"Error loading file: {str(e)}")
-        return None
+        return None, None
+
+def get_model_columns(df):
+    """All columns except player_id, datetime, minutes and position"""
+    return [col for col in df.columns if col not in ['player_id', 'datetime', 'minutes', 'position']]
+
+@st.cache_data(max_entries=1)
+def read_player_mapping(mapping_path):
+    """Read the player ID to name mapping file (cached across reruns)"""
+    mapping_df = pd.read_csv(mapping_path)
+    
+    # Create a dictionary mapping player_id to name
+    return dict(zip(mapping_df['player_id'], mapping_df['name']))
 
 def load_player_mapping():
     """Load player ID to name mapping"""
     try:
-        mapping_path = "results/Player_Id_to_Name.csv"
-        mapping_df = pd.read_csv(mapping_path)
-        
-        # Create a dictionary mapping player_id to name
-        player_mapping = dict(zip(mapping_df['player_id'], mapping_df['name']))
-        return player_mapping
+        return read_player_mapping("results/Player_Id_to_Name.csv")
     except Exception as e:
         st.warning(f"Could not load player name mapping: {str(e)}")
         return None
 
-def create_line_plot(df, player_id, cutoff_date=None, player_mapping=None, selected_models=None):
+@st.cache_data(max_entries=MAX_CACHED_FILES)
+def player_error_tables(file_hash, _df):
+    """Per-player MAE and RMSE of every model, computed once per uploaded file.
+
+    Returns two DataFrames indexed by player_id with one column per model.
+    """
+    model_columns = get_model_columns(_df)
+    metrics = grouped_metrics_table(file_hash, _df, ('player_id',))
+    player_ids = np.sort(_df['player_id'].dropna().unique())
+    mae = metrics.pivot(index='player_id', columns='Model', values='MAE')
+    rmse = metrics.pivot(index='player_id', columns='Model', values='RMSE')
+    return (mae.reindex(index=player_ids, columns=model_columns),
+            rmse.reindex(index=player_ids, columns=model_columns))
+
+# Leaderboard groupings: label -> group columns
+GROUPINGS = {
+    'Player': ('player_id',),
+    'Gameweek': ('gameweek',),
+    'Player and Gameweek': ('player_id', 'gameweek'),
+    'Position': ('position',),
+}
+
+@st.cache_resource(max_entries=2 * MAX_CACHED_FILES)
+def grouped_metrics_table(file_hash, _df, by):
+    """MAE, RMSE and bias of every model per group, computed once per uploaded file and grouping.
+
+    The table is shared between reruns without copying, so callers must not modify it.
+    """
+    frame = _df.assign(gameweek=gameweek_start(_df['datetime'])) if 'gameweek' in by else _df
+    return grouped_metrics(frame, get_model_columns(_df), list(by))
+
+@st.cache_data(max_entries=MAX_CACHED_FILES)
+def overall_metrics_table(file_hash, _df):
+    """Overall metrics of every model, computed once per uploaded file"""
+    return overall_metrics(_df, get_model_columns(_df))
+
+@st.cache_data(max_entries=2 * MAX_CACHED_FILES, show_spinner="Bootstrapping model comparison...")
+def model_comparison_table(file_hash, _df, reference, cluster, n_resamples, common_rows):
+    """Bootstrap intervals and paired differences of every model, cached per file and settings"""
+    return compare_models(_df, get_model_columns(_df), reference, cluster, n_resamples, common_rows=common_rows)
+
+@st.cache_resource(max_entries=MAX_CACHED_FILES)
+def build_player_index(file_hash, _df):
+    """Sort the frame by player and date once and record each player's row range.
+
+    Returns a dict with the sorted 'frame', the unique 'player_ids' and their
+    'starts'/'ends' offsets, so a player's rows are a contiguous slice.
+    """
+    frame = _df.sort_values(['player_id', 'datetime'], kind='mergesort').reset_index(drop=True)
+    player_ids, starts, counts = np.unique(frame['player_id'].to_numpy(), return_index=True, return_counts=True)
+    return {'frame': frame, 'player_ids': player_ids, 'starts': starts, 'ends': starts + counts}
+
+def get_player_slice(player_index, player_id):
+    """Rows of one player, sorted by date, without scanning the whole frame"""
+    i = np.searchsorted(player_index['player_ids'], player_id)
+    if i == len(player_index['player_ids']) or player_index['player_ids'][i] != player_id:
+        return player_index['frame'].iloc[0:0]
+    return player_index['frame'].iloc[player_index['starts'][i]:player_index['ends'][i]]
+
+def player_display_names(player_ids, player_mapping):
+    """Build the 'Name (ID: id)' dropdown labels for all players at once"""
+    ids = pd.Series(player_ids)
+    names = ids.map(player_mapping).fillna('Unknown Player (ID: ' + ids.astype(str) + ')')
+    return (names.astype(str) + ' (ID: ' + ids.astype(str) + ')').tolist()
+
+def create_line_plot(player_index, player_id, cutoff_date=None, player_mapping=None, selected_models=None):
     """Create a line plot for the selected player with optional cutoff date for line style change"""
-    # Filter data for the selected player
-    player_data = df[df['player_id'] == player_id].copy()
+    # Rows for the selected player, already sorted by date
+    player_data = get_player_slice(player_index, player_id)
     
     if player_data.empty:
         st.warning(f"No data found for Player ID: {player_id}")
         return None
     
-    # Sort by date to ensure proper line plotting
-    player_data = player_data.sort_values('datetime')
-    
     # Get model columns (all columns except player_id, Date, Minutes)
-    all_model_columns = [col for col in df.columns if col not in ['player_id', 'datetime', 'minutes']]
+    all_model_columns = get_model_columns(player_data)
     
     # Use selected models if provided, otherwise use all model columns
     model_columns = selected_models if selected_models is not None else all_model_columns
@@ -182,13 +281,16 @@ def main():
     )
     
     if uploaded_file is not None:
-        # Load data
-        df = load_data(uploaded_file)
+        # Load data (cached by file content, so reruns don't re-parse it)
+        df, file_hash = load_data(uploaded_file)
         
         if df is not None:
             # Load player mapping
             player_mapping = load_player_mapping()
             
+            # Per-player row ranges, built once per uploaded file
+            player_index = build_player_index(file_hash, df)
+            
             # Display basic info about the dataset
             st.subheader("Dataset Overview")
             col1, col2, col3 = st.columns(3)
@@ -196,7 +298,7 @@ def main():
             with col1:
                 st.metric("Total Records", len(df))
             with col2:
-                st.metric("Unique Players", df['player_id'].nunique())
+                st.metric("Unique Players", len(player_index['player_ids']))
             with col3:
                 date_range = f"{df['datetime'].min().strftime('%Y-%m-%d')} to {df['datetime'].max().strftime('%Y-%m-%d')}"
                 st.metric("Date Range", date_range)
@@ -205,7 +307,7 @@ def main():
             st.subheader("📊 Model Selection")
             
             # Get all available model columns
-            all_model_columns = [col for col in df.columns if col not in ['player_id', 'datetime', 'minutes']]
+            all_model_columns = get_model_columns(df)
             
             if all_model_columns:
                 selected_models = st.multiselect(
@@ -220,18 +322,12 @@ def main():
             
             # Player selection
             st.subheader("👤 Select Player")
-            player_ids = sorted(df['player_id'].unique())
+            player_ids = player_index['player_ids'].tolist()
             
             if player_mapping:
                 # Create options with player names
-                player_options = []
-                player_id_to_display = {}
-                
-                for player_id in player_ids:
-                    player_name = player_mapping.get(player_id, f"Unknown Player (ID: {player_id})")
-                    display_text = f"{player_name} (ID: {player_id})"
-                    player_options.append(display_text)
-                    player_id_to_display[display_text] = player_id
+                player_options = player_display_names(player_ids, player_mapping)
+                player_id_to_display = dict(zip(player_options, player_ids))
                 
                 selected_display = st.selectbox(
                     "Choose a Player:",
@@ -256,7 +352,7 @@ def main():
                     return
                 
                 # Get player data for date range
-                player_data = df[df['player_id'] == selected_player].sort_values('datetime')
+                player_data = get_player_slice(player_index, selected_player)
                 
                 if not player_data.empty:
                     # Date slider for cutoff point
@@ -284,9 +380,9 @@ def main():
                     # Option to disable cutoff
                     disable_cutoff = st.checkbox("Disable cutoff (show all data with solid lines)")
                     
-                    fig = create_line_plot(df, selected_player, None if disable_cutoff else cutoff_datetime, player_mapping, selected_models)
+                    fig = create_line_plot(player_index, selected_player, None if disable_cutoff else cutoff_datetime, player_mapping, selected_models)
                 else:
-                    fig = create_line_plot(df, selected_player, None, player_mapping, selected_models)
+                    fig = create_line_plot(player_index, selected_player, None, player_mapping, selected_models)
                 if fig:
                     st.plotly_chart(fig, use_container_width=True)
                     
@@ -297,18 +393,18 @@ def main():
                     model_columns = [col for col in selected_models if col in player_data.columns]
                     
                     if model_columns:
-                        # Calculate MAE for each model
-                        mae_data = []
-                        for model_col in model_columns:
-                            mae = abs(player_data['minutes'] - player_data[model_col]).mean()
-                            mae_data.append({
-                                'Model': model_col,
-                                'Mean Absolute Error': round(mae, 2),
-                                'Lower is Better': '✅' if mae == min([abs(player_data['minutes'] - player_data[col]).mean() for col in model_columns]) else ''
-                            })
+                        # Look up this player's precomputed errors for each model
+                        mae_table, rmse_table = player_error_tables(file_hash, df)
+                        player_mae = mae_table.loc[selected_player, model_columns]
+                        player_rmse = rmse_table.loc[selected_player, model_columns]
+                        
+                        mae_df = pd.DataFrame({
+                            'Model': model_columns,
+                            'Mean Absolute Error': player_mae.round(2).to_numpy(),
+                            'Lower is Better': ['✅' if mae == player_mae.min() else '' for mae in player_mae]
+                        })
                         
                         # Create DataFrame and display as table
-                        mae_df = pd.DataFrame(mae_data)
                         mae_df = mae_df.sort_values('Mean Absolute Error')  # Sort by MAE (best first)
                         
                         st.dataframe(
@@ -335,9 +431,7 @@ def main():
                             
                             st.write("**Model Performance Details:**")
                             for model_col in model_columns:
-                                mae = abs(player_data['minutes'] - player_data[model_col]).mean()
-                                rmse = ((player_data['minutes'] - player_data[model_col]) ** 2).mean() ** 0.5
-                                st.write(f"• **{model_col}**: MAE = {mae:.2f}, RMSE = {rmse:.2f}")
+                                st.write(f"• **{model_col}**: MAE = {player_mae[model_col]:.2f}, RMSE = {player_rmse[model_col]:.2f}")
                     else:
                         st.info("No model columns selected for comparison.")
                     
@@ -348,7 +442,6 @@ def main():
                         player_display_name = f"Player ID: {selected_player}"
                     
                     st.subheader(f"Data for {player_display_name}")
-                    player_data = df[df['player_id'] == selected_player].sort_values('datetime')
                     st.dataframe(player_data, use_container_width=True)
             
             # Add overall model performance comparison section
@@ -357,49 +450,17 @@ def main():
             st.markdown("Performance metrics for all models across the **entire dataset**")
             
             # Get all model columns
-            all_model_columns = [col for col in df.columns if col not in ['player_id', 'datetime', 'minutes']]
+            all_model_columns = get_model_columns(df)
             
             if all_model_columns:
-                # Calculate comprehensive metrics for each model
-                overall_performance = []
-                
-                for model_col in all_model_columns:
-                    # Remove any rows where either minutes or model prediction is NaN
-                    valid_data = df.dropna(subset=['minutes', model_col])
-                    
-                    if len(valid_data) > 0:
-                        # Calculate various metrics
-                        mae = abs(valid_data['minutes'] - valid_data[model_col]).mean()
-                        rmse = ((valid_data['minutes'] - valid_data[model_col]) ** 2).mean() ** 0.5
-                        
-                        # Mean Absolute Percentage Error (MAPE) - handle division by zero
-                        mape_values = []
-                        for idx, row in valid_data.iterrows():
-                            if row['minutes'] != 0:
-                                mape_values.append(abs((row['minutes'] - row[model_col]) / row['minutes']) * 100)
-                        mape = sum(mape_values) / len(mape_values) if mape_values else float('inf')
-                        
-                        # R-squared (coefficient of determination)
-                        ss_res = ((valid_data['minutes'] - valid_data[model_col]) ** 2).sum()
-                        ss_tot = ((valid_data['minutes'] - valid_data['minutes'].mean()) ** 2).sum()
-                        r_squared = 1 - (ss_res / ss_tot) if ss_tot != 0 else 0
-                        
-                        # Correlation coefficient
-                        correlation = valid_data['minutes'].corr(valid_data[model_col])
-                        
-                        overall_performance.append({
-                            'Model': model_col,
-                            'MAE': round(mae, 2),
-                            'RMSE': round(rmse, 2),
-                            'MAPE (%)': round(mape, 2) if mape != float('inf') else 'N/A',
-                            'R²': round(r_squared, 3),
-                            'Correlation': round(correlation, 3),
-                            'Data Points': len(valid_data)
-                        })
+                # Comprehensive metrics for all models, computed once per uploaded file
+                performance_df = overall_metrics_table(file_hash, df)
                 
-                if overall_performance:
-                    # Create DataFrame and sort by MAE (best performance first)
-                    performance_df = pd.DataFrame(overall_performance)
+                if not performance_df.empty:
+                    # Round for display and sort by MAE (best performance first)
+                    performance_df = performance_df.round({'MAE': 2, 'RMSE': 2, 'MAPE (%)': 2, 'R²': 3, 'Correlation': 3})
+                    performance_df['MAPE (%)'] = performance_df['MAPE (%)'].astype(object).where(
+                        performance_df['MAPE (%)'] != float('inf'), 'N/A')
                     performance_df = performance_df.sort_values('MAE')
                     
                     # Add ranking column
@@ -497,6 +558,88 @@ def main():
                 
                 else:
                     st.warning("No valid model data found for performance comparison.")
+                
+                # Per-group leaderboard of every model
+                st.markdown("---")
+                st.subheader("📋 Error Leaderboard by Group")
+                st.markdown("Every model's error within each player, gameweek or position, and how often each model is the best one")
+                
+                groupings = [label for label, by in GROUPINGS.items() if all(col in df.columns or col == 'gameweek' for col in by)]
+                col1, col2 = st.columns(2)
+                with col1:
+                    grouping = st.selectbox("Group by:", groupings, help="Gameweeks are Friday-to-Thursday weeks of the kickoff dates")
+                with col2:
+                    rank_metric = st.selectbox("Rank models by:", ['MAE', 'RMSE'])
+                
+                by = GROUPINGS[grouping]
+                group_metrics = grouped_metrics_table(file_hash, df, by)
+                
+                if not group_metrics.empty:
+                    board = model_leaderboard(group_metrics, list(by), rank_metric)
+                    board.insert(0, 'Rank', range(1, len(board) + 1))
+                    st.dataframe(board.round(3), use_container_width=True, hide_index=True)
+                    
+                    with st.expander(f"📄 {rank_metric} per {grouping.lower()} and model"):
+                        per_group = group_metrics.pivot_table(index=list(by), columns='Model', values=rank_metric, observed=True)
+                        if 'player_id' in by and player_mapping:
+                            per_group.insert(0, 'Player', per_group.index.get_level_values('player_id').map(player_mapping))
+                        st.dataframe(per_group.round(2), use_container_width=True)
+                        st.download_button("Download per-group metrics (CSV)", group_metrics.to_csv(index=False),
+                                           file_name=f"grouped_metrics_{'_'.join(by)}.csv", mime="text/csv")
+                else:
+                    st.warning("No valid model data found for the leaderboard.")
+                
+                # Bootstrap intervals and paired tests, so small differences can be judged
+                st.markdown("---")
+                st.subheader("🔬 Model Comparison with Confidence Intervals")
+                st.markdown("Cluster bootstrap of every model's error, and of its **paired** difference to a reference model on the rows both predicted")
+                
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    cluster_label = st.selectbox("Resample by:", ['Player', 'Gameweek'],
+                                                 help="Whole players (or gameweeks) are resampled, since their rows are correlated")
+                with col2:
+                    reference_options = ['Best model (lowest MAE)'] + all_model_columns
+                    reference_choice = st.selectbox("Reference model:", reference_options)
+                with col3:
+                    n_resamples = st.select_slider("Resamples:", options=[500, 1000, 2000, 5000, 10000], value=2000)
+                common_rows = st.checkbox("Only rows predicted by every model",
+                                          help="Compare all models on the same rows, e.g. when some models only cover one team or season")
+                
+                comparison = model_comparison_table(
+                    file_hash, df, None if reference_choice == reference_options[0] else reference_choice,
+                    GROUPINGS[cluster_label][0], n_resamples, common_rows)
+                
+                if not comparison.empty:
+                    differences = comparison[comparison['Statistic'] == 'MAE difference']
+                    if not differences.empty:
+                        reference_model = differences['Reference'].iloc[0]
+                        st.write(f"**MAE difference to {reference_model}** (positive = worse than the reference):")
+                        st.dataframe(differences.drop(columns=['Statistic', 'Reference']).round(3),
+                                     use_container_width=True, hide_index=True)
+                    
+                    intervals = comparison[comparison['Statistic'] == 'MAE']
+                    fig_intervals = go.Figure(go.Scatter(
+                        x=intervals['Estimate'],
+                        y=intervals['Model'],
+                        mode='markers',
+                        error_x=dict(type='data', symmetric=False,
+                                     array=intervals['CI High'] - intervals['Estimate'],
+                                     arrayminus=intervals['Estimate'] - intervals['CI Low']),
+                        marker=dict(size=8)
+                    ))
+                    fig_intervals.update_layout(
+                        title='MAE with 95% Bootstrap Confidence Intervals',
+                        xaxis_title='Mean Absolute Error (MAE)',
+                        template='plotly_white',
+                        height=max(300, 30 * len(intervals))
+                    )
+                    st.plotly_chart(fig_intervals, use_container_width=True)
+                    
+                    with st.expander("📄 All intervals (MAE, RMSE and paired differences)"):
+                        st.dataframe(comparison.round(3), use_container_width=True, hide_index=True)
+                else:
+                    st.warning("No valid model data found for the comparison.")
             else:
                 st.info("No model columns found in the dataset for overall comparison.")
     
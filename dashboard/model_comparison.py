@@ -0,0 +1,305 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from model_metrics import KEY_COLUMNS, gameweek_start, group_segments, read_collated
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+# Bootstrap resamples whose cluster weights are held in memory at once
+RESAMPLE_BATCH = 500
+
+
+def paired_cluster_sums(df, model_columns, cluster, reference=None, target_column='minutes', block_size=8):
+    """
+    Per-cluster error sums of every model, optionally paired with a reference model.
+
+    The bootstrap resamples whole clusters (players or gameweeks), so every model
+    is reduced to a few sums per cluster once; a resample is then just a weighted
+    sum of these. With a reference, the model's and the reference's sums are also
+    taken over the rows where both models (and the target) are present, so their
+    difference is a paired comparison on the same rows.
+
+    Parameters:
+    df (pd.DataFrame): Results with the cluster, target and model columns.
+    model_columns (list): Model prediction columns.
+    cluster (str): Column whose values are resampled, e.g. 'player_id' or 'gameweek'.
+    reference (str): Reference model column, or None for unpaired sums only.
+    target_column (str): Column with the true minutes.
+    block_size (int): Number of model columns processed per block.
+
+    Returns:
+    dict: (models x clusters) arrays 'n', 'abs' and 'sq' over each model's rows, and
+          with a reference 'n_paired', 'abs_paired', 'sq_paired', 'abs_ref' and
+          'sq_ref' over the rows shared with the reference.
+    """
+    model_columns = list(model_columns)
+    keys, order, starts = group_segments(df, cluster)
+    y = df[target_column].to_numpy(dtype=np.float64)[order]
+    names = ['n', 'abs', 'sq']
+    if reference is not None:
+        names += ['n_paired', 'abs_paired', 'sq_paired', 'abs_ref', 'sq_ref']
+        ref_abs = np.abs(df[reference].to_numpy(dtype=np.float64)[order] - y)
+        has_ref = ~np.isnan(ref_abs)
+        ref_abs[~has_ref] = 0.0
+        ref_sq = ref_abs * ref_abs
+    sums = {name: np.zeros((len(model_columns), len(keys))) for name in names}
+    if not len(order):
+        return sums
+
+    for i_block in range(0, len(model_columns), block_size):
+        block = slice(i_block, i_block + block_size)
+        abs_err = np.take(df[model_columns[block]].to_numpy(dtype=np.float64).T, order, axis=1)
+        np.abs(np.subtract(abs_err, y, out=abs_err), out=abs_err)
+        # A missing prediction or target makes the error NaN; zeroed errors add nothing
+        valid = ~np.isnan(abs_err)
+        np.nan_to_num(abs_err, copy=False, nan=0.0)
+        sq_err = abs_err * abs_err
+
+        sums['n'][block] = np.add.reduceat(valid, starts, axis=1, dtype=np.float64)
+        sums['abs'][block] = np.add.reduceat(abs_err, starts, axis=1)
+        sums['sq'][block] = np.add.reduceat(sq_err, starts, axis=1)
+
+        if reference is not None:
+            valid &= has_ref
+            sums['n_paired'][block] = np.add.reduceat(valid, starts, axis=1, dtype=np.float64)
+            sums['abs_paired'][block] = np.add.reduceat(abs_err * has_ref, starts, axis=1)
+            sums['sq_paired'][block] = np.add.reduceat(sq_err * has_ref, starts, axis=1)
+            sums['abs_ref'][block] = np.add.reduceat(ref_abs * valid, starts, axis=1)
+            sums['sq_ref'][block] = np.add.reduceat(ref_sq * valid, starts, axis=1)
+    return sums
+
+
+def resample_weights(n_clusters, n_resamples, seed=0):
+    """
+    Cluster bootstrap weights: how often each cluster is drawn in each resample.
+
+    A batched (n_resamples x n_clusters) index matrix is drawn at once and counted
+    with a single bincount over per-resample offsets, instead of looping over the
+    resamples.
+
+    Parameters:
+    n_clusters (int): Number of clusters.
+    n_resamples (int): Number of bootstrap resamples.
+    seed (int or np.random.Generator): Random seed or generator.
+
+    Returns:
+    np.ndarray: (n_resamples x n_clusters) float64 counts; each row sums to n_clusters.
+    """
+    rng = np.random.default_rng(seed)
+    draws = rng.integers(0, n_clusters, size=(n_resamples, n_clusters))
+    draws += np.arange(n_resamples)[:, None] * n_clusters
+    counts = np.bincount(draws.ravel(), minlength=n_resamples * n_clusters)
+    return counts.reshape(n_resamples, n_clusters).astype(np.float64)
+
+
+def _statistics(sums, weights):
+    """MAE and RMSE, and with paired sums their differences to the reference, for cluster weights."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        n = weights @ sums['n'].T
+        stats = {'MAE': weights @ sums['abs'].T / n, 'RMSE': np.sqrt(weights @ sums['sq'].T / n)}
+        if 'n_paired' in sums:
+            n = weights @ sums['n_paired'].T
+            stats['MAE difference'] = (weights @ sums['abs_paired'].T - weights @ sums['abs_ref'].T) / n
+            stats['RMSE difference'] = np.sqrt(weights @ sums['sq_paired'].T / n) - np.sqrt(weights @ sums['sq_ref'].T / n)
+    return stats
+
+
+def point_statistics(sums):
+    """Statistics on the full data (every cluster once), same keys as bootstrap_statistics."""
+    return {name: values[0] for name, values in _statistics(sums, np.ones((1, sums['n'].shape[1]))).items()}
+
+
+def bootstrap_statistics(sums, n_resamples=2000, seed=0):
+    """
+    Bootstrap distributions of MAE and RMSE (and the paired differences) from cluster sums.
+
+    Every resample's statistics are ratios of weighted cluster sums, so a batch of
+    resamples is one matrix product per sum. Resamples are generated in batches of
+    RESAMPLE_BATCH from one generator, so the result only depends on the seed.
+
+    Parameters:
+    sums (dict): Output of paired_cluster_sums.
+    n_resamples (int): Number of bootstrap resamples.
+    seed (int): Random seed; the same seed draws the same clusters for every model.
+
+    Returns:
+    dict: (n_resamples x models) arrays 'MAE' and 'RMSE', and with a reference
+          'MAE difference' and 'RMSE difference' (model - reference).
+    """
+    n_clusters = sums['n'].shape[1]
+    rng = np.random.default_rng(seed)
+
+    batches = {}
+    for start in range(0, n_resamples, RESAMPLE_BATCH):
+        weights = resample_weights(n_clusters, min(RESAMPLE_BATCH, n_resamples - start), rng)
+        for name, values in _statistics(sums, weights).items():
+            batches.setdefault(name, []).append(values)
+    return {name: np.concatenate(values) for name, values in batches.items()}
+
+
+def best_model(df, model_columns, target_column='minutes', block_size=8):
+    """Model column with the lowest MAE over its own rows (the default reference)."""
+    y = df[target_column].to_numpy(dtype=np.float64)
+    mae = []
+    for i_block in range(0, len(model_columns), block_size):
+        abs_err = np.abs(df[model_columns[i_block:i_block + block_size]].to_numpy(dtype=np.float64).T - y)
+        n = (~np.isnan(abs_err)).sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mae.extend(np.nan_to_num(abs_err, copy=False, nan=0.0).sum(axis=1) / n)
+    return model_columns[int(np.nanargmin(mae))]
+
+
+def _compare_block(df, model_columns, cluster, reference, target_column, n_resamples, confidence, seed):
+    """
+    Interval table of some models; the unit of work of compare_models' process pool.
+
+    MAE and RMSE use all rows of each model, the differences only the rows shared
+    with the reference. Every block uses the same seed, so all models are
+    resampled with the same clusters.
+    """
+    sums = paired_cluster_sums(df, model_columns, cluster, reference, target_column)
+    point = point_statistics(sums)
+    samples = bootstrap_statistics(sums, n_resamples, seed)
+    alpha = (1 - confidence) / 2
+
+    rows = []
+    for name, values in samples.items():
+        # A resample can miss every cluster of a sparse model, giving NaN
+        quantile = np.nanquantile if np.isnan(values).any() else np.quantile
+        with np.errstate(invalid='ignore'):
+            low, high = quantile(values, [alpha, 1 - alpha], axis=0)
+            # Two-sided bootstrap p-value of a zero difference, never below 2 / (n_resamples + 1)
+            n_below = (values <= 0).sum(axis=0) + 1
+            n_above = (values >= 0).sum(axis=0) + 1
+            p_value = 2 * np.minimum(n_below, n_above) / (len(values) + 1)
+        for i, model in enumerate(model_columns):
+            n = sums['n_paired'][i] if name.endswith('difference') else sums['n'][i]
+            row = {'Model': model, 'Statistic': name, 'Estimate': point[name][i], 'CI Low': low[i],
+                   'CI High': high[i], 'Data Points': int(n.sum()), 'Clusters': int((n > 0).sum())}
+            if name.endswith('difference'):
+                row.update({'Reference': reference, 'p-value': min(p_value[i], 1.0),
+                            'Significant': bool(low[i] > 0 or high[i] < 0)})
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def compare_models(df, model_columns, reference=None, cluster='player_id', n_resamples=2000, confidence=0.95,
+                   seed=0, common_rows=False, target_column='minutes', max_workers=1, n_threads=None):
+    """
+    Cluster bootstrap confidence intervals of every model's MAE and RMSE, and of
+    their paired differences to a reference model.
+
+    Rows of the same player (or gameweek) are correlated, so whole clusters are
+    resampled. The differences are paired: each model is compared with the
+    reference on the rows both of them predicted, and every model is resampled with
+    the same clusters, so the intervals of the differences are much narrower than a
+    comparison of two separate intervals would suggest.
+
+    Parameters:
+    df (pd.DataFrame): Collated results with player_id, datetime, the target and the models.
+    model_columns (list): Model prediction columns to compare.
+    reference (str): Reference model. Defaults to the model with the lowest overall MAE.
+    cluster (str): Resampling unit: 'player_id', 'gameweek' (derived from datetime
+                   if there is no such column) or any other column.
+    n_resamples (int): Number of bootstrap resamples.
+    confidence (float): Coverage of the percentile intervals.
+    seed (int): Random seed.
+    common_rows (bool): Only use rows where every compared model has a prediction.
+    target_column (str): Column with the true minutes.
+    max_workers (int): Worker processes; the models are split between them. 1 runs in-process.
+    n_threads (int): BLAS threads per worker (see parallel_resources.make_executor).
+
+    Returns:
+    pd.DataFrame: One row per model and statistic ('MAE', 'RMSE', 'MAE difference',
+                  'RMSE difference') with Estimate, CI Low, CI High, Data Points and
+                  Clusters; the differences also have Reference, p-value and
+                  Significant (the interval excludes zero). The reference itself has
+                  no difference rows.
+    """
+    model_columns = list(model_columns)
+    if reference is None:
+        reference = best_model(df, model_columns, target_column)
+    if reference not in model_columns:
+        model_columns.append(reference)
+
+    if cluster == 'gameweek' and 'gameweek' not in df.columns:
+        df = df.assign(gameweek=gameweek_start(df['datetime']))
+    df = df[[cluster, target_column] + model_columns]
+    if common_rows:
+        df = df[df[model_columns].notna().all(axis=1)]
+
+    others = [model for model in model_columns if model != reference]
+    args = (cluster, reference, target_column, n_resamples, confidence, seed)
+    unpaired = _compare_block(df, [reference], cluster, None, *args[2:])
+
+    if max_workers > 1 and len(others) > 1:
+        from parallel_resources import make_executor
+        chunks = [chunk.tolist() for chunk in np.array_split(np.array(others, dtype=object), max_workers) if len(chunk)]
+        with make_executor(len(chunks), n_threads) as executor:
+            futures = [executor.submit(_compare_block, df[[cluster, target_column, reference] + chunk], chunk, *args)
+                       for chunk in chunks]
+            paired = [future.result() for future in futures]
+    else:
+        paired = [_compare_block(df, others, *args)] if others else []
+
+    result = pd.concat([unpaired] + paired, ignore_index=True)
+    statistic_order = {'MAE': 0, 'RMSE': 1, 'MAE difference': 2, 'RMSE difference': 3}
+    result = result.sort_values(['Statistic', 'Estimate'], key=lambda col: col.map(statistic_order)
+                                if col.name == 'Statistic' else col, kind='mergesort')
+    return result.reset_index(drop=True)
+
+
+def read_model_file(path):
+    """
+    Read a single-model results file (index, player_id, datetime, minutes, predmin),
+    e.g. results/llm_results_all_2425.csv, with the prediction named after the file.
+    """
+    df = pd.read_csv(path).iloc[:, 1:]
+    name = os.path.splitext(os.path.basename(path))[0]
+    return df.rename(columns={'predmin': name})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bootstrap confidence intervals and paired tests for model comparison.")
+    parser.add_argument("inputs", nargs="+", help="Collated result files, e.g. results/collated/*_results.csv")
+    parser.add_argument("--extra", "-e", nargs="+", default=[],
+                        help="Single-model files (predmin column) merged on player_id and datetime, "
+                             "e.g. results/llm_results_all_2425.csv")
+    parser.add_argument("--models", "-m", nargs="+", default=None, help="Models to compare (default: all)")
+    parser.add_argument("--reference", "-r", default=None, help="Reference model (default: lowest MAE)")
+    parser.add_argument("--cluster", "-c", default='player_id', help="Resampling unit: player_id, gameweek or position")
+    parser.add_argument("--resamples", "-n", type=int, default=2000, help="Number of bootstrap resamples")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Coverage of the intervals")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--common_rows", action="store_true", help="Only use rows where every model has a prediction")
+    parser.add_argument("--workers", "-w", type=int, default=1, help="Worker processes")
+    parser.add_argument("--output", "-o", default=None, help="Write the comparison table to this CSV")
+    args = parser.parse_args()
+
+    df = read_collated(args.inputs)
+    for path in args.extra:
+        extra = read_model_file(path)
+        extra['datetime'] = pd.to_datetime(extra['datetime'])
+        df['datetime'] = pd.to_datetime(df['datetime'])
+        df = df.merge(extra.drop(columns='minutes'), on=['player_id', 'datetime'], how='left')
+    model_columns = args.models or [col for col in df.columns if col not in KEY_COLUMNS]
+
+    start = time.perf_counter()
+    comparison = compare_models(df, model_columns, args.reference, args.cluster, args.resamples, args.confidence,
+                                args.seed, args.common_rows, max_workers=args.workers)
+    print(f"{len(df):,} rows x {len(model_columns)} models, {args.resamples} resamples by {args.cluster} "
+          f"in {time.perf_counter() - start:.2f}s\n")
+
+    for statistic, table in comparison.groupby('Statistic', sort=False):
+        print(f"{statistic}:")
+        print(table.drop(columns='Statistic').dropna(axis=1, how='all').round(3).to_string(index=False))
+        print()
+
+    if args.output:
+        comparison.to_csv(args.output, index=False)
+        print(f"Saved the comparison to {args.output}")
@@ -0,0 +1,282 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+POSITIONS = ['GK', 'DEF', 'MID', 'FWD']
+KEY_COLUMNS = ['player_id', 'datetime', 'minutes', 'position', 'gameweek']
+
+
+def overall_metrics(df, model_columns, target_column='minutes', block_size=4):
+    """
+    Compute MAE, RMSE, MAPE, R² and correlation for every model column at once.
+
+    The predictions are treated as a 2D matrix (rows x models) with a NaN mask, so
+    each model is evaluated on the rows where both it and the target are present,
+    exactly like dropping NaNs per model. Columns are processed in blocks of
+    `block_size` to bound memory on large files.
+
+    Parameters:
+    df (pd.DataFrame): Collated results with the target and model prediction columns.
+    model_columns (list): Model prediction columns to evaluate.
+    target_column (str): Column with the true minutes.
+    block_size (int): Number of model columns processed per block.
+
+    Returns:
+    pd.DataFrame: One row per model with columns Model, MAE, RMSE, MAPE (%), R²,
+                  Correlation and Data Points (models without valid rows are left out).
+    """
+    y = df[target_column].to_numpy(dtype=np.float64)
+    y_valid = ~np.isnan(y)
+    y_zeroed = np.where(y_valid, y, 0.0)
+    # 1/|y| where the true minutes are non-zero, so MAPE skips zero-minute rows
+    y_nonzero = (y_zeroed != 0).astype(np.float64)
+    inv_abs_y = np.divide(1.0, np.abs(y_zeroed), out=np.zeros_like(y_zeroed), where=y_zeroed != 0)
+
+    results = []
+    for i_block in range(0, len(model_columns), block_size):
+        block = list(model_columns[i_block:i_block + block_size])
+        P = df[block].to_numpy(dtype=np.float64)
+
+        mask = ~np.isnan(P) & y_valid[:, None]
+        weights = mask.astype(np.float64)
+        P = np.where(mask, P, 0.0)
+        err = np.where(mask, y_zeroed[:, None] - P, 0.0)
+
+        # Masked sums as matrix-vector products
+        n = weights.sum(axis=0)
+        sum_y = y_zeroed @ weights
+        sum_yy = (y_zeroed ** 2) @ weights
+        sum_p = P.sum(axis=0)
+        sum_pp = np.einsum('ij,ij->j', P, P)
+        sum_yp = y_zeroed @ P
+        ss_res = np.einsum('ij,ij->j', err, err)
+        abs_err = np.abs(err)
+        sum_abs_err = abs_err.sum(axis=0)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mae = sum_abs_err / n
+            rmse = np.sqrt(ss_res / n)
+
+            n_nonzero = y_nonzero @ weights
+            mape = np.where(n_nonzero > 0, inv_abs_y @ abs_err / n_nonzero * 100, np.inf)
+
+            # Centred sums of squares for R² and Pearson correlation
+            ss_tot = sum_yy - sum_y ** 2 / n
+            ss_pred = sum_pp - sum_p ** 2 / n
+            cov = sum_yp - sum_y * sum_p / n
+            # Treat rounding noise from a constant target as zero variance
+            ss_tot = np.where(ss_tot > 1e-12 * sum_yy, ss_tot, 0.0)
+            r_squared = np.where(ss_tot != 0, 1 - ss_res / ss_tot, 0.0)
+            correlation = cov / np.sqrt(ss_tot * ss_pred)
+
+        for i, model_col in enumerate(block):
+            if n[i] > 0:
+                results.append({
+                    'Model': model_col,
+                    'MAE': mae[i],
+                    'RMSE': rmse[i],
+                    'MAPE (%)': mape[i],
+                    'R²': r_squared[i],
+                    'Correlation': correlation[i],
+                    'Data Points': int(n[i])
+                })
+
+    return pd.DataFrame(results, columns=['Model', 'MAE', 'RMSE', 'MAPE (%)', 'R²', 'Correlation', 'Data Points'])
+
+
+def gameweek_start(datetimes):
+    """
+    Start date of the gameweek of each kickoff time.
+
+    The collated results have no gameweek column, so kickoffs are grouped into
+    Friday-to-Thursday weeks: a weekend round (Friday to Monday) stays together,
+    while a midweek round is counted with the weekend before it.
+
+    Parameters:
+    datetimes (pd.Series): Kickoff times.
+
+    Returns:
+    pd.Series: Friday on or before each kickoff (datetime64, midnight).
+    """
+    datetimes = pd.to_datetime(datetimes)
+    return datetimes.dt.to_period('W-THU').dt.start_time
+
+
+def group_segments(df, by):
+    """
+    Sort order that makes every group a contiguous segment of rows.
+
+    Parameters:
+    df (pd.DataFrame): Frame with the group columns.
+    by (str or list): Column(s) defining the groups. Rows with a missing key are dropped.
+
+    Returns:
+    tuple: (keys, order, starts) - a frame with the sorted group keys, the row
+           positions in group order, and the first position in `order` of each group
+           (for np.add.reduceat).
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    if len(by) == 1:
+        codes, uniques = pd.factorize(df[by[0]], sort=True)
+        keys = pd.DataFrame({by[0]: uniques})
+    else:
+        codes, uniques = pd.MultiIndex.from_frame(df[by]).factorize(sort=True)
+        keys = uniques.to_frame(index=False, name=by)
+
+    order = np.argsort(codes, kind='stable')
+    order = order[codes[order] >= 0]
+    counts = np.bincount(codes[order], minlength=len(keys))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]]).astype(np.intp)
+    return keys, order, starts
+
+
+def grouped_metrics(df, model_columns, by, target_column='minutes', block_size=8):
+    """
+    MAE, RMSE and bias of every model within every group (player, gameweek, position, ...).
+
+    The rows are sorted by group once; each block of model columns is then reduced
+    per group with np.add.reduceat over the contiguous group segments, so the cost
+    is one argsort plus a few passes over the prediction matrix, however many groups
+    and models there are. As in overall_metrics, each model is evaluated on the rows
+    where both it and the target are present.
+
+    Parameters:
+    df (pd.DataFrame): Collated results with the group, target and model columns.
+    model_columns (list): Model prediction columns to evaluate.
+    by (str or list): Column(s) defining the groups. Rows with a missing key are ignored.
+    target_column (str): Column with the true minutes.
+    block_size (int): Number of model columns processed per block.
+
+    Returns:
+    pd.DataFrame: Tidy table with one row per group and model: the `by` columns,
+                  Model, MAE, RMSE, Bias (mean of prediction - true minutes) and
+                  Data Points. Groups in which a model has no valid rows are left out.
+    """
+    model_columns = list(model_columns)
+    keys, order, starts = group_segments(df, by)
+    n_groups = len(keys)
+
+    y = df[target_column].to_numpy(dtype=np.float64)[order]
+
+    # (models x groups) sums; the blocks are laid out models x rows so the gather
+    # and the segment sums run along contiguous memory
+    n, sum_abs, sum_sq, sum_err = (np.zeros((len(model_columns), n_groups)) for _ in range(4))
+    if len(order):
+        for i_block in range(0, len(model_columns), block_size):
+            block = slice(i_block, i_block + block_size)
+            P = np.take(df[model_columns[block]].to_numpy(dtype=np.float64).T, order, axis=1)
+
+            # A missing prediction or target makes the error NaN
+            err = np.subtract(P, y, out=P)
+            missing = np.isnan(err)
+            err[missing] = 0.0
+
+            n[block] = np.add.reduceat(~missing, starts, axis=1, dtype=np.float64)
+            sum_err[block] = np.add.reduceat(err, starts, axis=1)
+            np.abs(err, out=err)
+            sum_abs[block] = np.add.reduceat(err, starts, axis=1)
+            np.square(err, out=err)
+            sum_sq[block] = np.add.reduceat(err, starts, axis=1)
+
+    # Model-major tidy layout: all groups of the first model, then the next, ...
+    with np.errstate(invalid='ignore', divide='ignore'):
+        metrics = pd.DataFrame({
+            'Model': pd.Categorical(np.repeat(model_columns, n_groups), categories=model_columns),
+            'MAE': (sum_abs / n).ravel(),
+            'RMSE': np.sqrt(sum_sq / n).ravel(),
+            'Bias': (sum_err / n).ravel(),
+            'Data Points': n.ravel().astype(np.int64),
+        })
+    keys = keys.iloc[np.tile(np.arange(n_groups), len(model_columns))].reset_index(drop=True)
+    result = pd.concat([keys, metrics], axis=1)
+    return result[result['Data Points'] > 0].reset_index(drop=True)
+
+
+def model_leaderboard(metrics, by, metric='MAE'):
+    """
+    Summarise grouped_metrics per model: how often it is the best model of a group
+    and how it ranks on average.
+
+    Parameters:
+    metrics (pd.DataFrame): Output of grouped_metrics.
+    by (str or list): The group columns used for grouped_metrics.
+    metric (str): Metric to rank by (lower is better).
+
+    Returns:
+    pd.DataFrame: One row per model with Groups, Wins, Mean Rank and the median and
+                  row-weighted mean of the metric, best mean rank first.
+    """
+    by = [by] if isinstance(by, str) else list(by)
+    ranks = metrics.groupby(by, sort=False, observed=True)[metric].rank(method='min')
+    weighted = metrics[metric] * metrics['Data Points']
+    per_model = pd.DataFrame({
+        'Model': metrics['Model'], 'rank': ranks, 'win': ranks == 1, 'value': metrics[metric],
+        'weighted': weighted, 'points': metrics['Data Points'],
+    }).groupby('Model', observed=True)
+
+    board = pd.DataFrame({
+        'Groups': per_model['rank'].size(),
+        'Wins': per_model['win'].sum(),
+        'Mean Rank': per_model['rank'].mean(),
+        f'Median {metric}': per_model['value'].median(),
+        f'Mean {metric}': per_model['weighted'].sum() / per_model['points'].sum(),
+    })
+    return board.sort_values(['Mean Rank', 'Wins'], ascending=[True, False]).reset_index()
+
+
+def read_collated(paths):
+    """
+    Read collated result files (results/collated/<position>_results.csv) into one frame.
+
+    The first column (the index written by collate_results) is dropped. For files
+    named after a position, a 'position' column is added and the position suffix of
+    the model columns ('..._FWD') is removed, so the same model lines up across
+    positions.
+
+    Parameters:
+    paths (list): CSV or Parquet files.
+
+    Returns:
+    pd.DataFrame: The stacked results with a 'gameweek' column (see gameweek_start).
+    """
+    frames = []
+    for path in paths:
+        df = pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path).iloc[:, 1:]
+        position = os.path.basename(path).split('_')[0]
+        if position in POSITIONS:
+            df = df.rename(columns=lambda col: col[:-len(position) - 1] if col.endswith(f'_{position}') else col)
+            df['position'] = position
+        frames.append(df)
+
+    df = pd.concat(frames, ignore_index=True)
+    df['gameweek'] = gameweek_start(df['datetime'])
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-group error leaderboard of every model in collated results.")
+    parser.add_argument("inputs", nargs="+", help="Collated result files, e.g. results/collated/*_results.csv")
+    parser.add_argument("--by", "-b", nargs="+", default=['position'],
+                        help="Group columns, e.g. player_id, gameweek, position")
+    parser.add_argument("--metric", "-m", default='MAE', choices=['MAE', 'RMSE'], help="Metric to rank models by")
+    parser.add_argument("--output", "-o", default=None, help="Write the per-group metrics to this CSV")
+    parser.add_argument("--top", type=int, default=20, help="Number of models shown in the leaderboard")
+    args = parser.parse_args()
+
+    df = read_collated(args.inputs)
+    model_columns = [col for col in df.columns if col not in KEY_COLUMNS]
+
+    start = time.perf_counter()
+    metrics = grouped_metrics(df, model_columns, args.by)
+    print(f"{len(df):,} rows x {len(model_columns)} models -> {len(metrics):,} group metrics "
+          f"in {time.perf_counter() - start:.2f}s")
+
+    board = model_leaderboard(metrics, args.by, args.metric)
+    print(board.head(args.top).round(3).to_string(index=False))
+
+    if args.output:
+        metrics.to_csv(args.output, index=False)
+        print(f"Saved per-group metrics to {args.output}")
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from collate_results import collate_streaming, run
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    """Three model files over the same fixtures, each shuffled and missing some rows."""
+    rng = np.random.default_rng(0)
+    keys = pd.DataFrame({
+        'player_id': np.repeat(np.arange(1, 41), 10),
+        'datetime': np.tile(pd.date_range('2024-08-16 15:00', periods=10, freq='7D').astype(str), 40),
+    })
+    keys['minutes'] = rng.integers(0, 91, len(keys))
+    for i in range(3):
+        df = keys[rng.random(len(keys)) > 0.1].assign(predmin=lambda d: rng.random(len(d)) * 90)
+        df = df.sample(frac=1, random_state=i).reset_index(drop=True)
+        if i == 2:
+            # Written without an index column
+            df.to_csv(tmp_path / f'model_{i}.csv', index=False)
+        else:
+            df.to_csv(tmp_path / f'model_{i}.csv')
+    return tmp_path
+
+
+@pytest.mark.parametrize('chunk_size', [7, 100, 1_000_000])
+def test_streaming_matches_pairwise_merge(model_dir, tmp_path, chunk_size):
+    expected = run(str(model_dir))
+    expected = expected.sort_values(['player_id', 'datetime', 'minutes']).reset_index(drop=True)
+
+    output = tmp_path / 'out' / 'collated.csv'
+    output.parent.mkdir()
+    n_rows = collate_streaming(str(model_dir), str(output), chunk_size=chunk_size, max_workers=2)
+    result = pd.read_csv(output, index_col=0)
+
+    assert n_rows == len(expected)
+    assert list(result.columns) == ['player_id', 'datetime', 'minutes', 'model_0', 'model_1', 'model_2']
+    pd.testing.assert_frame_equal(result, expected[result.columns], check_dtype=False)
@@ -0,0 +1,43 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import build_dataset_store, load_position_arrays, load_position_keys
+
+
+def position_frame(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({f'minutes_{i}': rng.integers(0, 91, n_rows) for i in range(4)})
+    df['out_minutes'] = rng.integers(0, 91, n_rows)
+    df['out_player_id'] = rng.integers(1, 500, n_rows)
+    df['out_datetime'] = pd.date_range('2024-08-16', periods=n_rows, freq='h')
+    return df
+
+
+def test_store_arrays_match_the_dictionary(tmp_path):
+    data = {'GK': position_frame(20, 0), 'FWD': position_frame(30, 1)}
+    dict_path = tmp_path / 'training_dictionary.pkl'
+    with open(dict_path, 'wb') as f:
+        pickle.dump(data, f)
+
+    store_dir = build_dataset_store(str(dict_path))
+    for position, df in data.items():
+        X, y = load_position_arrays(store_dir, position)
+        np.testing.assert_array_equal(X, df[[f'minutes_{i}' for i in range(4)]].to_numpy())
+        np.testing.assert_array_equal(y, df['out_minutes'].to_numpy())
+        keys = load_position_keys(store_dir, position)
+        np.testing.assert_array_equal(keys['out_player_id'], df['out_player_id'].to_numpy())
+        np.testing.assert_array_equal(keys['out_datetime'], df['out_datetime'].to_numpy())
+
+
+def test_up_to_date_store_is_not_rebuilt(tmp_path):
+    dict_path = tmp_path / 'training_dictionary.pkl'
+    with open(dict_path, 'wb') as f:
+        pickle.dump({'GK': position_frame(10, 0)}, f)
+
+    store_dir = build_dataset_store(str(dict_path))
+    meta_mtime = os.path.getmtime(os.path.join(store_dir, 'store.json'))
+    assert build_dataset_store(str(dict_path)) == store_dir
+    assert os.path.getmtime(os.path.join(store_dir, 'store.json')) == meta_mtime
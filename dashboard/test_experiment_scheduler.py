@@ -0,0 +1,87 @@
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dataset_store import build_dataset_store, load_position_arrays, position_version
+from experiment_scheduler import append_job_event, experiment_fingerprint, experiment_grid, run_experiments
+
+
+def mean_target(position, seed, store_dir):
+    """Experiment run in the workers; module level so it can be pickled."""
+    _, y = load_position_arrays(store_dir, position)
+    return {'position': position, 'seed': seed, 'mean': float(np.mean(y)), 'status': 'completed'}
+
+
+def position_frame(seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({f'minutes_{i}': rng.integers(0, 91, 20) for i in range(3)})
+    df['out_minutes'] = rng.integers(0, 91, 20)
+    return df
+
+
+def save_dictionary(path, data):
+    # A new mtime, so the store sees the pickle as changed
+    time.sleep(0.01)
+    with open(path, 'wb') as f:
+        pickle.dump(data, f)
+    os.utime(path, (time.time() + 1, time.time() + 1))
+
+
+@pytest.fixture
+def sweep(tmp_path):
+    data = {'GK': position_frame(0), 'DEF': position_frame(1)}
+    dict_path = str(tmp_path / 'training_dictionary.pkl')
+    save_dictionary(dict_path, data)
+    store_dir = build_dataset_store(dict_path)
+    paths = {'log_path': str(tmp_path / 'jobs.jsonl'), 'results_file': str(tmp_path / 'summary.csv')}
+    configs = experiment_grid(position=['GK', 'DEF'], seed=[1, 2])
+
+    def run(positions=('GK', 'DEF')):
+        versions = {position: position_version(store_dir, position) for position in positions}
+        return run_experiments(configs, mean_target, max_workers=1, n_threads=1, store_dir=store_dir,
+                               data_version=lambda config: versions[config['position']], **paths)
+
+    return data, dict_path, store_dir, configs, paths, run
+
+
+def test_finished_experiments_are_skipped(sweep):
+    _, _, _, configs, paths, run = sweep
+    assert len(run()) == len(configs)
+    assert run() == []
+    assert len(pd.read_csv(paths['results_file'])) == len(configs)
+
+
+def test_rebuilding_an_unchanged_store_keeps_the_fingerprints(sweep):
+    data, dict_path, _, _, _, run = sweep
+    run()
+
+    # Re-saving the same data and adding a position rebuilds the store
+    save_dictionary(dict_path, {**data, 'MID': position_frame(2)})
+    build_dataset_store(dict_path)
+    assert run() == []
+
+
+def test_changed_position_data_reruns_only_that_position(sweep):
+    data, dict_path, _, _, _, run = sweep
+    run()
+
+    save_dictionary(dict_path, {**data, 'DEF': position_frame(3)})
+    build_dataset_store(dict_path)
+    rerun = run()
+    assert sorted((r['position'], r['seed']) for r in rerun) == [('DEF', 1), ('DEF', 2)]
+
+
+def test_interrupted_experiment_is_resumed(sweep):
+    _, _, store_dir, configs, paths, run = sweep
+    run()
+
+    # A job that was started after its last completion (e.g. a crashed rerun) runs again
+    config = configs[0]
+    fingerprint = experiment_fingerprint(config, position_version(store_dir, config['position']))
+    append_job_event(paths['log_path'], fingerprint, 'started', config)
+    rerun = run()
+    assert [(r['position'], r['seed']) for r in rerun] == [(config['position'], config['seed'])]
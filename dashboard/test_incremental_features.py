@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from incremental_features import init_feature_state, refresh_gameweek_features, update_gameweek_features
+from rolling_features import rolling_features
+
+WINDOWS = (3, 5)
+STATS = ('mean', 'median', 'std', 'sum')
+
+
+def history_frame(seed=0):
+    """Ten players over 12 weeks, with a double gameweek (two rows, same week) at week 8 for some."""
+    rng = np.random.default_rng(seed)
+    players = [f'Player {i}' for i in range(10)]
+    rows = [(player, week) for player in players for week in range(1, 13)]
+    rows += [(player, 8) for player in players[:4]]
+    df = pd.DataFrame(rows, columns=['player', 'week'])
+    df['minutes'] = rng.integers(0, 91, len(df)).astype(float)
+    df['xG'] = rng.random(len(df))
+    return df.sample(frac=1, random_state=seed).sort_values('week', kind='mergesort')
+
+
+def feature_columns():
+    return [f'{column}_last_{window}_{stat}' for column in ('minutes', 'xG') for window in WINDOWS for stat in STATS]
+
+
+def test_weekly_updates_match_full_recompute():
+    df = history_frame()
+    full = rolling_features(df, ['minutes', 'xG'], windows=WINDOWS, stats=STATS)
+
+    state = init_feature_state(df[df['week'] < 6], ['minutes', 'xG'], size=5)
+    updates = pd.concat([update_gameweek_features(state, df[df['week'] == week], WINDOWS, STATS)
+                         for week in range(6, 13)])
+
+    np.testing.assert_allclose(updates[feature_columns()].to_numpy(),
+                               full.loc[updates.index, feature_columns()].to_numpy(), equal_nan=True)
+
+
+def test_refresh_through_saved_state_matches_full_recompute(tmp_path):
+    df = history_frame(1)
+    full = rolling_features(df, ['minutes', 'xG'], windows=WINDOWS, stats=STATS)
+    state_path = str(tmp_path / 'state.npz')
+
+    updates = []
+    for week in range(6, 13):
+        new_rows = df[df['week'] == week]
+        if week == 10:
+            # A player first seen after the state was saved, with a longer name
+            new_rows = pd.concat([new_rows, pd.DataFrame({'player': ['A Much Longer Player Name'], 'week': [10],
+                                                          'minutes': [90.0], 'xG': [0.5]}, index=[10_000])])
+        updates.append(refresh_gameweek_features(state_path, new_rows, history=df[df['week'] < 6],
+                                                 columns=['minutes', 'xG'], size=5, windows=WINDOWS, stats=STATS))
+    updates = pd.concat(updates)
+    known = updates.index.isin(full.index)
+
+    np.testing.assert_allclose(updates.loc[known, feature_columns()].to_numpy(),
+                               full.loc[updates.index[known], feature_columns()].to_numpy(), equal_nan=True)
+
+
+def test_adding_a_gameweek_twice_is_rejected():
+    df = history_frame()
+    state = init_feature_state(df[df['week'] < 6], ['minutes'], size=5)
+    update_gameweek_features(state, df[df['week'] == 6], WINDOWS, STATS)
+    count = state['count'].copy()
+
+    with pytest.raises(ValueError, match='already added'):
+        update_gameweek_features(state, df[df['week'] == 6], WINDOWS, STATS)
+    np.testing.assert_array_equal(state['count'], count)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_comparison import compare_models
+
+N_RESAMPLES = 200
+
+
+@pytest.fixture
+def results():
+    """Models with known errors: 'a' is always 1 minute over, 'b' 3 over, 'c' is noisy."""
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'player_id': np.repeat(np.arange(20), 10),
+                       'minutes': rng.choice([0.0, 30.0, 90.0], 200)})
+    df['a'] = df['minutes'] + 1
+    df['b'] = df['minutes'] + 3
+    df['c'] = df['minutes'] + rng.normal(0, 20, 200)
+    # 'c' never predicts for the first five players
+    df.loc[df['player_id'] < 5, 'c'] = np.nan
+    return df
+
+
+def statistic(result, model, name):
+    return result[(result['Model'] == model) & (result['Statistic'] == name)].iloc[0]
+
+
+def test_known_errors(results):
+    result = compare_models(results, ['b', 'a', 'c'], n_resamples=N_RESAMPLES)
+
+    a_mae, b_mae = statistic(result, 'a', 'MAE'), statistic(result, 'b', 'MAE')
+    assert (a_mae['Estimate'], a_mae['CI Low'], a_mae['CI High']) == pytest.approx((1, 1, 1))
+    assert (b_mae['Estimate'], b_mae['CI Low'], b_mae['CI High']) == pytest.approx((3, 3, 3))
+    assert statistic(result, 'b', 'RMSE')['Estimate'] == pytest.approx(3)
+
+    # The reference defaults to the lowest MAE and has no difference rows
+    difference = result[result['Statistic'] == 'MAE difference']
+    assert set(difference['Reference']) == {'a'} and 'a' not in set(difference['Model'])
+    b_diff = statistic(result, 'b', 'MAE difference')
+    assert (b_diff['Estimate'], b_diff['CI Low'], b_diff['CI High']) == pytest.approx((2, 2, 2))
+    assert b_diff['Significant'] and b_diff['p-value'] == pytest.approx(2 / (N_RESAMPLES + 1))
+
+
+def test_sparse_model_is_compared_on_its_own_rows(results):
+    result = compare_models(results, ['a', 'c'], reference='a', n_resamples=N_RESAMPLES)
+    c_mae, c_diff = statistic(result, 'c', 'MAE'), statistic(result, 'c', 'MAE difference')
+    own_rows = results.dropna(subset=['c'])
+
+    assert c_mae['Estimate'] == pytest.approx((own_rows['c'] - own_rows['minutes']).abs().mean())
+    assert c_mae['CI Low'] < c_mae['Estimate'] < c_mae['CI High']
+    assert (c_mae['Data Points'], c_mae['Clusters']) == (150, 15)
+    assert (c_diff['Data Points'], c_diff['Clusters']) == (150, 15)
+    assert c_diff['Estimate'] == pytest.approx(c_mae['Estimate'] - 1)
+    assert statistic(result, 'a', 'MAE')['Data Points'] == 200
+
+
+def test_common_rows_and_workers(results):
+    common = compare_models(results, ['a', 'b', 'c'], reference='a', common_rows=True, n_resamples=N_RESAMPLES)
+    assert set(common['Data Points']) == {150}
+
+    serial = compare_models(results, ['a', 'b', 'c'], reference='a', n_resamples=N_RESAMPLES)
+    parallel = compare_models(results, ['a', 'b', 'c'], reference='a', n_resamples=N_RESAMPLES, max_workers=2)
+    pd.testing.assert_frame_equal(serial, parallel)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from model_metrics import grouped_metrics, overall_metrics
+
+MODELS = ['rocket', 'minirocket', 'xgboost']
+
+
+@pytest.fixture
+def results():
+    """Collated results with missing predictions, missing targets and zero-minute rows."""
+    rng = np.random.default_rng(0)
+    n_rows = 500
+    df = pd.DataFrame({
+        'player_id': rng.integers(1, 30, n_rows),
+        'position': rng.choice(['GK', 'DEF', 'MID', 'FWD'], n_rows),
+        'minutes': rng.choice([0, 15, 60, 90], n_rows).astype(np.float64),
+    })
+    df.loc[rng.random(n_rows) < 0.05, 'minutes'] = np.nan
+    for model in MODELS:
+        df[model] = df['minutes'] + rng.normal(0, 10, n_rows)
+        df.loc[rng.random(n_rows) < 0.2, model] = np.nan
+    # A model that only predicts for goalkeepers
+    df.loc[df['position'] != 'GK', 'xgboost'] = np.nan
+    return df
+
+
+def test_overall_metrics_match_per_model_dropna(results):
+    metrics = overall_metrics(results, MODELS, block_size=2).set_index('Model')
+    assert list(metrics.index) == MODELS
+
+    for model in MODELS:
+        valid = results[['minutes', model]].dropna()
+        y, p = valid['minutes'], valid[model]
+        nonzero = y != 0
+        row = metrics.loc[model]
+        assert row['Data Points'] == len(valid)
+        assert row['MAE'] == pytest.approx((y - p).abs().mean())
+        assert row['RMSE'] == pytest.approx(np.sqrt(((y - p) ** 2).mean()))
+        assert row['MAPE (%)'] == pytest.approx(((y - p).abs() / y)[nonzero].mean() * 100)
+        assert row['R²'] == pytest.approx(1 - ((y - p) ** 2).sum() / ((y - y.mean()) ** 2).sum())
+        assert row['Correlation'] == pytest.approx(y.corr(p))
+
+
+@pytest.mark.parametrize('by', ['player_id', ['position', 'player_id']])
+def test_grouped_metrics_match_pandas_groupby(results, by):
+    metrics = grouped_metrics(results, MODELS, by, block_size=2)
+    by = [by] if isinstance(by, str) else by
+
+    expected = []
+    for model in MODELS:
+        valid = results.dropna(subset=['minutes', model])
+        err = (valid[model] - valid['minutes']).rename('err')
+        grouped = err.groupby([valid[col] for col in by])
+        expected.append(pd.DataFrame({
+            'Model': model,
+            'MAE': grouped.apply(lambda e: e.abs().mean()),
+            'RMSE': grouped.apply(lambda e: np.sqrt((e ** 2).mean())),
+            'Bias': grouped.mean(),
+            'Data Points': grouped.size(),
+        }).reset_index())
+    expected = pd.concat(expected, ignore_index=True)
+
+    assert metrics['Model'].tolist() == expected['Model'].tolist()
+    pd.testing.assert_frame_equal(metrics.drop(columns='Model'), expected.drop(columns='Model'),
+                                  check_dtype=False)
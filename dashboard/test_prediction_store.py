@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from prediction_store import list_predictions, read_predictions, write_predictions
+
+
+def position_rows(n_rows, seed):
+    rng = np.random.default_rng(seed)
+    keys = {'out_player_id': rng.integers(1, 700, n_rows),
+            'out_datetime': pd.date_range('2024-08-16 15:00', periods=n_rows, freq='D').to_numpy()}
+    return keys, rng.integers(0, 91, n_rows).astype(np.float64)
+
+
+def test_round_trip(tmp_path):
+    store = str(tmp_path)
+    written = {}
+    for seed, position in enumerate(['FWD', 'GK']):
+        keys, y_true = position_rows(5 + seed, seed)
+        for column in ['rocket', 'minirocket']:
+            if position == 'GK' and column == 'minirocket':
+                continue
+            y_pred = np.linspace(0, 90, len(y_true)) + seed
+            write_predictions(store, position, column, y_pred, y_true, keys, metadata={'mae': 1.5})
+            written[position, column] = y_pred
+        written[position] = (keys, y_true)
+
+    df = read_predictions(store)
+    assert list(df.columns) == ['player_id', 'datetime', 'minutes', 'minirocket', 'rocket']
+    assert df['player_id'].dtype == np.int32 and df['rocket'].dtype == np.float32
+
+    fwd, gk = df.iloc[:5], df.iloc[5:]
+    for position, rows in [('FWD', fwd), ('GK', gk)]:
+        keys, y_true = written[position]
+        np.testing.assert_array_equal(rows['player_id'], keys['out_player_id'])
+        np.testing.assert_array_equal(rows['datetime'], keys['out_datetime'])
+        np.testing.assert_array_equal(rows['minutes'], y_true)
+        np.testing.assert_allclose(rows['rocket'], written[position, 'rocket'], rtol=1e-6)
+    np.testing.assert_allclose(fwd['minirocket'], written['FWD', 'minirocket'], rtol=1e-6)
+    assert gk['minirocket'].isna().all()
+
+    sidecars = list_predictions(store)
+    assert len(sidecars) == 3 and (sidecars['mae'] == 1.5).all()
+
+
+def test_different_rows_for_a_position_are_rejected(tmp_path):
+    keys, y_true = position_rows(5, 0)
+    write_predictions(str(tmp_path), 'FWD', 'rocket', y_true, y_true, keys)
+    with pytest.raises(ValueError, match='differs'):
+        write_predictions(str(tmp_path), 'FWD', 'minirocket', y_true, y_true[::-1], keys)
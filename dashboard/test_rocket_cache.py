@@ -0,0 +1,49 @@
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip('sktime')
+from sktime.regression.kernel_based import RocketRegressor
+
+import synthetic
+from rocket_cache import fit_predict_ridge, prune_rocket_cache, rocket_cache_entries, rocket_features
+
+NUM_KERNELS = 200
+
+
+@pytest.fixture(scope='module')
+def windows():
+    # Realistic minutes (many zeros and 90s): a float32 ridge head is off by minutes on these
+    X, y = synthetic.lag_windows('team_season', window_length=10)
+    n_train = int(len(y) * 0.8)
+    return X[:n_train], y[:n_train], X[n_train:]
+
+
+@pytest.mark.parametrize('rocket_model', ['rocket', 'minirocket'])
+def test_cached_head_matches_rocket_regressor(windows, tmp_path, rocket_model):
+    X_train, y_train, X_val = windows
+    reg = RocketRegressor(num_kernels=NUM_KERNELS, rocket_transform=rocket_model, random_state=42)
+    expected = reg.fit(X_train, y_train).predict(X_val)
+
+    rocket_features(X_train, X_val, rocket_model, NUM_KERNELS, 42, str(tmp_path))
+    F_train, F_val = rocket_features(X_train, X_val, rocket_model, NUM_KERNELS, 42, str(tmp_path))
+    assert F_train.dtype == np.float32
+
+    np.testing.assert_allclose(fit_predict_ridge(F_train, y_train, F_val), expected, rtol=1e-6, atol=1e-6)
+
+
+def test_prune_deletes_least_recently_used_entries(windows, tmp_path):
+    X_train, _, X_val = windows
+    for shift in range(3):
+        rocket_features(X_train + shift, X_val, 'minirocket', NUM_KERNELS, 42, str(tmp_path), max_cache_gb=None)
+        time.sleep(0.01)
+    oldest, _, _ = rocket_cache_entries(str(tmp_path))[0]
+
+    # Reusing the oldest entry makes it the most recently used
+    rocket_features(X_train, X_val, 'minirocket', NUM_KERNELS, 42, str(tmp_path), max_cache_gb=None)
+    entry_size = rocket_cache_entries(str(tmp_path))[0][1]
+    deleted = prune_rocket_cache(str(tmp_path), max_cache_gb=1.5 * entry_size / 1024 ** 3)
+
+    assert len(deleted) == 2 and oldest not in deleted
+    assert [key for key, _, _ in rocket_cache_entries(str(tmp_path))] == [oldest]
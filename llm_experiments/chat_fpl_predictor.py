@@ -1,10 +1,14 @@
+import asyncio
 import os
 import pandas as pd
 
 from airsenal.framework.utils import *
 
+from season_data import SeasonData
+from llm_pipeline import chat_request, check_no_running_loop, run_requests_async
+from response_cache import DEFAULT_CACHE_DIR, ResponseCache
 
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 
 client = OpenAI(
     # This is the default and can be omitted
@@ -12,6 +16,21 @@ client = OpenAI(
 )
 
 
+def make_async_client():
+    """
+    AsyncOpenAI client for the concurrent pipeline in process_team/process_season.
+
+    A new client is made inside each batch's event loop; a shared client would keep
+    connections bound to the loop of its first batch.
+    """
+    return AsyncOpenAI(api_key=os.environ.get("OPENAI_AI_KEY"))
+
+
+# Replies are cached on disk by prompt content; LLM_CACHE_MODE=replay runs offline from the cache
+response_cache = ResponseCache(os.environ.get("LLM_CACHE_DIR", DEFAULT_CACHE_DIR),
+                               mode=os.environ.get("LLM_CACHE_MODE", "readwrite"))
+
+
 def get_previous_season(season):
     """
     Assuming season is in the format '2425' we
@@ -23,11 +42,13 @@ def get_previous_season(season):
 
 
 
-def get_historical_player_minutes(team, season):
+def get_historical_player_minutes(team, season, data=None):
+    if data is None:
+        data = SeasonData(season)
     output = ""
     for gw in range(1,39):
-        fixtures = get_fixtures_for_gameweek(gw, season=season)
-        players = list_players(team=team, season=season, gameweek=gw)
+        fixtures = data.get_fixtures_for_gameweek(gw)
+        players = data.list_players(team, gw)
 
         for fixture in fixtures:
             if fixture.home_team != team and fixture.away_team != team:
@@ -41,7 +62,7 @@ def get_historical_player_minutes(team, season):
                 home_or_away = "away"
             output += f"{opponent} ({home_or_away}) \n\n"
             for player in players:
-                playerscore = get_player_scores(fixture, player)
+                playerscore = data.get_player_score(fixture, player)
                 if playerscore:
                     output+= f"{player.name}: {playerscore.minutes} \n"
     return output
@@ -61,27 +82,28 @@ system_msg = (
 )
 
 
-def get_players(gameweek=1, team="ARS", season="2425", ):
-    players_to_predict = [p.name for p in list_players(team=team, season=season, gameweek=gameweek)]
+def get_players(data, gameweek=1, team="ARS"):
+    players_to_predict = [p.name for p in data.list_players(team, gameweek)]
     return players_to_predict
 
-def get_minutes_injuries_for_players(player_list, gameweek, season):
+def get_minutes_injuries_for_players(data, player_list, gameweek):
     rows = []
-    for player in player_list:
-        availability = "unavailable" if get_player(player).is_injured_or_suspended(season, gameweek, gameweek) else "available"
-        recent_minutes = get_recent_minutes_for_player(get_player(player), 4, season, gameweek, session)[:-1]
-        row = f"{player}: {availability} {recent_minutes}"
+    for player_name in player_list:
+        player = data.get_player(player_name)
+        availability = "unavailable" if data.is_injured_or_suspended(player, gameweek, gameweek) else "available"
+        recent_minutes = data.get_recent_minutes_for_player(player, 4, gameweek)[:-1]
+        row = f"{player_name}: {availability} {recent_minutes}"
         rows.append(row)
     return "\n".join(rows)
 
 
-def construct_user_msg(gameweek, team, season, historical_mins_txt):
+def construct_user_msg(data, gameweek, team, historical_mins_txt):
     user_msg = ""
-    players = get_players(gameweek, team, season)
+    players = get_players(data, gameweek, team)
     if gameweek == 1:
         user_msg += f"Here is the data for last season:\n{historical_mins_txt}\n\n"
     else:
-        recent_mins = get_minutes_injuries_for_players(players, gameweek, season)
+        recent_mins = get_minutes_injuries_for_players(data, players, gameweek)
         user_msg += f"Here is the player availability followed by a list of minutes played in the last few matches (most recent last):\n{recent_mins} \n\n"
     player_list = "\n".join(f"- {p}" for p in players)
     user_msg += f"Now predict the number of minutes each of the following players will play in the next match:\n"
@@ -91,59 +113,122 @@ def construct_user_msg(gameweek, team, season, historical_mins_txt):
 
 
 
-def get_response(system_msg, user_msg):
+def get_response(system_msg, user_msg, cache=None):
+    """Reply to one prompt, from the response cache if it was asked before (see response_cache)"""
+    cache = cache or response_cache
+    request = chat_request(system_msg, user_msg)
+    reply = cache.get(request)
+    if reply is not None:
+        return reply
 
     # ---- Send request to OpenAI ----
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg}
-        ],
-        temperature=0.5
-    )
+    response = client.chat.completions.create(**request)
 
     reply = response.choices[0].message.content
+    cache.put(request, reply)
     return reply
 
-def process_team(team="ARS", season="2425", historical_mins_txt):
-    results_dict = {"player_id": [], "date": [], "minutes": [],  "predmin": []}
+def build_team_prompts(data, team, historical_mins_txt):
+    """Prompt for every fixture of a team in the season, as (gameweek, fixture, user_message)"""
+    prompts = []
     for gameweek in range(1,39):
-        print(f"Processing gamewek {gameweek}")
-        players = list_players(team=team, season=season, gameweek=gameweek)
-        fixtures = get_fixtures_for_player(players[0], gw_range=[gameweek], season=season)
+        fixtures = data.get_fixtures_for_team(team, gameweek)
         for fixture in fixtures:
-            date = fixture.date
-
             # construct prompt for the OpenAI API
-            user_message = construct_user_msg(gameweek, team, season, historical_mins_txt)
-            # CALL THE API!!!!
-            result = get_response(system_msg, user_msg)
-            # debug output
-            with open(f"predictions_{team}_{season}_{gameweek}_{date}.csv", "w") as outfile:
-                outfile.write(result)
-            # process output
-            result_lines = result.split("\n")[1:]
-            for line in result_lines:
-                player_name, predicted_mins = line.split(",")
-                player = get_player(player_name)
-                player_score = get_player_scores(fixture, player)
-                if not player_score:
-                    continue
-                results_dict["player_id"].append(player.player_id)
-                results_dict["date"].append(date)
-                results_dict["minutes"].append(player_score.minutes)
-                results_dict["predmin"].append(predicted_mins)
+            user_message = construct_user_msg(data, gameweek, team, historical_mins_txt)
+            prompts.append((gameweek, fixture, user_message))
+    return prompts
+
+
+def collect_team_results(data, team, season, prompts, replies):
+    """Parse the replies to build_team_prompts' prompts (in the same order) into a results dict"""
+    results_dict = {"player_id": [], "date": [], "minutes": [],  "predmin": []}
+    for (gameweek, fixture, _), result in zip(prompts, replies):
+        date = fixture.date
+        if isinstance(result, Exception):
+            print(f"Request for {team} gameweek {gameweek} failed: {result}")
+            continue
+        # debug output
+        with open(f"predictions_{team}_{season}_{gameweek}_{date}.csv", "w") as outfile:
+            outfile.write(result)
+        # process output
+        result_lines = result.split("\n")[1:]
+        for line in result_lines:
+            player_name, predicted_mins = line.split(",")
+            player = data.get_player(player_name)
+            player_score = data.get_player_score(fixture, player)
+            if not player_score:
+                continue
+            results_dict["player_id"].append(player.player_id)
+            results_dict["date"].append(date)
+            results_dict["minutes"].append(player_score.minutes)
+            results_dict["predmin"].append(predicted_mins)
 
     return results_dict
 
 
-def process_season(season="2425"):
+async def process_team_async(historical_mins_txt, team="ARS", season="2425", data=None, llm_client=None, cache=None,
+                             **pipeline_kwargs):
+    """
+    Predict minutes for every fixture of a team, sending the prompts concurrently.
+
+    pipeline_kwargs (concurrency, requests_per_minute, tokens_per_minute, max_retries, ...)
+    are passed to llm_pipeline.run_requests_async. llm_client (a client or a function
+    returning one) defaults to a new AsyncOpenAI client per call, and cache to the
+    module's response_cache; prompts answered before are not sent again.
+    """
+    if data is None:
+        data = SeasonData(season)
+    prompts = build_team_prompts(data, team, historical_mins_txt)
+    print(f"Sending {len(prompts)} requests for {team}")
+    # CALL THE API!!!!
+    replies = await run_requests_async(llm_client or make_async_client,
+                                       [chat_request(system_msg, p[2]) for p in prompts],
+                                       return_exceptions=True, cache=cache or response_cache, **pipeline_kwargs)
+    return collect_team_results(data, team, season, prompts, replies)
+
+
+def process_team(historical_mins_txt, team="ARS", season="2425", data=None, llm_client=None, cache=None,
+                 **pipeline_kwargs):
+    """Script wrapper around process_team_async; in a notebook, await process_team_async instead."""
+    check_no_running_loop('process_team')
+    return asyncio.run(process_team_async(historical_mins_txt, team, season, data, llm_client, cache,
+                                          **pipeline_kwargs))
+
+
+async def process_season_async(season="2425", llm_client=None, cache=None, **pipeline_kwargs):
+    """
+    Predict minutes for all teams of a season.
+
+    The prompts of all teams are built first and sent through one rate-limited
+    pipeline, so requests for different teams overlap; see process_team_async.
+    """
     team_dicts = list_teams(season)
     teams = [t["name"] for t in team_dicts]
+    # Read the whole season from the database once and share it between teams
+    data = SeasonData(season)
+    team_prompts = {}
+    for team in teams:
+        print(f"Building prompts for {team}")
+        historical_mins_txt = get_historical_player_minutes(team, season, data)
+        team_prompts[team] = build_team_prompts(data, team, historical_mins_txt)
+
+    requests = [chat_request(system_msg, p[2]) for team in teams for p in team_prompts[team]]
+    print(f"Sending {len(requests)} requests")
+    replies = await run_requests_async(llm_client or make_async_client, requests, return_exceptions=True,
+                                       cache=cache or response_cache, **pipeline_kwargs)
+
+    # Replies come back in request order, so split them per team again
     results_dicts = {}
+    offset = 0
     for team in teams:
-        print(f"Processing {team}")
-        historical_minutes_txt = get_historical_player_minutes(team, season)
-        results_dicts[team] = process_team(team, season, historical_mins_txt)
+        n_prompts = len(team_prompts[team])
+        results_dicts[team] = collect_team_results(data, team, season, team_prompts[team], replies[offset:offset + n_prompts])
+        offset += n_prompts
     return results_dicts
+
+
+def process_season(season="2425", llm_client=None, cache=None, **pipeline_kwargs):
+    """Script wrapper around process_season_async; in a notebook, await process_season_async instead."""
+    check_no_running_loop('process_season')
+    return asyncio.run(process_season_async(season, llm_client, cache, **pipeline_kwargs))
@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from response_cache import CacheMissError
+
+
+class RateLimiter:
+    """
+    Requests-per-minute and tokens-per-minute limits as two token buckets.
+
+    Each bucket holds at most one minute's allowance and refills continuously, so
+    short bursts are allowed but the average rate never exceeds the limit.
+    """
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=30000):
+        """
+        Parameters:
+        requests_per_minute (float): Request limit, or None for no limit.
+        tokens_per_minute (float): Token limit, or None for no limit.
+        """
+        self.limits = {'requests': requests_per_minute, 'tokens': tokens_per_minute}
+        self.available = {name: limit for name, limit in self.limits.items() if limit}
+        self.last_refill = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        for name in self.available:
+            limit = self.limits[name]
+            self.available[name] = min(limit, self.available[name] + elapsed * limit / 60)
+
+    async def acquire(self, tokens=0):
+        """Wait until one request using `tokens` tokens fits in both budgets."""
+        cost = {'requests': 1, 'tokens': tokens}
+        async with self.lock:
+            while True:
+                self._refill()
+                # A single request larger than the whole budget waits for a full bucket
+                needed = {name: min(cost[name], self.limits[name]) for name in self.available}
+                wait = max(
+                    [(needed[name] - self.available[name]) * 60 / self.limits[name] for name in self.available],
+                    default=0
+                )
+                if wait <= 0:
+                    for name in self.available:
+                        self.available[name] -= needed[name]
+                    return
+                await asyncio.sleep(wait)
+
+
+def estimate_tokens(request):
+    """
+    Rough token count of a chat request: about 4 characters per token for the
+    messages, plus the completion budget if max_tokens is set.
+    """
+    characters = sum(len(message['content']) for message in request['messages'])
+    return characters // 4 + request.get('max_tokens', 0)
+
+
+def is_retryable(error):
+    """Rate limits (429), server errors (5xx) and connection problems are retried."""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or \
+        type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+def retry_delay(error, attempt, base_delay=1.0, max_delay=60.0):
+    """Exponential backoff with full jitter, or the server's retry-after header if given."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    retry_after = headers.get('retry-after')
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), max_delay)
+        except ValueError:
+            pass
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+async def request_with_retries(client, request, limiter, max_retries=5, base_delay=1.0):
+    """
+    Send one chat completion request, retrying retryable errors with backoff.
+
+    Parameters:
+    client: AsyncOpenAI client (or FakeChatClient).
+    request (dict): Keyword arguments for client.chat.completions.create.
+    limiter (RateLimiter): Shared rate limiter.
+    max_retries (int): Retries after the first attempt before giving up.
+    base_delay (float): First backoff delay in seconds.
+
+    Returns:
+    str: The reply text.
+    """
+    tokens = estimate_tokens(request)
+    for attempt in range(max_retries + 1):
+        await limiter.acquire(tokens)
+        try:
+            response = await client.chat.completions.create(**request)
+            return response.choices[0].message.content
+        except Exception as e:
+            if attempt == max_retries or not is_retryable(e):
+                raise
+            await asyncio.sleep(retry_delay(e, attempt, base_delay))
+
+
+async def run_requests_async(client, requests, concurrency=8, requests_per_minute=500,
+                             tokens_per_minute=30000, max_retries=5, base_delay=1.0,
+                             return_exceptions=False, cache=None):
+    """
+    Send many chat requests concurrently and return the replies in request order.
+
+    This is the entry point for code that already runs in an event loop, such as a
+    Jupyter notebook: `replies = await run_requests_async(make_client, requests)`.
+
+    Parameters:
+    client: AsyncOpenAI client (or FakeChatClient), or a function returning one. A
+            function is called inside the running loop, so the client's connection
+            pool belongs to this loop, and the client is closed afterwards.
+    requests (list): Request dicts, see request_with_retries.
+    concurrency (int): Maximum number of requests in flight.
+    requests_per_minute (float): Request rate limit.
+    tokens_per_minute (float): Token rate limit (estimated with estimate_tokens).
+    max_retries (int): Retries per request.
+    base_delay (float): First backoff delay in seconds.
+    return_exceptions (bool): Put the exception in place of a reply for requests that
+                              failed after all retries, instead of raising.
+    cache (ResponseCache): Cached replies are returned without a request and new
+                           replies are stored. In replay mode, a missing reply
+                           raises CacheMissError before any request is sent.
+
+    Returns:
+    list: One reply (or exception) per request, in the order of `requests`.
+    """
+    if cache is not None and cache.mode == 'replay':
+        missing = cache.missing(requests)
+        if missing:
+            raise CacheMissError(f"{len(missing)} of {len(requests)} requests have no cached reply "
+                                 f"in {cache.cache_dir} (first: request {missing[0]})")
+
+    owns_client = callable(client)
+    if owns_client:
+        client = client()
+    limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(request):
+        if cache is not None:
+            reply = cache.get(request)
+            if reply is not None:
+                return reply
+        async with semaphore:
+            reply = await request_with_retries(client, request, limiter, max_retries, base_delay)
+        if cache is not None:
+            cache.put(request, reply)
+        return reply
+
+    try:
+        return await asyncio.gather(*(worker(r) for r in requests), return_exceptions=return_exceptions)
+    finally:
+        if owns_client and hasattr(client, 'close'):
+            await client.close()
+
+
+def check_no_running_loop(name):
+    """Raise a RuntimeError pointing to the async entry point if an event loop is running (e.g. in Jupyter)."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    raise RuntimeError(f"{name} starts its own event loop and can't be called from a running one "
+                       f"(e.g. in Jupyter); use `await {name}_async(...)` instead")
+
+
+def run_requests(client, requests, **kwargs):
+    """
+    Synchronous wrapper around run_requests_async for scripts: runs it in a new event loop.
+
+    Pass a client factory (e.g. AsyncOpenAI or a lambda) rather than a client when
+    calling this repeatedly, since a client's connections are bound to the loop of
+    its first request. In a notebook, await run_requests_async instead.
+    """
+    check_no_running_loop('run_requests')
+    return asyncio.run(run_requests_async(client, requests, **kwargs))
+
+
+def chat_request(system_msg, user_msg, model="gpt-4o", temperature=0.5):
+    """Request dict for one system + user prompt, matching get_response."""
+    return {
+        'model': model,
+        'messages': [
+            {"role": "system", "content": system_msg},
+            {"role": "user", "content": user_msg}
+        ],
+        'temperature': temperature,
+    }
+
+
+class FakeRateLimitError(Exception):
+    """Stand-in for openai.RateLimitError raised by FakeChatClient."""
+
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("Rate limit reached (simulated)")
+        headers = {'retry-after': str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class FakeChatClient:
+    """
+    Offline stand-in for AsyncOpenAI that simulates latency and 429 responses.
+
+    client.chat.completions.create(**request) sleeps for a random latency, fails
+    with FakeRateLimitError with probability `rate_limit_probability` (or whenever
+    more than `max_in_flight` requests are open), and otherwise replies with
+    `reply_fn(request)`. The default reply echoes the last user message's length.
+    """
+
+    def __init__(self, latency=(0.05, 0.2), rate_limit_probability=0.1, max_in_flight=None,
+                 reply_fn=None, seed=0):
+        self.latency = latency
+        self.rate_limit_probability = rate_limit_probability
+        self.max_in_flight = max_in_flight
+        self.reply_fn = reply_fn or (lambda request: f"len={len(request['messages'][-1]['content'])}")
+        self.random = random.Random(seed)
+        self.in_flight = 0
+        self.calls = 0
+        self.rate_limited = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **request):
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            overloaded = self.max_in_flight is not None and self.in_flight > self.max_in_flight
+            await asyncio.sleep(self.random.uniform(*self.latency))
+            if overloaded or self.random.random() < self.rate_limit_probability:
+                self.rate_limited += 1
+                raise FakeRateLimitError()
+            message = SimpleNamespace(content=self.reply_fn(request))
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        finally:
+            self.in_flight -= 1
+
+
+if __name__ == "__main__":
+    # Offline check: a season's worth of requests against the fake client
+    parser = argparse.ArgumentParser(description="Run the LLM pipeline against a fake client with simulated 429s.")
+    parser.add_argument("--requests", type=int, default=760, help="Number of requests (20 teams x 38 gameweeks)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Maximum requests in flight")
+    parser.add_argument("--rpm", type=float, default=6000, help="Requests per minute")
+    parser.add_argument("--rate_limit_probability", type=float, default=0.1, help="Chance of a simulated 429")
+    args = parser.parse_args()
+
+    fake = FakeChatClient(rate_limit_probability=args.rate_limit_probability, seed=1)
+    requests = [chat_request("system", "x" * i) for i in range(args.requests)]
+
+    start = time.perf_counter()
+    replies = run_requests(fake, requests, concurrency=args.concurrency, requests_per_minute=args.rpm,
+                           tokens_per_minute=None, base_delay=0.05)
+    elapsed = time.perf_counter() - start
+
+    assert replies == [f"len={i}" for i in range(args.requests)], "Replies out of order"
+    print(f"{len(replies)} replies in order in {elapsed:.1f}s "
+          f"({fake.calls} calls, {fake.rate_limited} simulated 429s retried)")
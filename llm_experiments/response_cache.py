@@ -0,0 +1,112 @@
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+
+DEFAULT_CACHE_DIR = 'llm_cache'
+CACHE_MODES = ['readwrite', 'replay', 'off']
+
+
+class CacheMissError(Exception):
+    """Raised in replay mode when a request has no cached reply."""
+
+
+def request_key(request):
+    """
+    Content address of a chat request: sha256 of its model, temperature and messages.
+
+    Parameters:
+    request (dict): Request dict from llm_pipeline.chat_request.
+
+    Returns:
+    str: 64 hex characters.
+    """
+    content = {
+        'model': request['model'],
+        'temperature': request.get('temperature'),
+        'messages': request['messages'],
+    }
+    canonical = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class ResponseCache:
+    """
+    On-disk cache of LLM replies keyed by request_key.
+
+    Every reply is stored with its request as <cache_dir>/<key[:2]>/<key>.json, so
+    the cache can be inspected, copied between machines or committed next to the
+    results it produced.
+
+    Modes:
+    readwrite: return cached replies, send and store the rest.
+    replay:    return cached replies and raise CacheMissError for the rest, without
+               sending anything (reproducible offline runs).
+    off:       send every request and store nothing.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, mode='readwrite'):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode}, must be one of {CACHE_MODES}")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json')
+
+    def get(self, request):
+        """
+        Cached reply of a request, or None if there is none (or the cache is off).
+
+        Raises:
+        CacheMissError: In replay mode, if the request is not cached.
+        """
+        if self.mode == 'off':
+            return None
+        key = request_key(request)
+        path = self._path(key)
+        if os.path.exists(path):
+            with open(path) as f:
+                entry = json.load(f)
+            self.hits += 1
+            return entry['reply']
+
+        self.misses += 1
+        if self.mode == 'replay':
+            raise CacheMissError(f"No cached reply for request {key[:12]} in {self.cache_dir}")
+        return None
+
+    def put(self, request, reply):
+        """Store a reply; written to a temporary file and renamed, so entries are never partial."""
+        if self.mode != 'readwrite':
+            return
+        key = request_key(request)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {'key': key, 'request': request, 'reply': reply, 'timestamp': datetime.now().isoformat()}
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def missing(self, requests):
+        """Indices of the requests without a cached reply (does not count as hits or misses)."""
+        return [i for i, request in enumerate(requests) if not os.path.exists(self._path(request_key(request)))]
+
+    def count(self):
+        """Number of cached replies."""
+        if not os.path.isdir(self.cache_dir):
+            return 0
+        return sum(name.endswith('.json') for _, _, names in os.walk(self.cache_dir) for name in names)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the LLM response cache.")
+    parser.add_argument("--cache_dir", default=DEFAULT_CACHE_DIR, help="Cache directory")
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.cache_dir)
+    print(f"{cache.count()} cached replies in {args.cache_dir}")
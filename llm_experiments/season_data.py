@@ -0,0 +1,222 @@
+from collections import defaultdict
+
+from sqlalchemy import select
+
+from airsenal.framework.schema import Fixture, Player, PlayerAttributes, PlayerScore
+from airsenal.framework.utils import get_player, get_previous_season, session
+
+
+class SeasonData:
+    """
+    One season of AIrsenal data, bulk-loaded once and indexed in memory.
+
+    The chat predictor asks for fixtures, squads, scores, availability and recent
+    minutes inside loops over teams, gameweeks, fixtures and players. With the
+    airsenal.framework.utils helpers each of those is its own query. Here the
+    season's fixtures, player attributes and player scores (plus the previous
+    season's scores, used for the recent-minutes fallback) are read with a handful
+    of queries and every lookup is served from dictionaries.
+
+    The lookups follow the behaviour of the corresponding airsenal functions for
+    past seasons; they are not meant for the current, still incomplete season.
+    """
+
+    def __init__(self, season, dbsession=None):
+        """
+        Parameters:
+        season (str): Season to load, e.g. '2425'.
+        dbsession (Session): Database session. Defaults to the airsenal session.
+        """
+        self.season = season
+        self.previous_season = get_previous_season(season)
+        dbsession = dbsession or session
+
+        # Fixtures, by id and by gameweek
+        fixtures = dbsession.scalars(select(Fixture).where(Fixture.season == season)).all()
+        self.fixtures = {f.fixture_id: f for f in fixtures}
+        self.fixtures_by_gameweek = defaultdict(list)
+        for fixture in fixtures:
+            if fixture.gameweek:
+                self.fixtures_by_gameweek[fixture.gameweek].append(fixture)
+        latest = max(fixtures, key=lambda f: f.fixture_id, default=None)
+        self.fixture_tag = latest.tag if latest is not None else None
+
+        # Player attributes, by (team, gameweek) and by player
+        attributes = dbsession.scalars(
+            select(PlayerAttributes).where(PlayerAttributes.season == season)
+        ).all()
+        self.attributes_by_team_gameweek = defaultdict(list)
+        self.attributes_by_player = defaultdict(list)
+        for attr in attributes:
+            self.attributes_by_team_gameweek[(attr.team, attr.gameweek)].append(attr)
+            self.attributes_by_player[attr.player_id].append(attr)
+
+        # Players appearing in the season's attributes, by id and by name
+        players = dbsession.scalars(
+            select(Player).where(Player.player_id.in_(list(self.attributes_by_player)))
+        ).all()
+        self.players = {p.player_id: p for p in players}
+        self.players_by_name = {}
+        for player in players:
+            for name in (player.display_name, player.opta_code, player.name):
+                if name:
+                    self.players_by_name[name] = player
+
+        # Player scores of this and the previous season, with the fixture's season and gameweek
+        rows = dbsession.execute(
+            select(PlayerScore, Fixture.season, Fixture.gameweek)
+            .join(Fixture, PlayerScore.fixture_id == Fixture.fixture_id)
+            .where(Fixture.season.in_([season, self.previous_season]))
+        ).all()
+        self.scores = {}
+        self.scores_by_player = defaultdict(list)
+        self.previous_scores_by_player = defaultdict(list)
+        for score, score_season, gameweek in rows:
+            if score_season == season:
+                self.scores[(score.fixture_id, score.player_id)] = score
+                self.scores_by_player[score.player_id].append((gameweek, score))
+            else:
+                self.previous_scores_by_player[score.player_id].append((gameweek, score))
+        for player_scores in (self.scores_by_player, self.previous_scores_by_player):
+            for scores in player_scores.values():
+                scores.sort(key=lambda row: row[0], reverse=True)  # most recent first
+
+        # Last gameweek before the first one with a fixture that has no scores
+        fixtures_with_scores = {fixture_id for fixture_id, _ in self.scores}
+        missing = [f.gameweek for f in fixtures if f.gameweek and f.fixture_id not in fixtures_with_scores]
+        if missing:
+            self.last_complete_gameweek = min(missing) - 1
+        else:
+            self.last_complete_gameweek = max(self.fixtures_by_gameweek, default=0)
+
+    def get_fixtures_for_gameweek(self, gameweek):
+        """All fixtures of the season in a gameweek (like utils.get_fixtures_for_gameweek)."""
+        return list(self.fixtures_by_gameweek.get(gameweek, []))
+
+    def get_fixtures_for_team(self, team, gameweek):
+        """The team's fixtures in a gameweek, from the latest fixture tag."""
+        return [
+            f for f in self.fixtures_by_gameweek.get(gameweek, [])
+            if f.tag == self.fixture_tag and team in (f.home_team, f.away_team)
+        ]
+
+    def get_player(self, player_name_or_id):
+        """
+        Look up a player by id or name, like utils.get_player.
+
+        Players that are not in the season's attributes (e.g. a name the LLM
+        spelled differently) fall back to utils.get_player once and are remembered.
+        """
+        if isinstance(player_name_or_id, str) and player_name_or_id.isdigit():
+            player_name_or_id = int(player_name_or_id)
+        if isinstance(player_name_or_id, int):
+            player = self.players.get(player_name_or_id)
+        else:
+            player = self.players_by_name.get(player_name_or_id)
+
+        if player is None:
+            player = get_player(player_name_or_id)
+            if player is not None and not isinstance(player_name_or_id, int):
+                self.players_by_name[player_name_or_id] = player
+        return player
+
+    def list_players(self, team, gameweek):
+        """
+        Players (excluding managers) on a team in a gameweek, most expensive first.
+
+        Like utils.list_players, if the team has no attributes for the gameweek the
+        neighbouring gameweeks are tried in the order gw-1, gw+1, gw-2, gw+2.
+        """
+        for gw in [gameweek, gameweek - 1, gameweek + 1, gameweek - 2, gameweek + 2]:
+            attributes = self.attributes_by_team_gameweek.get((team, gw))
+            if attributes:
+                break
+        else:
+            return []
+
+        attributes = sorted(
+            (attr for attr in attributes if attr.position != "MNG"),
+            key=lambda attr: attr.price, reverse=True
+        )
+        return [self.players[attr.player_id] for attr in attributes]
+
+    def get_player_score(self, fixture, player):
+        """The player's PlayerScore for a fixture, or None (like utils.get_player_scores)."""
+        return self.scores.get((fixture.fixture_id, player.player_id))
+
+    def _gameweek_attributes(self, player_id, gameweek):
+        """Attributes at the gameweek, or the nearest gameweek (Player.get_gameweek_attributes)."""
+        attr_before = attr_after = None
+        for attr in self.attributes_by_player.get(player_id, []):
+            if attr.gameweek == gameweek:
+                return attr
+            if attr.gameweek < gameweek and (attr_before is None or attr.gameweek > attr_before.gameweek):
+                attr_before = attr
+            elif attr.gameweek > gameweek and (attr_after is None or attr.gameweek < attr_after.gameweek):
+                attr_after = attr
+
+        if attr_before is None or attr_after is None:
+            return attr_before or attr_after
+        if attr_after.gameweek - gameweek >= gameweek - attr_before.gameweek:
+            return attr_before
+        return attr_after
+
+    def team(self, player, gameweek):
+        """The player's team in a gameweek (Player.team)."""
+        attr = self._gameweek_attributes(player.player_id, gameweek)
+        return attr.team if attr is not None else None
+
+    def is_injured_or_suspended(self, player, current_gw, fixture_gw):
+        """Whether the player has <=50% chance of playing (Player.is_injured_or_suspended)."""
+        attr = self._gameweek_attributes(player.player_id, current_gw)
+        if attr is None:
+            return False
+        return (
+            attr.chance_of_playing_next_round is not None
+            and attr.chance_of_playing_next_round <= 50
+        ) and (attr.return_gameweek is None or attr.return_gameweek > fixture_gw)
+
+    def get_recent_minutes_for_player(self, player, num_match_to_use=3, last_gw=None):
+        """
+        Minutes in the player's last matches for their current team, most recent first.
+
+        Follows utils.get_recent_minutes_for_player with exclude_unavailable and
+        current_team_only: if fewer than num_match_to_use matches are found, the
+        average of up to 10 matches from the previous season is appended.
+
+        Parameters:
+        player (Player): The player.
+        num_match_to_use (int): Number of matches to look back.
+        last_gw (int): Last gameweek to include. Defaults to the last complete gameweek.
+
+        Returns:
+        list: Minutes as floats.
+        """
+        if last_gw is None or last_gw > self.last_complete_gameweek:
+            last_gw = self.last_complete_gameweek
+        team = self.team(player, last_gw)
+
+        minutes = _recent_available_minutes(
+            self.scores_by_player.get(player.player_id, []), team, num_match_to_use, last_gw
+        )
+        if len(minutes) < num_match_to_use:
+            previous = _recent_available_minutes(
+                self.previous_scores_by_player.get(player.player_id, []), team, 10
+            )
+            minutes += [sum(previous) / len(previous)] if previous else [0]
+        return minutes or [0.0]
+
+
+def _recent_available_minutes(scores, team, num_matches, last_gw=None):
+    """Minutes of the most recent scores for the team where the player was available."""
+    minutes = []
+    for gameweek, score in scores:
+        if len(minutes) == num_matches:
+            break
+        if last_gw is not None and gameweek > last_gw:
+            continue
+        if score.player_team != team:
+            continue
+        if score.minutes >= 60 or score.chance_of_playing in (100, None):
+            minutes.append(float(score.minutes))
+    return minutes
@@ -1,11 +1,17 @@
 import argparse
 import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
 import numpy as np
 import pandas as pd
 
+KEY_COLUMNS = ['player_id', 'datetime', 'minutes']
 
-def run(directory):
+
+def list_csv_files(directory):
     
     files = sorted(os.listdir(directory))
     drop_file = []
@@ -16,6 +22,13 @@ def run(directory):
     for i_file in np.sort(drop_file)[::-1]:
         del files[i_file]
     
+    return files
+
+
+def run(directory):
+    
+    files = list_csv_files(directory)
+    
     df_list = [process_df(directory, file) for file in files]
 
     # merge all dataframes on player_id, datetime and minutes
@@ -33,13 +46,247 @@ def process_df(stem, filename):
     name = filename.split('.')[0]
     df = df.rename(columns={'predmin': name})
     return df
+
+
+def read_model_file(stem, filename):
+    """
+    Read one model file and return its name with its key and prediction columns.
+
+    Some files are written without an index column, in which case index_col=0 turns
+    a key column into the index; it is moved back into the columns here.
+    """
+    df = process_df(stem, filename)
+    if df.index.name in KEY_COLUMNS:
+        df = df.reset_index()
+    
+    name = filename.split('.')[0]
+    return name, df[KEY_COLUMNS + [name]]
+
+
+class ChunkWriter:
+    """Append collated chunks to a CSV or Parquet file."""
+    
+    def __init__(self, output_filename, output_format='csv'):
+        self.output_filename = output_filename
+        self.output_format = output_format
+        self.n_written = 0
+        self._parquet_writer = None
+    
+    def write(self, chunk):
+        chunk.index = pd.RangeIndex(self.n_written, self.n_written + len(chunk))
+        
+        if self.output_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.output_filename, table.schema)
+            self._parquet_writer.write_table(table.cast(self._parquet_writer.schema))
+        else:
+            chunk.to_csv(self.output_filename, mode='w' if self.n_written == 0 else 'a',
+                         header=self.n_written == 0)
+        
+        self.n_written += len(chunk)
+    
+    def close(self):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def iter_model_file(stem, filename, chunk_size):
+    """
+    Read one model file `chunk_size` rows at a time, yielding the same key and
+    prediction columns as read_model_file for each chunk.
+    """
+    name = filename.split('.')[0]
+    for df in pd.read_csv(os.path.join(stem, filename), index_col=0, chunksize=chunk_size):
+        if 'Unnamed: 0' in df.columns:
+            df = df.drop(columns=['Unnamed: 0'])
+        df = df.rename(columns={'predmin': name})
+        if df.index.name in KEY_COLUMNS:
+            df = df.reset_index()
+        yield df[KEY_COLUMNS + [name]]
+
+
+def _count_player_rows(directory, filename, chunk_size):
+    """Rows per player id of one model file, and the dtype of its minutes column."""
+    counts, dtypes = [], []
+    for df in iter_model_file(directory, filename, chunk_size):
+        counts.append(df['player_id'].value_counts())
+        dtypes.append(df['minutes'].dtype)
+    return pd.concat(counts).groupby(level=0).sum(), np.result_type(*dtypes)
+
+
+def _spill_model_file(directory, filename, chunk_size, block_edges, spill_dir, i_model):
+    """
+    Split one model file by player-id block and append each part to the block's
+    spill file for this model, as pickled (player_id, datetime, minutes, values) arrays.
+    """
+    for df in iter_model_file(directory, filename, chunk_size):
+        player_id = df['player_id'].to_numpy(dtype=np.int64)
+        block = np.searchsorted(block_edges, player_id, side='right') - 1
+        columns = (player_id, df['datetime'].astype(str).to_numpy(dtype=object),
+                   df['minutes'].to_numpy(dtype=np.float64), df.iloc[:, 3].to_numpy(dtype=np.float64))
+        for i_block in np.unique(block):
+            rows = block == i_block
+            with open(os.path.join(spill_dir, f'{i_block}_{i_model}.pkl'), 'ab') as f:
+                pickle.dump(tuple(column[rows] for column in columns), f)
+
+
+def _load_spill(path):
+    """Concatenated arrays of all parts appended to one spill file (empty if there is none)."""
+    parts = []
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            while True:
+                try:
+                    parts.append(pickle.load(f))
+                except EOFError:
+                    break
+    if not parts:
+        return (np.empty(0, dtype=np.int64), np.empty(0, dtype=object), np.empty(0), np.empty(0))
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def collate_streaming(directory, output_filename, output_format='csv', chunk_size=1_000_000, max_workers=8,
+                      tmp_dir=None):
+    """
+    Collate all model files in a directory block by block, in bounded memory.
+    
+    The files are never read whole. A first pass reads each file in chunks of
+    chunk_size rows and only counts the rows per player id, which splits the
+    player ids into blocks of roughly chunk_size input rows. A second pass reads
+    the files in chunks again and appends each chunk's rows to one spill file per
+    (block, model) in a temporary directory. Finally each block's spill files are
+    loaded, merged with one sort, each distinct (player_id, datetime, minutes) key
+    becomes one output row with one column per model, and the block is written
+    straight to the output. Peak memory is about one block plus max_workers input
+    chunks, independent of the total input size; the spill files take about the
+    size of the input on disk. Rows and columns match run(); a key repeated within
+    one file keeps its last value.
+    
+    Parameters:
+    directory (str): Directory containing one CSV per model.
+    output_filename (str): Path of the collated output file.
+    output_format (str): 'csv' or 'parquet'.
+    chunk_size (int): Rows per read chunk, and approximate number of input rows merged per block.
+    max_workers (int): Number of threads reading input files.
+    tmp_dir (str): Where to create the spill directory (default: the system temp directory).
+    
+    Returns:
+    int: Number of rows written.
+    """
+    files = list_csv_files(directory)
+    names = [filename.split('.')[0] for filename in files]
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        file_counts = list(executor.map(lambda filename: _count_player_rows(directory, filename, chunk_size), files))
+    minutes_dtype = np.result_type(*[dtype for _, dtype in file_counts])
+    counts = pd.concat([file_count for file_count, _ in file_counts]).groupby(level=0).sum()
+    
+    # Split the player ids into blocks of roughly chunk_size input rows
+    player_ids = counts.index.to_numpy(dtype=np.int64)
+    block_of_player = np.cumsum(counts.to_numpy()) // max(chunk_size, 1)
+    block_edges = player_ids[np.flatnonzero(np.diff(block_of_player, prepend=-1))]
     
+    writer = ChunkWriter(output_filename, output_format)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as spill_dir:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(lambda i_model: _spill_model_file(directory, files[i_model], chunk_size, block_edges,
+                                                                spill_dir, i_model), range(len(files))))
+        
+        for i_block in range(len(block_edges)):
+            parts = []
+            for i_model in range(len(files)):
+                player_id, datetime, minutes, values = _load_spill(os.path.join(spill_dir, f'{i_block}_{i_model}.pkl'))
+                parts.append((player_id, datetime, minutes, values, np.full(len(player_id), i_model)))
+            player_id, datetime, minutes, values, model = (np.concatenate(col) for col in zip(*parts))
+            
+            # Datetimes are compared as strings, like pd.merge does; encode them as sortable codes
+            datetimes, datetime_code = np.unique(datetime.astype(str), return_inverse=True)
+            
+            order = np.lexsort((minutes, datetime_code, player_id))
+            player_id, datetime_code, minutes = player_id[order], datetime_code[order], minutes[order]
+            is_new_key = np.ones(len(order), dtype=bool)
+            is_new_key[1:] = ((player_id[1:] != player_id[:-1]) | (datetime_code[1:] != datetime_code[:-1])
+                              | (minutes[1:] != minutes[:-1]))
+            row = np.cumsum(is_new_key) - 1
+            
+            predictions = np.full((row[-1] + 1 if len(row) else 0, len(names)), np.nan)
+            predictions[row, model[order]] = values[order]
+            
+            chunk = pd.DataFrame(predictions, columns=names)
+            chunk.insert(0, 'minutes', minutes[is_new_key].astype(minutes_dtype))
+            chunk.insert(0, 'datetime', datetimes[datetime_code[is_new_key]].astype(object))
+            chunk.insert(0, 'player_id', player_id[is_new_key])
+            writer.write(chunk)
+    
+    writer.close()
+    
+    return writer.n_written
+    
+
+def collate_position(directory, output_filename, output_format='csv', chunk_size=1_000_000, max_workers=8):
+    """Collate one position directory and return (rows written, seconds taken)."""
+    start = time.perf_counter()
+    n_rows = collate_streaming(directory, output_filename, output_format, chunk_size, max_workers)
+    return n_rows, time.perf_counter() - start
+
+
+def collate_positions(base_dir, positions, output_dir='collated', output_format='csv',
+                      chunk_size=1_000_000, max_workers=8, n_processes=None):
+    """
+    Collate several position directories concurrently in a process pool.
+    
+    Parameters:
+    base_dir (str): Directory containing one subdirectory per position.
+    positions (list): Position subdirectories to collate, e.g. ['DEF', 'FWD', 'GK', 'MID'].
+    output_dir (str): Directory for the '{position}_results.{format}' outputs.
+    output_format (str): 'csv' or 'parquet'.
+    chunk_size (int): Approximate number of input rows merged per block.
+    max_workers (int): Number of threads reading input files within each position.
+    n_processes (int): Number of worker processes. Defaults to one per position.
+    
+    Returns:
+    dict: Position -> (rows written, seconds taken).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    timings = {}
+    
+    with ProcessPoolExecutor(max_workers=n_processes or len(positions)) as executor:
+        future_to_position = {
+            executor.submit(collate_position, os.path.join(base_dir, position),
+                            os.path.join(output_dir, f'{position}_results.{output_format}'),
+                            output_format, chunk_size, max_workers): position
+            for position in positions
+        }
+        
+        for future in as_completed(future_to_position):
+            position = future_to_position[future]
+            n_rows, seconds = future.result()
+            timings[position] = (n_rows, seconds)
+            print(f"Completed {position}: {n_rows} rows in {seconds:.2f}s")
+    
+    return timings
+
 
 if __name__ == "__main__":
     # Make command line operation accepting a file path as an argument 
     parser = argparse.ArgumentParser(description='Collate results from multiple CSV files.')
-    parser.add_argument('--input_dir', '-i', type=str, help='Directory containing the CSV files to collate.')
+    parser.add_argument('--input_dir', '-i', type=str, help='Directory containing the CSV files to collate (with --positions: the directory containing the position subdirectories).')
     parser.add_argument('--output_filename', '-o', type=str, default='collated_results.csv', help='Output file name for the collated results.')
+    parser.add_argument('--positions', '-p', type=str, nargs='+', help='Collate these position subdirectories of the input directory concurrently, e.g. DEF FWD GK MID.')
+    parser.add_argument('--output_dir', type=str, default='collated', help='Output directory when using --positions.')
+    parser.add_argument('--processes', type=int, default=None, help='Number of worker processes when using --positions (default: one per position).')
+    parser.add_argument('--format', '-f', type=str, default='csv', choices=['csv', 'parquet'], help='Output file format.')
+    parser.add_argument('--chunk_size', type=int, default=1_000_000, help='Rows per read chunk and approximate number of input rows merged per block.')
+    parser.add_argument('--workers', '-w', type=int, default=8, help='Number of threads reading the input files.')
     args = parser.parse_args()
-    result = run(args.input_dir)
-    result.to_csv(args.output_filename)
+    if args.positions:
+        start = time.perf_counter()
+        collate_positions(args.input_dir or '.', args.positions, args.output_dir, output_format=args.format,
+                          chunk_size=args.chunk_size, max_workers=args.workers, n_processes=args.processes)
+        print(f"All positions collated in {time.perf_counter() - start:.2f}s")
+    else:
+        collate_streaming(args.input_dir, args.output_filename, output_format=args.format,
+                          chunk_size=args.chunk_size, max_workers=args.workers)
@@ -4,10 +4,12 @@ import matplotlib.pyplot as plt
 np.random.seed(42)
 
 from sktime.regression.kernel_based import RocketRegressor
+from instrumentation import StageTimer
+from rocket_cache import fit_rocket_ridge_model, rocket_features
 
 import pickle
 
-def apply_rocket(train_dict, val_dict, position='FWD',rocket_model='rocket'):
+def apply_rocket(train_dict, val_dict, position='FWD',rocket_model='rocket', cache_dir=None, random_state=42):
 
     train = train_dict[position]
     val = val_dict[position]
@@ -28,16 +30,56 @@ def apply_rocket(train_dict, val_dict, position='FWD',rocket_model='rocket'):
     y_train = train.iloc[:, -1]
 
     X_val = val.iloc[:, :-1]
-    y_val = val.iloc[:, -1]    
+    y_val = val.iloc[:, -1]
 
     # Turn X_train into a 2D array
     X_train_array = X_train.values.reshape(X_train.shape[0], X_train.shape[1])
     X_val_array   = X_val.values.reshape(X_val.shape[0], X_val.shape[1])
 
-    # Now fit the regressor
-    reg = RocketRegressor(rocket_transform=rocket_model) 
-    reg.fit(X_train_array, y_train)
+    y_pred = fit_predict_rocket(X_train_array, y_train, X_val_array, rocket_model=rocket_model,
+                                cache_dir=cache_dir, random_state=random_state)
 
-    y_pred = reg.predict(X_val_array)
+    return y_pred, y_val
 
-    return y_pred, y_val
\ No newline at end of file
+
+def fit_predict_rocket(X_train, y_train, X_val, rocket_model='rocket', cache_dir=None,
+                       num_kernels=10000, random_state=None, return_model=False, n_jobs=1, timer=None):
+    """
+    Fit a RocketRegressor on 2D lag-window arrays and predict the validation windows.
+
+    Works directly on (memory-mapped) NumPy arrays, so callers that already hold the
+    arrays don't need to go through the per-position DataFrames.
+
+    With a cache_dir (and an integer random_state) the kernel features are taken
+    from the on-disk cache in rocket_cache, so only the ridge regression is refitted
+    when the windows and transform settings are unchanged.
+
+    With return_model, (y_pred, model) is returned so the fitted model can be saved
+    to the model registry instead of being refitted for new predictions.
+
+    A StageTimer (see instrumentation) records the stages: 'transform', 'ridge_fit'
+    and 'predict' with the cache, 'fit' (transform + ridge) and 'predict' without.
+    """
+    timer = timer or StageTimer()
+
+    if cache_dir is not None and random_state is not None:
+        with timer.stage('transform', rocket_model=rocket_model, n_train=len(X_train), n_val=len(X_val)):
+            F_train, F_val = rocket_features(X_train, X_val, rocket_model, num_kernels, random_state, cache_dir, n_jobs)
+        with timer.stage('ridge_fit'):
+            reg = fit_rocket_ridge_model(X_train, y_train, F_train, rocket_model, num_kernels, random_state,
+                                         n_jobs=n_jobs)
+        with timer.stage('predict'):
+            # Cached features are float32; the head works in float64 like RocketRegressor
+            y_pred = reg.head.predict(np.asarray(F_val, dtype=np.float64))
+    else:
+        reg = RocketRegressor(num_kernels=num_kernels, rocket_transform=rocket_model, random_state=random_state,
+                              n_jobs=n_jobs)
+        with timer.stage('fit', rocket_model=rocket_model, n_train=len(X_train)):
+            reg.fit(np.asarray(X_train), np.asarray(y_train))
+
+        with timer.stage('predict', n_val=len(X_val)):
+            y_pred = reg.predict(np.asarray(X_val))
+
+    if return_model:
+        return y_pred, reg
+    return y_pred
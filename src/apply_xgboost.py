@@ -0,0 +1,65 @@
+import numpy as np
+from xgboost import XGBRegressor
+
+from dataset_store import get_minutes_columns
+
+
+# Settings used in Minutes_prediction_xgboost.ipynb
+XGBOOST_PARAMS = {
+    'objective': 'reg:absoluteerror',
+    'n_estimators': 5000,
+    'learning_rate': 0.1,
+    'max_depth': 2,
+    'eval_metric': 'mae',
+    'early_stopping_rounds': 50,
+    'random_state': 1,
+}
+
+
+def make_xgboost_model(**params):
+    """XGBoost regressor with the notebook's settings, overridden by `params`."""
+    return XGBRegressor(**{**XGBOOST_PARAMS, **params})
+
+
+def fit_predict_xgboost(X_train, y_train, X_val, y_val, return_model=False, **params):
+    """
+    Fit the notebook's XGBoost model on 2D lag-window arrays and predict the validation windows.
+
+    The validation set is used for early stopping, as in the notebook.
+
+    Parameters:
+    X_train (np.ndarray): 2D training lag windows (minutes_0 ... minutes_k).
+    y_train (np.ndarray): Training target minutes.
+    X_val (np.ndarray): 2D validation lag windows.
+    y_val (np.ndarray): Validation target minutes.
+    return_model (bool): Also return the fitted model.
+    **params: XGBRegressor settings replacing the notebook's (e.g. max_depth, n_jobs).
+
+    Returns:
+    np.ndarray: Validation predictions, or (predictions, model) with return_model.
+    """
+    X_train = np.asarray(X_train)
+    X_val = np.asarray(X_val)
+
+    model = make_xgboost_model(**params)
+    model.fit(X_train, np.asarray(y_train), eval_set=[(X_train, y_train), (X_val, y_val)], verbose=False)
+
+    y_pred = model.predict(X_val)
+
+    if return_model:
+        return y_pred, model
+    return y_pred
+
+
+def apply_xgboost(train_dict, val_dict, position='FWD'):
+    """XGBoost counterpart of apply_rocket, using the minutes_* windows of one position."""
+    minutes_columns = get_minutes_columns(train_dict[position])
+
+    X_train = train_dict[position][minutes_columns].to_numpy()
+    y_train = train_dict[position]['out_minutes']
+    X_val = val_dict[position][minutes_columns].to_numpy()
+    y_val = val_dict[position]['out_minutes']
+
+    y_pred = fit_predict_xgboost(X_train, y_train, X_val, y_val)
+
+    return y_pred, y_val
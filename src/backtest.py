@@ -0,0 +1,249 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import load_position_arrays, load_position_keys, write_position_arrays
+from parallel_resources import make_executor, threads_per_worker
+from rolling_features import group_row_starts, lag_window_matrix
+
+BACKTEST_MODELS = ['last_week', 'window_mean', 'rocket', 'minirocket', 'xgboost']
+ROCKET_MODELS = ('rocket', 'minirocket', 'multirocket')
+
+
+class _LastWeek:
+    """Baseline: predict the minutes of the most recent match."""
+
+    def predict(self, X):
+        return np.asarray(X)[:, -1]
+
+
+class _WindowMean:
+    """Baseline: predict the mean minutes of the window."""
+
+    def predict(self, X):
+        return np.asarray(X).mean(axis=1)
+
+
+def fit_backtest_model(model_name, X_train, y_train, n_jobs=1, random_state=42):
+    """
+    Fit one of BACKTEST_MODELS on lag windows.
+
+    The ROCKET models use the RocketRegressor set-up from rocket_cache; xgboost uses
+    the notebook's settings with a fixed number of trees, since the backtest has no
+    validation set for early stopping.
+
+    Returns:
+    object: Fitted model with predict(X).
+    """
+    if model_name == 'last_week':
+        return _LastWeek()
+    if model_name == 'window_mean':
+        return _WindowMean()
+    if model_name in ROCKET_MODELS:
+        from rocket_cache import fit_rocket_model
+        return fit_rocket_model(X_train, y_train, model_name, random_state=random_state, n_jobs=n_jobs)
+    if model_name == 'xgboost':
+        from apply_xgboost import make_xgboost_model
+        model = make_xgboost_model(n_estimators=500, early_stopping_rounds=None, n_jobs=n_jobs)
+        return model.fit(np.asarray(X_train), np.asarray(y_train))
+    raise ValueError(f"Unknown model {model_name}, must be one of {BACKTEST_MODELS}")
+
+
+def check_backtest_models(model_names, window_length):
+    """
+    Fail before any work starts if a model is unknown or its windows would be too
+    short (MiniROCKET needs at least 9 weeks), instead of inside a worker.
+    """
+    unknown = [model_name for model_name in model_names if model_name not in BACKTEST_MODELS]
+    if unknown:
+        raise ValueError(f"Unknown models {unknown}, must be among {BACKTEST_MODELS}")
+    rocket_models = [model_name for model_name in model_names if model_name in ROCKET_MODELS]
+    if rocket_models:
+        from rocket_cache import check_window_length
+        for model_name in rocket_models:
+            check_window_length(model_name, window_length)
+
+
+def build_backtest_windows(history, window_length=5, player_col='player_id', season_col='season',
+                           gameweek_col='gameweek', datetime_col='datetime', target_col='minutes'):
+    """
+    Lag windows of every row of a player-fixture history, computed once for all folds.
+
+    Each row's window holds the player's previous `window_length` values of
+    target_col (oldest first, across seasons), so the same rows can serve as test
+    rows for their own gameweek and as training rows for every later gameweek.
+    Rows without a full window are dropped.
+
+    Parameters:
+    history (pd.DataFrame): One row per player per fixture.
+    window_length (int): Number of previous matches per window.
+    player_col, season_col, gameweek_col, datetime_col, target_col (str): Column names.
+
+    Returns:
+    tuple: (rows, X) with `rows` the kept rows (sorted by time, with a 'time_key'
+           column of season * 100 + gameweek) and X the 2D window array.
+    """
+    history = history.sort_values([player_col, season_col, gameweek_col, datetime_col], kind='mergesort')
+    row_starts = group_row_starts(pd.factorize(history[player_col])[0])
+    X = lag_window_matrix(history[target_col].to_numpy(dtype=np.float64), row_starts, window_length)
+
+    keep = ~np.isnan(X).any(axis=1)
+    rows = history[keep].assign(time_key=history[season_col].astype(int) * 100 + history[gameweek_col].astype(int))
+    X = X[keep]
+
+    # Time order, so every fold's training rows are a prefix of the arrays
+    order = np.argsort(rows['time_key'].to_numpy(), kind='mergesort')
+    return rows.iloc[order].reset_index(drop=True), X[order]
+
+
+def _backtest_block(store_dir, model_names, train_end, test_start, test_end, n_jobs, random_state):
+    """
+    Fit every model on rows [0, train_end) and predict rows [test_start, test_end).
+
+    The ROCKET models read their features from the store (see run_backtest), so a
+    refit is only the ridge head on the first train_end feature rows. The features
+    are stored as float32 but the head is fitted in float64, like RocketRegressor.
+    """
+    X, y = load_position_arrays(store_dir, 'backtest')
+    X_train, y_train = X[:train_end], y[:train_end]
+    X_test = np.asarray(X[test_start:test_end])
+
+    predictions = {}
+    for model_name in model_names:
+        if model_name in ROCKET_MODELS:
+            from rocket_cache import fit_predict_ridge
+            F = load_position_keys(store_dir, 'backtest', [f'features_{model_name}'])[f'features_{model_name}']
+            y_pred = fit_predict_ridge(np.asarray(F[:train_end], dtype=np.float64), y_train,
+                                       np.asarray(F[test_start:test_end], dtype=np.float64))
+        else:
+            y_pred = fit_backtest_model(model_name, X_train, y_train, n_jobs, random_state).predict(X_test)
+        predictions[model_name] = np.asarray(y_pred, dtype=np.float64)
+    return test_start, test_end, predictions
+
+
+def _write_backtest_features(store_dir, model_name, fit_end, n_jobs, random_state):
+    """Transform every window once with the transform fitted on rows [0, fit_end); returns the seconds taken."""
+    from rocket_cache import write_rocket_features
+    start = time.perf_counter()
+    X, _ = load_position_arrays(store_dir, 'backtest')
+    write_rocket_features(os.path.join(store_dir, f'backtest_features_{model_name}.npy'), X[:fit_end], X,
+                          model_name, random_state=random_state, n_jobs=n_jobs)
+    return time.perf_counter() - start
+
+
+def run_backtest(history, season, model_names=('last_week', 'window_mean', 'rocket'), window_length=5,
+                 refit_every=1, first_gameweek=1, last_gameweek=38, max_workers=4, n_threads=None,
+                 random_state=42, player_col='player_id', season_col='season', gameweek_col='gameweek',
+                 datetime_col='datetime', target_col='minutes'):
+    """
+    Walk-forward (rolling-origin) backtest over the gameweeks of a season.
+
+    For each gameweek, every model is trained on all rows before that gameweek
+    (earlier seasons included) and predicts that gameweek's rows. Windows are built
+    once and shared by all folds; with refit_every=k the models are refitted every
+    k gameweeks and reused for the weeks in between (still only trained on data
+    before the first week of the block). Blocks are independent and run in
+    parallel; workers read the windows from a memory-mapped store.
+
+    The ROCKET transforms are fitted once, on the rows before the first predicted
+    gameweek, and every window is transformed once into the store (as float32);
+    each block then only refits the ridge head, in float64, on its prefix of the
+    features. The features never
+    see a predicted gameweek's rows, but MiniROCKET's biases are not refitted on
+    the later (longer) training prefixes.
+
+    Parameters:
+    history (pd.DataFrame): One row per player per fixture, see build_backtest_windows.
+    season (str or int): Season to backtest, e.g. 2425.
+    model_names (list): Any of BACKTEST_MODELS.
+    window_length (int): Number of previous matches per window.
+    refit_every (int): Gameweeks between refits.
+    first_gameweek, last_gameweek (int): Gameweeks of the season to predict.
+    max_workers (int): Worker processes.
+    n_threads (int): Threads per worker. Defaults to cores // max_workers.
+    random_state (int): Seed of the ROCKET kernels.
+
+    Returns:
+    pd.DataFrame: player_id, datetime, minutes and one prediction column per model,
+                  the layout read by the dashboard.
+    """
+    check_backtest_models(model_names, window_length)
+    rows, X = build_backtest_windows(history, window_length, player_col, season_col, gameweek_col,
+                                     datetime_col, target_col)
+    time_keys = rows['time_key'].to_numpy()
+    season = int(season)
+    if n_threads is None:
+        n_threads = threads_per_worker(max_workers)
+
+    # Row ranges of each refit block: train on everything before the block
+    blocks = []
+    for block_start in range(first_gameweek, last_gameweek + 1, refit_every):
+        block_end = min(block_start + refit_every - 1, last_gameweek)
+        start = np.searchsorted(time_keys, season * 100 + block_start, side='left')
+        end = np.searchsorted(time_keys, season * 100 + block_end, side='right')
+        if end > start and start > 0:
+            blocks.append((start, start, end))
+
+    predictions = {model_name: np.full(len(rows), np.nan) for model_name in model_names}
+    with tempfile.TemporaryDirectory() as store_dir:
+        write_position_arrays(store_dir, 'backtest', X, rows[target_col].to_numpy())
+        print(f"Backtesting {len(blocks)} blocks of {refit_every} gameweek(s) for {list(model_names)}")
+
+        start_time = time.perf_counter()
+        with make_executor(max_workers, n_threads) as executor:
+            # The transforms run in the workers too: numba threads started in this
+            # process before the pool forks can leave the workers hanging at exit
+            rocket_models = [model_name for model_name in model_names if model_name in ROCKET_MODELS] if blocks else []
+            feature_futures = {
+                model_name: executor.submit(_write_backtest_features, store_dir, model_name, blocks[0][0],
+                                            n_threads, random_state)
+                for model_name in rocket_models
+            }
+            for model_name, future in feature_futures.items():
+                print(f"{model_name} features of {len(X)} windows in {future.result():.1f}s")
+            futures = [
+                executor.submit(_backtest_block, store_dir, list(model_names), train_end, test_start, test_end,
+                                n_threads, random_state)
+                for train_end, test_start, test_end in blocks
+            ]
+            for future in futures:
+                test_start, test_end, block_predictions = future.result()
+                for model_name, values in block_predictions.items():
+                    predictions[model_name][test_start:test_end] = values
+        print(f"Backtest finished in {time.perf_counter() - start_time:.1f}s")
+
+    in_season = (time_keys >= season * 100 + first_gameweek) & (time_keys <= season * 100 + last_gameweek)
+    results = pd.DataFrame({
+        'player_id': rows[player_col].to_numpy(),
+        'datetime': rows[datetime_col].to_numpy(),
+        'minutes': rows[target_col].to_numpy(),
+        **predictions,
+    })[in_season]
+    return results.dropna(subset=list(model_names), how='all').reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the minutes models over a season.")
+    parser.add_argument("--input", "-i", required=True,
+                        help="CSV with one row per player per fixture: player_id, season, gameweek, datetime, minutes")
+    parser.add_argument("--season", "-s", required=True, help="Season to backtest, e.g. 2425")
+    parser.add_argument("--models", "-m", nargs="+", default=['last_week', 'window_mean', 'rocket'], choices=BACKTEST_MODELS)
+    parser.add_argument("--window_length", type=int, default=5, help="Number of previous matches per window (minirocket needs at least 9)")
+    parser.add_argument("--refit_every", type=int, default=1, help="Gameweeks between refits")
+    parser.add_argument("--workers", "-w", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--threads", type=int, default=None, help="Threads per worker (default: cores // workers)")
+    parser.add_argument("--output", "-o", default=None, help="Output CSV (default: ../results/backtest_<season>.csv)")
+    args = parser.parse_args()
+
+    history = pd.read_csv(args.input)
+    results = run_backtest(history, args.season, args.models, args.window_length, args.refit_every,
+                           max_workers=args.workers, n_threads=args.threads)
+
+    output = args.output or f'../results/backtest_{args.season}.csv'
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    results.to_csv(output)
+    print(f"Saved {len(results)} rows to {output}")
@@ -0,0 +1,333 @@
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Paths are resolved from this file, so the defaults work from any working directory
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+DEFAULT_SOURCE_DIR = os.path.join(ROOT, 'data_from_airsenal')
+DEFAULT_LAKE_DIR = os.path.join(ROOT, 'datasets', 'data_lake')
+CATALOG_FILE = 'catalog.json'
+
+
+def _json_records(path, key=None):
+    """Records of a JSON list file, or of the list stored under `key`."""
+    with open(path) as f:
+        data = json.load(f)
+    return pd.DataFrame(data[key] if key else data)
+
+
+def _read_player_details(path):
+    """player_details_<season>.json: {player name: [gameweek rows]} -> one row per player and gameweek."""
+    with open(path) as f:
+        data = json.load(f)
+    frames = [pd.DataFrame(rows).assign(name=name) for name, rows in data.items() if rows]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_player_summary(path):
+    """player_summary_<season>.json; older seasons store costs as '£5.1' instead of tenths (51)."""
+    df = _json_records(path)
+    if not pd.api.types.is_numeric_dtype(df['cost']):
+        df['cost'] = (pd.to_numeric(df['cost'].astype(str).str.lstrip('£')) * 10).round().astype('int64')
+    return df
+
+
+def _read_fixture_stats(path):
+    """The nested 'stats' of fixture_data_<season>.json as one row per fixture, stat, side and player."""
+    rows = []
+    for fixture in _json_records(path).to_dict('records'):
+        for stat in fixture['stats']:
+            for side in ('h', 'a'):
+                for entry in stat[side]:
+                    rows.append((fixture['id'], stat['identifier'], side, entry['element'], entry['value']))
+    return pd.DataFrame(rows, columns=['fixture_id', 'identifier', 'side', 'element', 'value'])
+
+
+def _read_goals_subs(path):
+    """goals_subs_data_<season>.json: {match id: match} -> one row per match (goals/subs kept as text)."""
+    with open(path) as f:
+        data = json.load(f)
+    return pd.DataFrame([{'match_id': int(match_id), **match} for match_id, match in data.items()])
+
+
+def _read_csv(path):
+    """CSV file, without the unnamed index column some of them were saved with."""
+    df = pd.read_csv(path)
+    return df.loc[:, ~df.columns.str.startswith('Unnamed:')]
+
+
+# table -> (file pattern, reader). '{season}' in the pattern is a 4-digit season
+# such as 2324; patterns without it are read into a single unpartitioned table,
+# with '{position}' added as a column.
+TABLES = {
+    'fpl_players': ('FPL_{season}.json', lambda path: _json_records(path, 'elements')),
+    'fpl_teams': ('FPL_{season}.json', lambda path: _json_records(path, 'teams')),
+    'fpl_gameweeks': ('FPL_{season}.json', lambda path: _json_records(path, 'events')),
+    'player_summary': ('player_summary_{season}.json', _read_player_summary),
+    'player_details': ('player_details_{season}.json', _read_player_details),
+    'player_minutes': ('player_minutes_with_extra_columns_{season}.csv', _read_csv),
+    'fixtures': ('fixture_data_{season}.json', lambda path: _json_records(path).drop(columns='stats')),
+    'fixture_stats': ('fixture_data_{season}.json', _read_fixture_stats),
+    'goals_subs': ('goals_subs_data_{season}.json', _read_goals_subs),
+    'results': ('results_{season}.csv', _read_csv),
+    'results_with_gw': ('results_{season}_with_gw.csv', _read_csv),
+    'absences': ('absences_{season}.csv', _read_csv),
+    'teams': ('teams_{season}.csv', _read_csv),
+    'fifa_team_ratings': ('fifa_team_ratings_{season}.csv', _read_csv),
+    'airsenal_transfers': ('airsenal_transfer_{season}.json', _json_records),
+    'airsenal_history': ('airsenal_history_{season}.json', lambda path: _json_records(path, 'current')),
+    'player_history': ('player_history_{position}.csv', _read_csv),
+}
+
+
+def find_table_files(table, source_dir=DEFAULT_SOURCE_DIR):
+    """
+    Source files of a table.
+
+    Parameters:
+    table (str): Key of TABLES.
+    source_dir (str): Directory of the raw files.
+
+    Returns:
+    dict: Partition value (season, or position for unpartitioned tables) -> file path.
+    """
+    pattern, _ = TABLES[table]
+    regex = re.compile(re.escape(pattern).replace(r'\{season\}', r'(\d{4})').replace(r'\{position\}', r'(\w+)') + '$')
+    files = {}
+    for path in sorted(glob.glob(os.path.join(source_dir, '*'))):
+        match = regex.match(os.path.basename(path))
+        if match:
+            files[match.group(1)] = path
+    return files
+
+
+def _drop_nested_columns(df):
+    """Drop columns holding lists or dicts (e.g. chip_plays), which have no flat dtype."""
+    nested = [col for col in df.columns
+              if df[col].dtype == object and df[col].map(lambda v: isinstance(v, (list, dict))).any()]
+    return df.drop(columns=nested)
+
+
+def _common_dtypes(frames):
+    """
+    One dtype per column for all partitions of a table.
+
+    Text columns that parse as numbers become numbers; a column that is integer in
+    one season and float (or missing) in another becomes float64, and anything
+    that is not numeric or boolean in every partition becomes a string.
+    """
+    dtypes = {}
+    for df in frames:
+        for col in df.columns:
+            values = df[col]
+            if values.dtype == object or pd.api.types.is_string_dtype(values):
+                numeric = pd.to_numeric(values, errors='coerce')
+                if numeric.notna().sum() == values.notna().sum() and values.notna().any():
+                    values = numeric
+            if pd.api.types.is_bool_dtype(values):
+                kind = np.dtype(bool)
+            elif pd.api.types.is_numeric_dtype(values):
+                kind = values.dtype
+            else:
+                kind = np.dtype(object)
+            dtypes.setdefault(col, []).append(kind)
+
+    common = {}
+    for col, kinds in dtypes.items():
+        if any(kind == object for kind in kinds):
+            common[col] = 'string'
+        elif all(kind == bool for kind in kinds):
+            common[col] = 'boolean'
+        else:
+            kinds = [np.dtype('int64') if kind == bool else kind for kind in kinds]
+            dtype = np.result_type(*kinds)
+            # Columns missing from some partitions are filled with NaN
+            if np.issubdtype(dtype, np.integer) and len(kinds) < len(frames):
+                dtype = np.dtype('float64')
+            common[col] = dtype.name
+    return common
+
+
+def _cast(df, dtypes):
+    """Cast a partition to the table's dtypes, adding missing columns as nulls."""
+    df = df.reindex(columns=list(dtypes))
+    for col, dtype in dtypes.items():
+        if dtype == 'string':
+            df[col] = df[col].astype('string')
+        elif dtype == 'boolean':
+            df[col] = df[col].astype('boolean')
+        else:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+    return df
+
+
+def _source_state(path):
+    """Size and modification time of a source file, to detect changes."""
+    stat = os.stat(path)
+    return {'path': os.path.basename(path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def load_catalog(lake_dir=DEFAULT_LAKE_DIR):
+    """
+    The lake's catalog: per table, its partitions, columns and source files.
+
+    Returns:
+    dict: Empty dict when the lake has not been built yet.
+    """
+    path = os.path.join(lake_dir, CATALOG_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def ingest_table(table, source_dir=DEFAULT_SOURCE_DIR, lake_dir=DEFAULT_LAKE_DIR):
+    """
+    Convert all source files of one table into Parquet partitions.
+
+    Season tables are written to <lake_dir>/<table>/season=<season>/data.parquet
+    with a 'season' column; tables without a season in their file names (the
+    player_history_<position>.csv files) are written to <lake_dir>/<table>/data.parquet
+    with the partition value as a column. All partitions share one schema.
+
+    Parameters:
+    table (str): Key of TABLES.
+    source_dir (str): Directory of the raw files.
+    lake_dir (str): Root of the Parquet dataset.
+
+    Returns:
+    dict: The table's catalog entry.
+    """
+    pattern, reader = TABLES[table]
+    partition_col = 'season' if '{season}' in pattern else 'position'
+    files = find_table_files(table, source_dir)
+
+    frames = []
+    for value, path in files.items():
+        df = _drop_nested_columns(reader(path))
+        frames.append(df.assign(**{partition_col: value}))
+    dtypes = _common_dtypes(frames)
+    dtypes[partition_col] = 'string'
+    frames = [_cast(df, dtypes) for df in frames]
+
+    table_dir = os.path.join(lake_dir, table)
+    os.makedirs(table_dir, exist_ok=True)
+    if partition_col == 'season':
+        partitions = {}
+        for value, df in zip(files, frames):
+            path = os.path.join(table_dir, f'season={value}', 'data.parquet')
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+            partitions[value] = {'path': os.path.relpath(path, lake_dir), 'rows': len(df)}
+    else:
+        df = pd.concat(frames, ignore_index=True)
+        path = os.path.join(table_dir, 'data.parquet')
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path)
+        partitions = {'all': {'path': os.path.relpath(path, lake_dir), 'rows': len(df)}}
+
+    return {
+        'partitioned_by': partition_col if partition_col == 'season' else None,
+        'columns': dtypes,
+        'partitions': partitions,
+        'sources': [_source_state(path) for path in files.values()],
+        'ingested': datetime.now().isoformat(),
+    }
+
+
+def build_data_lake(source_dir=DEFAULT_SOURCE_DIR, lake_dir=DEFAULT_LAKE_DIR, tables=None, rebuild=False):
+    """
+    Ingest the raw season files into the Parquet lake and write its catalog.
+
+    A table is only re-ingested when its source files changed (added, removed,
+    resized or touched) since the last build.
+
+    Parameters:
+    source_dir (str): Directory of the raw files.
+    lake_dir (str): Root of the Parquet dataset.
+    tables (list): Tables to ingest. Defaults to all of TABLES.
+    rebuild (bool): Re-ingest even if the sources are unchanged.
+
+    Returns:
+    dict: The catalog.
+    """
+    catalog = load_catalog(lake_dir)
+    for table in tables or TABLES:
+        sources = [_source_state(path) for path in find_table_files(table, source_dir).values()]
+        if not sources:
+            print(f"{table}: no source files in {source_dir}")
+            continue
+        if not rebuild and table in catalog and catalog[table]['sources'] == sources:
+            continue
+        start = time.perf_counter()
+        catalog[table] = ingest_table(table, source_dir, lake_dir)
+        n_rows = sum(p['rows'] for p in catalog[table]['partitions'].values())
+        print(f"{table}: {n_rows} rows in {len(catalog[table]['partitions'])} partitions "
+              f"({time.perf_counter() - start:.2f}s)")
+
+    os.makedirs(lake_dir, exist_ok=True)
+    with open(os.path.join(lake_dir, CATALOG_FILE), 'w') as f:
+        json.dump(catalog, f, indent=2)
+    return catalog
+
+
+def load_table(table, seasons=None, columns=None, lake_dir=DEFAULT_LAKE_DIR):
+    """
+    Read a table from the lake, touching only the requested seasons and columns.
+
+    Parameters:
+    table (str): Table name, see TABLES.
+    seasons (list): Seasons to read, e.g. ['2223', '2324']. Defaults to all.
+    columns (list): Columns to read. Defaults to all; the 'season' column is
+                    always included for season tables.
+    lake_dir (str): Root of the Parquet dataset.
+
+    Returns:
+    pd.DataFrame: The rows of the selected partitions.
+    """
+    catalog = load_catalog(lake_dir)
+    if table not in catalog:
+        raise ValueError(f"Table {table} is not in the data lake at {lake_dir}; run data_lake.py first")
+    entry = catalog[table]
+
+    if columns is not None:
+        unknown = set(columns) - set(entry['columns'])
+        if unknown:
+            raise ValueError(f"Unknown columns {sorted(unknown)} for table {table}")
+        if entry['partitioned_by'] == 'season' and 'season' not in columns:
+            columns = list(columns) + ['season']
+
+    partitions = entry['partitions']
+    if seasons is not None:
+        if entry['partitioned_by'] != 'season':
+            raise ValueError(f"Table {table} is not partitioned by season")
+        seasons = [str(season) for season in seasons]
+        missing = set(seasons) - set(partitions)
+        if missing:
+            raise ValueError(f"Seasons {sorted(missing)} not available for table {table}")
+        partitions = {season: partitions[season] for season in seasons}
+
+    tables = [pq.read_table(os.path.join(lake_dir, p['path']), columns=columns) for p in partitions.values()]
+    return pa.concat_tables(tables).to_pandas()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert the data_from_airsenal files into a Parquet data lake.")
+    parser.add_argument("--source_dir", default=DEFAULT_SOURCE_DIR, help="Directory of the raw season files")
+    parser.add_argument("--lake_dir", default=DEFAULT_LAKE_DIR, help="Output directory of the Parquet dataset")
+    parser.add_argument("--tables", nargs="+", default=None, choices=list(TABLES), help="Tables to ingest")
+    parser.add_argument("--rebuild", action="store_true", help="Re-ingest tables whose sources are unchanged")
+    args = parser.parse_args()
+
+    catalog = build_data_lake(args.source_dir, args.lake_dir, args.tables, args.rebuild)
+    print(f"\n{len(catalog)} tables in {args.lake_dir}:")
+    for table, entry in catalog.items():
+        print(f"  {table}: {', '.join(entry['partitions'])}")
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+
+def get_minutes_columns(df):
+    """
+    Return the ordered list of lag-window columns (minutes_0 ... minutes_k) in a frame.
+
+    Parameters:
+    df (pd.DataFrame): Per-position frame from the training/validation dictionary.
+
+    Returns:
+    list: Column names, oldest week first.
+    """
+    num_minutes = len([col for col in df.columns if col.startswith('minutes_')])
+    return [f'minutes_{i}' for i in range(num_minutes)]
+
+
+def write_position_arrays(store_dir, position, X, y, keys=None):
+    """
+    Write one position's arrays to the store as plain .npy files.
+
+    Parameters:
+    store_dir (str): Directory of the store.
+    position (str): Position name, e.g. 'FWD'.
+    X (np.ndarray): 2D array of lag windows, one row per sample.
+    y (np.ndarray): 1D array of target minutes.
+    keys (dict): Optional extra arrays (e.g. out_player_id, other feature windows) saved alongside.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    np.save(os.path.join(store_dir, f'{position}_X.npy'), np.ascontiguousarray(X, dtype=np.float64))
+    np.save(os.path.join(store_dir, f'{position}_y.npy'), np.ascontiguousarray(y, dtype=np.float64))
+    for name, values in (keys or {}).items():
+        np.save(os.path.join(store_dir, f'{position}_{name}.npy'), np.asarray(values))
+
+
+def build_dataset_store(dict_path, store_dir=None, positions=None, rebuild=False):
+    """
+    Convert a pickled training/validation dictionary into a memory-mappable store.
+
+    The pickle is read once and every position's minutes_* columns and out_minutes
+    target are written to their own .npy files. Workers can then attach to those
+    files with load_position_arrays instead of unpickling the whole dictionary.
+    The store is only rebuilt when the pickle is newer than the store.
+
+    Parameters:
+    dict_path (str): Path to e.g. datasets/training_dictionary.pkl.
+    store_dir (str): Output directory. Defaults to the pickle path without '.pkl'.
+    positions (list): Positions to convert. Defaults to all keys of the dictionary.
+    rebuild (bool): Force a rebuild even if the store is up to date.
+
+    Returns:
+    str: The store directory.
+    """
+    if store_dir is None:
+        store_dir = os.path.splitext(dict_path)[0]
+    meta_file = os.path.join(store_dir, 'store.json')
+
+    if not rebuild and os.path.exists(meta_file):
+        with open(meta_file) as f:
+            meta = json.load(f)
+        up_to_date = os.path.getmtime(meta_file) >= os.path.getmtime(dict_path)
+        if up_to_date and (positions is None or set(positions) <= set(meta['positions'])):
+            return store_dir
+
+    with open(dict_path, 'rb') as f:
+        data_dict = pickle.load(f)
+
+    if positions is None:
+        positions = list(data_dict.keys())
+
+    meta = {'source': os.path.abspath(dict_path), 'positions': [], 'columns': {}}
+    for position in positions:
+        df = data_dict[position]
+        minutes_columns = get_minutes_columns(df)
+        keys = {}
+        if 'out_player_id' in df.columns:
+            keys['out_player_id'] = df['out_player_id'].to_numpy()
+        if 'out_datetime' in df.columns:
+            keys['out_datetime'] = pd.to_datetime(df['out_datetime']).to_numpy()
+        write_position_arrays(store_dir, position, df[minutes_columns].to_numpy(), df['out_minutes'].to_numpy(), keys)
+        meta['positions'].append(position)
+        meta['columns'][position] = minutes_columns
+
+    with open(meta_file, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    return store_dir
+
+
+def load_position_arrays(store_dir, position):
+    """
+    Attach to one position's arrays in the store without copying them into memory.
+
+    Parameters:
+    store_dir (str): Directory created by build_dataset_store.
+    position (str): Position name, e.g. 'FWD'.
+
+    Returns:
+    tuple: (X, y) read-only memory-mapped arrays.
+    """
+    X = np.load(os.path.join(store_dir, f'{position}_X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(store_dir, f'{position}_y.npy'), mmap_mode='r')
+    return X, y
+
+
+def load_position_keys(store_dir, position, names=('out_player_id', 'out_datetime')):
+    """
+    Attach to the key arrays saved alongside a position's windows.
+
+    Parameters:
+    store_dir (str): Directory created by build_dataset_store.
+    position (str): Position name, e.g. 'FWD'.
+    names (list): Key names to look for.
+
+    Returns:
+    dict: name -> memory-mapped array, for the keys present in the store.
+    """
+    keys = {}
+    for name in names:
+        path = os.path.join(store_dir, f'{position}_{name}.npy')
+        if os.path.exists(path):
+            keys[name] = np.load(path, mmap_mode='r')
+    return keys
+
+
+def position_version(store_dir, position):
+    """
+    Identity of one position's data in a store, for keying results computed from it.
+
+    Hashes the dtype, shape and content of the position's X, y and key arrays, so
+    the version only changes when that position's data does: rebuilding the store
+    (from the same or a re-saved pickle) or adding positions keeps it.
+
+    Parameters:
+    store_dir (str): Directory created by build_dataset_store.
+    position (str): Position name, e.g. 'FWD'.
+
+    Returns:
+    str: 16 hex characters.
+    """
+    h = hashlib.sha1()
+    prefix = f'{position}_'
+    for name in sorted(os.listdir(store_dir)):
+        if name.startswith(prefix) and name.endswith('.npy'):
+            values = np.load(os.path.join(store_dir, name), mmap_mode='r', allow_pickle=False)
+            h.update(f'{name}:{values.dtype.str}:{values.shape}\n'.encode())
+            for start in range(0, len(values), 1_000_000):
+                h.update(memoryview(np.ascontiguousarray(values[start:start + 1_000_000])).cast('B'))
+    return h.hexdigest()[:16]
@@ -0,0 +1,192 @@
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import as_completed
+from datetime import datetime
+
+import pandas as pd
+
+from parallel_resources import make_executor
+
+
+def experiment_grid(**axes):
+    """
+    All combinations of the given experiment axes as config dicts.
+
+    Example: experiment_grid(model=['rocket'], position=['GK', 'FWD'], random_state=[1, 2])
+    gives four configs.
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+
+def experiment_fingerprint(config, data_version=None):
+    """
+    Stable identifier of an experiment config: sha1 of its canonical JSON.
+
+    Parameters:
+    config (dict): JSON-serialisable experiment settings.
+    data_version (str): Identity of the input data (e.g. dataset_store.position_version).
+                        When given it is hashed in, so the same config on changed
+                        data is a new experiment.
+
+    Returns:
+    str: 16 hex characters.
+    """
+    if data_version is not None:
+        config = {**config, 'data_version': data_version}
+    canonical = json.dumps(config, sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()[:16]
+
+
+def append_job_event(log_path, fingerprint, status, config, result=None):
+    """
+    Append one job state change ('started', 'completed' or 'error') to the JSONL log.
+
+    Each event is a single line written and flushed at once, so a crash can at
+    most lose (or truncate) the last line.
+    """
+    event = {
+        'fingerprint': fingerprint,
+        'status': status,
+        'config': config,
+        'result': result,
+        'timestamp': datetime.now().isoformat(),
+    }
+    with open(log_path, 'a') as f:
+        f.write(json.dumps(event, default=str) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_job_states(log_path):
+    """
+    Replay the job log and return the latest event of every job.
+
+    Parameters:
+    log_path (str): JSONL log written by append_job_event.
+
+    Returns:
+    dict: fingerprint -> latest event dict.
+    """
+    states = {}
+    if not os.path.exists(log_path):
+        return states
+    with open(log_path) as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                # Partially written line from a crash
+                continue
+            states[event['fingerprint']] = event
+    return states
+
+
+def _config_data_version(config, data_version):
+    """The data version of one config: data_version itself, or data_version(config) if it is callable."""
+    return data_version(config) if callable(data_version) else data_version
+
+
+def pending_experiments(configs, log_path, retry_errors=False, data_version=None):
+    """
+    Configs that still need to run: not completed, or interrupted ('started' with no
+    later event), or failed if retry_errors. Duplicate configs are run once. Results
+    of another data_version don't count as done.
+
+    Returns:
+    list: (fingerprint, config) pairs.
+    """
+    states = load_job_states(log_path)
+    done = {'completed'} if retry_errors else {'completed', 'error'}
+
+    pending = {}
+    for config in configs:
+        fingerprint = experiment_fingerprint(config, _config_data_version(config, data_version))
+        state = states.get(fingerprint)
+        if state is None or state['status'] not in done:
+            pending[fingerprint] = config
+    return list(pending.items())
+
+
+def append_summary_row(results_file, row):
+    """
+    Append one result row to the summary CSV without rewriting it.
+
+    Rows are written in the column order of the existing header. Only if a row has
+    columns the header doesn't know (e.g. the first run after adding an experiment
+    axis) is the file rewritten once with the extra columns.
+    """
+    new_row = pd.DataFrame([row])
+    if not os.path.exists(results_file) or os.path.getsize(results_file) == 0:
+        new_row.to_csv(results_file, index=False)
+        return
+
+    header = pd.read_csv(results_file, nrows=0).columns.tolist()
+    if set(new_row.columns) <= set(header):
+        new_row.reindex(columns=header).to_csv(results_file, mode='a', header=False, index=False)
+    else:
+        pd.concat([pd.read_csv(results_file), new_row], ignore_index=True).to_csv(results_file, index=False)
+
+
+def run_experiments(configs, run_fn, log_path, results_file, max_workers=4, retry_errors=False, n_threads=None,
+                    data_version=None, **fixed_kwargs):
+    """
+    Run experiment configs in a process pool, skipping work that is already done.
+
+    Every config is fingerprinted and its state kept in an append-only JSONL log
+    next to the summary CSV. Completed (and, unless retry_errors, failed) configs
+    are skipped, so an interrupted sweep resumes where it stopped. Each finished job
+    appends one row to the summary CSV and one event to the log.
+
+    Parameters:
+    configs (list): Experiment config dicts, e.g. from experiment_grid.
+    run_fn (callable): Picklable function called as run_fn(**config, **fixed_kwargs)
+                       in a worker, returning a result dict with a 'status' key
+                       ('completed' or 'error').
+    log_path (str): JSONL job log.
+    results_file (str): Summary CSV.
+    max_workers (int): Number of worker processes.
+    retry_errors (bool): Run configs whose previous attempt failed again.
+    n_threads (int): BLAS/OpenMP/numba threads per worker. Defaults to cores // max_workers.
+    data_version (str or callable): Identity of the training/validation data, or a
+                        function of the config returning it (e.g. per position). It is
+                        hashed into the fingerprint and saved with each result; it is
+                        not passed to run_fn.
+    **fixed_kwargs: Arguments shared by every job (e.g. data store paths).
+
+    Returns:
+    list: Result dicts of the jobs run in this call.
+    """
+    pending = pending_experiments(configs, log_path, retry_errors, data_version)
+    fingerprints = {experiment_fingerprint(c, _config_data_version(c, data_version)) for c in configs}
+    n_skipped = len(fingerprints) - len(pending)
+    print(f"{len(pending)} experiments to run, {n_skipped} already done")
+    if not pending:
+        return []
+
+    results = []
+    with make_executor(max_workers, n_threads) as executor:
+        future_to_job = {}
+        for fingerprint, config in pending:
+            append_job_event(log_path, fingerprint, 'started', config)
+            future_to_job[executor.submit(run_fn, **config, **fixed_kwargs)] = (fingerprint, config)
+
+        for future in as_completed(future_to_job):
+            fingerprint, config = future_to_job[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {**config, 'status': 'error', 'error_message': str(e),
+                          'timestamp': datetime.now().isoformat()}
+
+            result = {**result, 'fingerprint': fingerprint}
+            if data_version is not None:
+                result['data_version'] = _config_data_version(config, data_version)
+            append_summary_row(results_file, result)
+            append_job_event(log_path, fingerprint, result.get('status', 'completed'), config, result)
+            results.append(result)
+            print(f"✓ Saved results for {fingerprint} ({result.get('status')})")
+
+    return results
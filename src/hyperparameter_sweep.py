@@ -0,0 +1,288 @@
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import build_dataset_store, load_position_arrays
+from experiment_scheduler import append_summary_row, experiment_fingerprint, experiment_grid
+from parallel_resources import make_executor, threads_per_worker
+
+# Default search space: one sub-space per model family. Lists are grid values (or
+# sampled uniformly in random search); ('loguniform', low, high), ('uniform', low, high)
+# and ('int', low, high) are ranges for random search.
+SEARCH_SPACE = {
+    'rocket': {
+        'model': ['rocket'],
+        'num_kernels': [1000, 5000, 10000],
+        'window_length': [5, 10, None],
+    },
+    # MiniROCKET needs windows of at least 9 weeks (see rocket_cache.MIN_WINDOW_LENGTH)
+    'minirocket': {
+        'model': ['minirocket'],
+        'num_kernels': [1000, 5000, 10000],
+        'window_length': [10, None],
+    },
+    'xgboost': {
+        'model': ['xgboost'],
+        'max_depth': [2, 4, 6],
+        'learning_rate': ('loguniform', 0.01, 0.3),
+        'window_length': [5, 10, None],
+    },
+}
+
+# Grid values used for range parameters when a space is expanded as a grid
+GRID_POINTS = 3
+# Share of a trial's training rows held out for XGBoost early stopping, so the
+# validation set that ranks the trials is never seen during fitting
+EARLY_STOPPING_FRACTION = 0.2
+
+
+def _grid_values(values):
+    """Grid values of one parameter: the list itself, or GRID_POINTS points of a range."""
+    if isinstance(values, list):
+        return values
+    kind, low, high = values
+    if kind == 'loguniform':
+        return list(np.geomspace(low, high, GRID_POINTS))
+    if kind == 'int':
+        return sorted({int(v) for v in np.linspace(low, high, GRID_POINTS).round()})
+    return list(np.linspace(low, high, GRID_POINTS))
+
+
+def _sample_value(values, rng):
+    """One random draw of a parameter."""
+    if isinstance(values, list):
+        return rng.choice(values)
+    kind, low, high = values
+    if kind == 'loguniform':
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    if kind == 'int':
+        return rng.randint(low, high)
+    return rng.uniform(low, high)
+
+
+def grid_trials(space=SEARCH_SPACE):
+    """Every combination of every sub-space, as trial config dicts."""
+    trials = []
+    for sub_space in space.values():
+        trials += experiment_grid(**{name: _grid_values(values) for name, values in sub_space.items()})
+    return trials
+
+
+def random_trials(space=SEARCH_SPACE, n_trials=20, seed=0):
+    """
+    `n_trials` random configs, spread evenly over the sub-spaces.
+
+    Duplicate draws (possible with small grids) are dropped.
+    """
+    rng = random.Random(seed)
+    sub_spaces = list(space.values())
+    trials = {}
+    for i in range(n_trials):
+        sub_space = sub_spaces[i % len(sub_spaces)]
+        trial = {name: _sample_value(values, rng) for name, values in sub_space.items()}
+        trials[experiment_fingerprint(trial)] = trial
+    return list(trials.values())
+
+
+def split_valid_trials(trials, n_timepoints):
+    """
+    Split trials into those that can run on windows of `n_timepoints` weeks and
+    those whose lag window is too short for their ROCKET transform.
+
+    A trial's window is its window_length, capped at (and defaulting to) n_timepoints.
+
+    Returns:
+    tuple: (valid, skipped) lists of trials.
+    """
+    from rocket_cache import MIN_WINDOW_LENGTH
+    valid, skipped = [], []
+    for trial in trials:
+        window_length = min(trial.get('window_length') or n_timepoints, n_timepoints)
+        if window_length < MIN_WINDOW_LENGTH.get(trial['model'], 1):
+            skipped.append(trial)
+        else:
+            valid.append(trial)
+    return valid, skipped
+
+
+def _subsample(n_rows, fraction, seed):
+    """Sorted indices of a random `fraction` of the rows (all rows for fraction 1)."""
+    if fraction >= 1:
+        return slice(None)
+    rng = np.random.default_rng(seed)
+    return np.sort(rng.choice(n_rows, size=max(1, int(n_rows * fraction)), replace=False))
+
+
+def run_trial(trial, position, train_store, val_store, budget=1.0, n_threads=1, cache_dir=None, random_state=42):
+    """
+    Fit one trial config on a fraction of the training rows and score it on the validation set.
+
+    The validation rows are only used for scoring: XGBoost trials early-stop on
+    EARLY_STOPPING_FRACTION of their training rows instead.
+
+    Parameters:
+    trial (dict): Config from grid_trials/random_trials; 'model' selects the family.
+    position (str): Position name, e.g. 'FWD'.
+    train_store (str): Training store directory from build_dataset_store.
+    val_store (str): Validation store directory from build_dataset_store.
+    budget (float): Fraction of the training rows to use (successive-halving rung).
+    n_threads (int): Threads of the ROCKET transform and xgboost; the worker's BLAS,
+                     OpenMP and numba pools are capped by the run_sweep executor.
+    cache_dir (str): ROCKET feature cache directory.
+    random_state (int): Seed of the ROCKET kernels and the subsample.
+
+    Returns:
+    dict: The trial config with position, budget, mae, rmse, fit_seconds and status.
+    """
+    result = {**trial, 'position': position, 'budget': budget}
+    start = time.perf_counter()
+    try:
+        X_train, y_train = load_position_arrays(train_store, position)
+        X_val, y_val = load_position_arrays(val_store, position)
+        rows = _subsample(len(y_train), budget, random_state)
+        X_train, y_train = X_train[rows], np.asarray(y_train[rows])
+        y_val = np.asarray(y_val)
+
+        window_length = trial.get('window_length')
+        if window_length is not None:
+            X_train = X_train[:, -window_length:]
+            X_val = X_val[:, -window_length:]
+
+        if trial['model'] == 'xgboost':
+            from apply_xgboost import fit_predict_xgboost
+            params = {k: v for k, v in trial.items() if k not in ('model', 'window_length')}
+            # Early stopping uses held-out training rows, not the validation set the trial is scored on
+            stop = np.zeros(len(y_train), dtype=bool)
+            stop[_subsample(len(y_train), EARLY_STOPPING_FRACTION, random_state)] = True
+            _, model = fit_predict_xgboost(X_train[~stop], y_train[~stop], X_train[stop], y_train[stop],
+                                           return_model=True, n_jobs=n_threads, **params)
+            y_pred = model.predict(np.asarray(X_val))
+        else:
+            from apply_rocket import fit_predict_rocket
+            y_pred = fit_predict_rocket(X_train, y_train, X_val, rocket_model=trial['model'],
+                                        num_kernels=trial.get('num_kernels', 10000), random_state=random_state,
+                                        cache_dir=cache_dir, n_jobs=n_threads)
+
+        result.update({
+            'mae': float(np.mean(np.abs(y_val - y_pred))),
+            'rmse': float(np.sqrt(np.mean((y_val - y_pred) ** 2))),
+            'status': 'completed',
+        })
+    except Exception as e:
+        result.update({'mae': None, 'rmse': None, 'status': 'error', 'error_message': str(e)})
+    result['fit_seconds'] = round(time.perf_counter() - start, 2)
+    result['timestamp'] = datetime.now().isoformat()
+    return result
+
+
+def successive_halving_rungs(min_budget=0.25, eta=2):
+    """Training-data fractions of the rungs, e.g. [0.25, 0.5, 1.0] for min_budget 0.25 and eta 2."""
+    rungs = [1.0]
+    while rungs[0] / eta >= min_budget:
+        rungs.insert(0, rungs[0] / eta)
+    return rungs
+
+
+def run_sweep(trials, position, train_store, val_store, max_workers=4, n_threads=None, min_budget=0.25,
+              eta=2, results_file=None, cache_dir=None, random_state=42):
+    """
+    Run trials in a process pool with successive halving.
+
+    All trials are first fitted on `min_budget` of the training rows; after each
+    rung only the best 1/eta (by validation MAE) continue to the next, larger rung,
+    so clearly bad configs stop early and most of the compute goes to promising
+    ones. Trials whose lag window is too short for their model (e.g. MiniROCKET
+    on 5 weeks) are skipped up front instead of failing in a worker. Each worker gets n_threads threads so workers x threads does not exceed
+    the cores.
+
+    Parameters:
+    trials (list): Trial configs from grid_trials or random_trials.
+    position (str): Position name, e.g. 'FWD'.
+    train_store (str): Training store directory.
+    val_store (str): Validation store directory.
+    max_workers (int): Number of worker processes.
+    n_threads (int): Threads per trial. Defaults to cores // max_workers.
+    min_budget (float): Training fraction of the first rung. 1 disables early stopping.
+    eta (int): Keep the best 1/eta trials after each rung.
+    results_file (str): Summary CSV; one row is appended per finished trial and rung.
+    cache_dir (str): ROCKET feature cache directory.
+    random_state (int): Seed of the ROCKET kernels and the subsamples.
+
+    Returns:
+    pd.DataFrame: One row per trial and rung, best full-budget trials first.
+    """
+    if n_threads is None:
+        n_threads = threads_per_worker(max_workers)
+
+    n_timepoints = load_position_arrays(train_store, position)[0].shape[1]
+    survivors, skipped = split_valid_trials(trials, n_timepoints)
+    for trial in skipped:
+        print(f"Skipping {trial}: lag window too short for {trial['model']} ({n_timepoints} weeks in the store)")
+
+    results = []
+    rungs = successive_halving_rungs(min_budget, eta)
+    for i_rung, budget in enumerate(rungs):
+        print(f"Rung {i_rung + 1}/{len(rungs)}: {len(survivors)} trials on {budget:.0%} of the training data")
+        rung_results = []
+        with make_executor(max_workers, n_threads) as executor:
+            futures = [
+                executor.submit(run_trial, trial, position, train_store, val_store, budget, n_threads,
+                                cache_dir, random_state)
+                for trial in survivors
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                result['rung'] = i_rung
+                rung_results.append(result)
+                if results_file is not None:
+                    append_summary_row(results_file, result)
+                print(f"  {result['status']} {({k: result[k] for k in trial_keys(result)})}: MAE={result['mae']}")
+
+        results += rung_results
+        completed = [r for r in rung_results if r['status'] == 'completed']
+        if i_rung < len(rungs) - 1:
+            n_keep = max(1, math.ceil(len(completed) / eta))
+            best = sorted(completed, key=lambda r: r['mae'])[:n_keep]
+            survivors = [{k: r[k] for k in trial_keys(r)} for r in best]
+
+    return pd.DataFrame(results).sort_values(['rung', 'mae'], ascending=[False, True], ignore_index=True)
+
+
+def trial_keys(result):
+    """The config keys of a trial result (everything run_trial doesn't add)."""
+    added = {'position', 'budget', 'mae', 'rmse', 'status', 'error_message', 'fit_seconds', 'timestamp', 'rung'}
+    return [k for k in result if k not in added]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hyperparameter sweep for the minutes models.")
+    parser.add_argument("--positions", "-p", nargs="+", default=['GK', 'DEF', 'MID', 'FWD'], help="Positions to sweep")
+    parser.add_argument("--search", choices=['grid', 'random'], default='random', help="Search strategy")
+    parser.add_argument("--n_trials", type=int, default=20, help="Number of random trials")
+    parser.add_argument("--workers", "-w", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--threads", type=int, default=None, help="Threads per trial (default: cores // workers)")
+    parser.add_argument("--min_budget", type=float, default=0.25, help="Training fraction of the first rung")
+    parser.add_argument("--eta", type=int, default=2, help="Keep the best 1/eta trials per rung")
+    parser.add_argument("--train", default='../datasets/training_dictionary.pkl', help="Training dictionary pickle")
+    parser.add_argument("--val", default='../datasets/validation_dictionary.pkl', help="Validation dictionary pickle")
+    parser.add_argument("--output_dir", default='../outputs/sweeps', help="Directory of the sweep results")
+    args = parser.parse_args()
+
+    trials = grid_trials() if args.search == 'grid' else random_trials(n_trials=args.n_trials)
+    train_store = build_dataset_store(args.train, positions=args.positions)
+    val_store = build_dataset_store(args.val, positions=args.positions)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    for position in args.positions:
+        results = run_sweep(trials, position, train_store, val_store, args.workers, args.threads,
+                            args.min_budget, args.eta, f'{args.output_dir}/sweep_results.csv',
+                            cache_dir='../outputs/rocket_experiments/feature_cache')
+        print(f"\nBest {position} trials:")
+        print(results[results['rung'] == results['rung'].max()].head(5))
@@ -0,0 +1,256 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from rolling_features import feature_name, group_row_starts, window_matrix_stat
+
+
+def _order_values(column):
+    """Order column as a comparable NumPy array: datetimes as int64 ns, numbers as float64, the rest as str."""
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    if pd.api.types.is_numeric_dtype(column):
+        return column.to_numpy(dtype=np.float64)
+    return column.astype(str).to_numpy(dtype=str)
+
+
+def _is_later(keys, previous):
+    """Rows whose order key (list of arrays, one per order column) is strictly after `previous`."""
+    later = np.zeros(len(keys[0]), dtype=bool)
+    equal = np.ones(len(keys[0]), dtype=bool)
+    for key, prev in zip(keys, previous):
+        later |= equal & (key > prev)
+        equal &= key == prev
+    return later
+
+
+def init_feature_state(history, columns=('minutes',), size=10, group_col='player', order_cols=('week',)):
+    """
+    Build per-player ring buffers holding the last `size` rows of each player's history.
+
+    Parameters:
+    history (pd.DataFrame): All rows seen so far, one per player per fixture.
+    columns (list): Columns to keep in the buffers, e.g. ['minutes', 'xG'].
+    size (int): Buffer length; the largest window or lag count that can be served.
+    group_col (str): Column identifying the player.
+    order_cols (list): Columns giving the time order within a player.
+
+    Returns:
+    dict: The feature state, see update_gameweek_features.
+    """
+    history = history.sort_values([group_col] + list(order_cols), kind='mergesort')
+    codes, players = pd.factorize(history[group_col])
+    values = history[list(columns)].to_numpy(dtype=np.float64)
+
+    # Rank of each row counted from the player's most recent row
+    row_starts = group_row_starts(codes)
+    n_rows_per_player = np.bincount(codes, minlength=len(players))
+    rank_from_end = row_starts + n_rows_per_player[codes] - 1 - np.arange(len(codes))
+
+    count = np.minimum(n_rows_per_player, size)
+    keep = rank_from_end < size
+    slot = count[codes[keep]] - 1 - rank_from_end[keep]
+
+    buffer = np.full((len(players), size, len(columns)), np.nan)
+    buffer[codes[keep], slot] = values[keep]
+
+    players = np.asarray(players)
+    if players.dtype == object:
+        players = players.astype(str)
+
+    # Order key of each player's most recent row, so older rows can be rejected later
+    last_rows = np.flatnonzero(rank_from_end == 0)
+    last = []
+    for col in order_cols:
+        order_values = _order_values(history[col])
+        player_last = np.zeros(len(players), dtype=order_values.dtype)
+        player_last[codes[last_rows]] = order_values[last_rows]
+        last.append(player_last)
+
+    return {
+        'columns': list(columns),
+        'size': size,
+        'group_col': group_col,
+        'order_cols': list(order_cols),
+        'players': players,
+        'buffer': buffer,
+        'position': count % size,
+        'count': count,
+        'last': last,
+    }
+
+
+def save_feature_state(state, path):
+    """Save the feature state to a single .npz file."""
+    np.savez(path, columns=np.asarray(state['columns']), size=state['size'],
+             group_col=state['group_col'], order_cols=np.asarray(state['order_cols']),
+             players=state['players'], buffer=state['buffer'],
+             position=state['position'], count=state['count'],
+             **{f'last_{i}': last for i, last in enumerate(state['last'])})
+
+
+def load_feature_state(path):
+    """Load a feature state written by save_feature_state."""
+    with np.load(path) as data:
+        order_cols = data['order_cols'].tolist()
+        return {
+            'columns': data['columns'].tolist(),
+            'size': int(data['size']),
+            'group_col': str(data['group_col']),
+            'order_cols': order_cols,
+            'players': data['players'],
+            'buffer': data['buffer'],
+            'position': data['position'],
+            'count': data['count'],
+            'last': [data[f'last_{i}'] for i in range(len(order_cols))],
+        }
+
+
+def _add_players(state, players):
+    """Append empty buffers for players not seen before and return every player's index."""
+    index = pd.Index(state['players'])
+    new_players = pd.Index(pd.unique(players)).difference(index)
+    if len(new_players) > 0:
+        n_new = len(new_players)
+        players_all = np.concatenate([state['players'], np.asarray(new_players)])
+        # Keep names as a fixed-width str array; an object array can't be reloaded from the .npz
+        if players_all.dtype == object:
+            players_all = players_all.astype(str)
+        state['players'] = players_all
+        state['buffer'] = np.concatenate([state['buffer'], np.full((n_new,) + state['buffer'].shape[1:], np.nan)])
+        state['position'] = np.concatenate([state['position'], np.zeros(n_new, dtype=state['position'].dtype)])
+        state['count'] = np.concatenate([state['count'], np.zeros(n_new, dtype=state['count'].dtype)])
+        state['last'] = [np.concatenate([last, np.zeros(n_new, dtype=last.dtype)]) for last in state['last']]
+        index = pd.Index(state['players'])
+    return index.get_indexer(players)
+
+
+def _check_rows_are_new(state, new_rows):
+    """
+    Raise a ValueError if a row is not after its player's last row in the state.
+
+    Rows of the same player within new_rows may share a key (two fixtures in a
+    double gameweek ordered by week only); they are pushed one per pass in their
+    order in new_rows.
+    """
+    group_col = state['group_col']
+    keys = [_order_values(new_rows[col]) for col in state['order_cols']]
+    state_idx = pd.Index(state['players']).get_indexer(new_rows[group_col].to_numpy())
+    seen = state_idx >= 0
+    seen[seen] = state['count'][state_idx[seen]] > 0
+
+    previous = [last[np.maximum(state_idx, 0)].astype(key.dtype) for key, last in zip(keys, state['last'])]
+    stale = seen & ~_is_later(keys, previous)
+    if stale.any():
+        example = new_rows.iloc[np.flatnonzero(stale)[0]]
+        raise ValueError(f"{stale.sum()} rows are not newer than the rows already in the feature state "
+                         f"(e.g. {group_col}={example[group_col]}, "
+                         + ", ".join(f"{col}={example[col]}" for col in state['order_cols'])
+                         + "); was this gameweek already added?")
+
+
+def _recent_values(state, player_idx, window):
+    """Last `window` buffered rows of each player, oldest first, NaN-padded."""
+    size = state['size']
+    steps = np.arange(window)
+    order = (state['position'][player_idx, None] - window + steps[None, :]) % size
+    recent = state['buffer'][player_idx[:, None], order]
+    missing = steps[None, :] < window - state['count'][player_idx, None]
+    recent[missing] = np.nan
+    return recent
+
+
+def update_gameweek_features(state, new_rows, windows=(3, 5, 10), stats=('mean', 'median', 'std', 'sum'), n_lags=0):
+    """
+    Compute features for a new gameweek's rows from the ring buffers, then append the rows.
+
+    Features are lagged (they only use rows before the current one), so they are
+    computed before the new rows are pushed into the buffers. Players with more than
+    one fixture in the gameweek are handled in order, one fixture per pass. The cost
+    depends only on the number of new rows, not on the length of the history.
+
+    Every row must come after the player's last row in the state (by order_cols); a
+    gameweek that was already added raises a ValueError before the state is
+    changed, since pushing it again would shift every lag. Rows within new_rows
+    may share a key, e.g. both fixtures of a double gameweek when ordering by week.
+
+    Parameters:
+    state (dict): Feature state from init_feature_state or load_feature_state. Updated in place.
+    new_rows (pd.DataFrame): The new gameweek's rows, with the state's columns.
+    windows (list): Rolling window sizes, each at most the buffer size.
+    stats (list): Any of 'mean', 'median', 'std', 'sum'.
+    n_lags (int): Also return lag-window columns '{column}_0' ... '{column}_{n_lags - 1}',
+                  oldest first, as used for the minutes_* inputs of apply_rocket.
+
+    Returns:
+    pd.DataFrame: new_rows sorted by player and time, with the feature columns added.
+    """
+    size = state['size']
+    if max(list(windows) + [n_lags]) > size:
+        raise ValueError(f"Windows and lags must not exceed the buffer size ({size})")
+
+    group_col = state['group_col']
+    new_rows = new_rows.sort_values([group_col] + state['order_cols'], kind='mergesort')
+    _check_rows_are_new(state, new_rows)
+    player_idx = _add_players(state, new_rows[group_col].to_numpy())
+    values = new_rows[state['columns']].to_numpy(dtype=np.float64)
+
+    keys = [_order_values(new_rows[col]) for col in state['order_cols']]
+
+    # Fixture number of each row within this update, per player
+    passes = new_rows.groupby(group_col, sort=False).cumcount().to_numpy()
+
+    features = {}
+    for i_pass in range(passes.max() + 1 if len(passes) else 0):
+        rows = np.flatnonzero(passes == i_pass)
+        idx = player_idx[rows]
+
+        for c, column in enumerate(state['columns']):
+            for window in windows:
+                recent = _recent_values(state, idx, window)[:, :, c]
+                for stat in stats:
+                    name = feature_name(column, window, stat)
+                    features.setdefault(name, np.full(len(new_rows), np.nan))[rows] = window_matrix_stat(recent, stat)
+
+            if n_lags:
+                recent = _recent_values(state, idx, n_lags)[:, :, c]
+                for lag in range(n_lags):
+                    features.setdefault(f'{column}_{lag}', np.full(len(new_rows), np.nan))[rows] = recent[:, lag]
+
+        # Push this pass's rows into the buffers
+        state['buffer'][idx, state['position'][idx]] = values[rows]
+        state['position'][idx] = (state['position'][idx] + 1) % size
+        state['count'][idx] = np.minimum(state['count'][idx] + 1, size)
+        for last, key in zip(state['last'], keys):
+            last[idx] = key[rows]
+
+    return new_rows.assign(**features)
+
+
+def refresh_gameweek_features(state_path, new_rows, history=None, **kwargs):
+    """
+    Weekly refresh: load the on-disk state, add one gameweek and save the state again.
+
+    Parameters:
+    state_path (str): Path of the .npz state file.
+    new_rows (pd.DataFrame): The new gameweek's rows.
+    history (pd.DataFrame): Full history used to create the state if it doesn't exist yet.
+    **kwargs: Passed to update_gameweek_features (windows, stats, n_lags), plus
+              columns, size, group_col and order_cols for init_feature_state.
+
+    Returns:
+    pd.DataFrame: Features for the new rows.
+    """
+    init_args = {key: kwargs.pop(key) for key in ['columns', 'size', 'group_col', 'order_cols'] if key in kwargs}
+
+    if os.path.exists(state_path):
+        state = load_feature_state(state_path)
+    elif history is not None:
+        state = init_feature_state(history, **init_args)
+    else:
+        raise FileNotFoundError(f"No feature state at {state_path} and no history to build it from")
+
+    features = update_gameweek_features(state, new_rows, **kwargs)
+    save_feature_state(state, state_path)
+    return features
@@ -0,0 +1,189 @@
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then left out
+    resource = None
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MB (None where unsupported).
+
+    ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    scale = 1024 ** 2 if os.uname().sysname == 'Darwin' else 1024
+    return round(peak / scale, 1)
+
+
+class StageTimer:
+    """
+    Records the wall time, CPU time and peak RSS of the stages of one job.
+
+    Usage:
+        timer = StageTimer('rocket_FWD')
+        with timer.stage('load'):
+            ...
+        result.update(timer.summary())
+
+    The CPU time is that of the whole process (all threads), so a stage using
+    several BLAS/numba threads can have more CPU than wall time. The peak RSS is
+    the process's peak up to the end of the stage; in a reused pool worker it can
+    include earlier jobs, so a stage only "owns" the peak when it raised it.
+    """
+
+    def __init__(self, job=None):
+        self.job = job
+        self.spans = []
+
+    @contextmanager
+    def stage(self, name, **args):
+        """Time the body of the with block as stage `name`; args are kept in the trace."""
+        start_time = time.time()
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        rss_before = peak_rss_mb()
+        try:
+            yield
+        finally:
+            rss_after = peak_rss_mb()
+            self.spans.append({
+                'name': name,
+                'job': self.job,
+                'start': start_time,
+                'wall_seconds': time.perf_counter() - start_wall,
+                'cpu_seconds': time.process_time() - start_cpu,
+                'peak_rss_mb': rss_after,
+                'rss_growth_mb': None if rss_after is None else round(rss_after - rss_before, 1),
+                'pid': os.getpid(),
+                'tid': threading.get_native_id(),
+                'args': args,
+            })
+
+    def summary(self):
+        """
+        Flat per-stage columns for a results summary row.
+
+        Returns:
+        dict: '<stage>_seconds', '<stage>_cpu_seconds' and '<stage>_peak_rss_mb'
+              per stage (repeated stages are summed), plus 'total_seconds'.
+        """
+        row = {}
+        for span in self.spans:
+            name = span['name']
+            row[f'{name}_seconds'] = round(row.get(f'{name}_seconds', 0) + span['wall_seconds'], 4)
+            row[f'{name}_cpu_seconds'] = round(row.get(f'{name}_cpu_seconds', 0) + span['cpu_seconds'], 4)
+            row[f'{name}_peak_rss_mb'] = span['peak_rss_mb']
+        row['total_seconds'] = round(sum(span['wall_seconds'] for span in self.spans), 4)
+        return row
+
+    def trace_events(self):
+        """The spans as Chrome trace 'complete' events (microsecond timestamps)."""
+        return [{
+            'name': span['name'],
+            'cat': span['job'] or 'job',
+            'ph': 'X',
+            'ts': int(span['start'] * 1e6),
+            'dur': int(span['wall_seconds'] * 1e6),
+            'pid': span['pid'],
+            'tid': span['tid'],
+            'args': {'job': span['job'], 'cpu_seconds': round(span['cpu_seconds'], 4),
+                     'peak_rss_mb': span['peak_rss_mb'], 'rss_growth_mb': span['rss_growth_mb'],
+                     **span['args']},
+        } for span in self.spans]
+
+
+def append_trace_events(trace_path, events):
+    """
+    Append trace events to a JSONL file, one event per line.
+
+    The events of a job are written with a single write call, so worker processes
+    can share one file, and a crashed run keeps the traces of its finished jobs.
+    """
+    if not events:
+        return
+    with open(trace_path, 'a') as f:
+        f.write(''.join(json.dumps(event, default=str) + '\n' for event in events))
+        f.flush()
+
+
+def load_trace_events(trace_path):
+    """Events of a JSONL trace file, skipping a partially written last line."""
+    events = []
+    if not os.path.exists(trace_path):
+        return events
+    with open(trace_path) as f:
+        for line in f:
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return events
+
+
+def export_chrome_trace(trace_path, output_path):
+    """
+    Write the events of a JSONL trace file as a Chrome trace JSON file.
+
+    The output opens in chrome://tracing or https://ui.perfetto.dev, with one row
+    per worker process, so idle workers and slow stages of a parallel run show up.
+
+    Returns:
+    int: Number of events written.
+    """
+    events = load_trace_events(trace_path)
+    pids = sorted({event['pid'] for event in events})
+    metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': f'worker {pid}'}} for pid in pids]
+    with open(output_path, 'w') as f:
+        json.dump({'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}, f)
+    return len(events)
+
+
+def stage_report(trace_path):
+    """
+    Totals per stage over a whole run: wall and CPU seconds, share of the wall time,
+    and the largest peak RSS.
+
+    Returns:
+    list: One dict per stage, slowest first.
+    """
+    totals = {}
+    for event in load_trace_events(trace_path):
+        stage = totals.setdefault(event['name'], {'stage': event['name'], 'count': 0, 'wall_seconds': 0.0,
+                                                  'cpu_seconds': 0.0, 'peak_rss_mb': None})
+        stage['count'] += 1
+        stage['wall_seconds'] += event['dur'] / 1e6
+        stage['cpu_seconds'] += event['args'].get('cpu_seconds') or 0.0
+        rss = event['args'].get('peak_rss_mb')
+        if rss is not None:
+            stage['peak_rss_mb'] = max(stage['peak_rss_mb'] or 0.0, rss)
+
+    total_wall = sum(stage['wall_seconds'] for stage in totals.values()) or 1.0
+    for stage in totals.values():
+        stage['share'] = stage['wall_seconds'] / total_wall
+    return sorted(totals.values(), key=lambda stage: stage['wall_seconds'], reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarise a run's stage trace and export it for chrome://tracing.")
+    parser.add_argument("--trace", "-t", default='../outputs/rocket_experiments/rocket_trace.jsonl',
+                        help="JSONL trace written by the experiment workers")
+    parser.add_argument("--output", "-o", default=None, help="Chrome trace JSON (default: <trace>.json)")
+    args = parser.parse_args()
+
+    for stage in stage_report(args.trace):
+        rss = '' if stage['peak_rss_mb'] is None else f"  peak RSS {stage['peak_rss_mb']:.0f} MB"
+        print(f"{stage['stage']:12s} {stage['count']:4d}x  {stage['wall_seconds']:9.2f}s wall  "
+              f"{stage['cpu_seconds']:9.2f}s CPU  {stage['share']:6.1%}{rss}")
+
+    output = args.output or os.path.splitext(args.trace)[0] + '.json'
+    print(f"Exported {export_chrome_trace(args.trace, output)} events to {output}")
@@ -0,0 +1,201 @@
+import argparse
+import json
+import os
+import pickle
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from dataset_store import build_dataset_store, load_position_arrays
+
+DEFAULT_REGISTRY_DIR = '../outputs/model_registry'
+MODEL_TYPES = ['rocket', 'minirocket', 'multirocket', 'xgboost']
+
+# Models already unpickled in this process, keyed by path, with the file's mtime
+_loaded_models = {}
+
+
+def model_path(registry_dir, position, model_name):
+    """Path of a registered model's pickle; the JSON sidecar sits next to it."""
+    return os.path.join(registry_dir, position, f'{model_name}.pkl')
+
+
+def save_model(model, position, model_name, window_length, registry_dir=DEFAULT_REGISTRY_DIR, metadata=None):
+    """
+    Persist a fitted per-position model with a JSON sidecar describing it.
+
+    Parameters:
+    model: Fitted regressor with a predict(X) method taking 2D lag windows.
+    position (str): Position name, e.g. 'FWD'.
+    model_name (str): Name to register the model under, e.g. 'rocket'.
+    window_length (int): Number of minutes_* columns the model was trained on.
+    registry_dir (str): Root directory of the registry.
+    metadata (dict): Extra fields for the sidecar (e.g. validation metrics).
+
+    Returns:
+    str: Path of the saved model.
+    """
+    path = model_path(registry_dir, position, model_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Write to a temporary file first so readers never see a half-written model
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+    sidecar = {
+        'model_name': model_name,
+        'position': position,
+        'window_length': int(window_length),
+        'model_class': type(model).__name__,
+        'created': datetime.now().isoformat(),
+        **(metadata or {}),
+    }
+    with open(path.replace('.pkl', '.json'), 'w') as f:
+        json.dump(sidecar, f, indent=2)
+
+    return path
+
+
+def load_model(position, model_name, registry_dir=DEFAULT_REGISTRY_DIR):
+    """
+    Load a registered model and its sidecar, reusing the copy already in memory
+    unless the file changed since.
+
+    Returns:
+    tuple: (model, sidecar dict)
+    """
+    path = model_path(registry_dir, position, model_name)
+    mtime = os.path.getmtime(path)
+    cached = _loaded_models.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, 'rb') as f:
+            model = pickle.load(f)
+        with open(path.replace('.pkl', '.json')) as f:
+            sidecar = json.load(f)
+        cached = (mtime, model, sidecar)
+        _loaded_models[path] = cached
+    return cached[1], cached[2]
+
+
+def list_models(registry_dir=DEFAULT_REGISTRY_DIR):
+    """All registered models as a DataFrame, one row per sidecar."""
+    rows = []
+    if os.path.isdir(registry_dir):
+        for position in sorted(os.listdir(registry_dir)):
+            position_dir = os.path.join(registry_dir, position)
+            if not os.path.isdir(position_dir):
+                continue
+            for filename in sorted(os.listdir(position_dir)):
+                if filename.endswith('.json'):
+                    with open(os.path.join(position_dir, filename)) as f:
+                        rows.append(json.load(f))
+    return pd.DataFrame(rows)
+
+
+def predict_batch(position, windows, model_name='rocket', registry_dir=DEFAULT_REGISTRY_DIR, chunk_size=1024):
+    """
+    Score any number of lag windows with a registered model, in fixed-size chunks.
+
+    Only one chunk is converted and transformed at a time (a ROCKET transform of
+    1024 windows with 10,000 kernels is about 160 MB of features), so memory stays
+    bounded however many windows are passed; windows can be a memory-mapped array.
+
+    Parameters:
+    position (str): Position name, e.g. 'FWD'.
+    windows (np.ndarray): 2D array (n_windows x window_length), oldest week first,
+                          like the minutes_* columns.
+    model_name (str): Registered model to use.
+    registry_dir (str): Root directory of the registry.
+    chunk_size (int): Number of windows scored per chunk.
+
+    Returns:
+    np.ndarray: Predicted minutes, one per window.
+    """
+    model, sidecar = load_model(position, model_name, registry_dir)
+    windows = np.asanyarray(windows)
+
+    if windows.ndim != 2 or windows.shape[1] != sidecar['window_length']:
+        raise ValueError(
+            f"{model_name} for {position} expects windows of length {sidecar['window_length']}, "
+            f"got array of shape {windows.shape}"
+        )
+
+    predictions = np.empty(len(windows), dtype=np.float64)
+    for start in range(0, len(windows), chunk_size):
+        chunk = np.asarray(windows[start:start + chunk_size], dtype=np.float64)
+        predictions[start:start + len(chunk)] = model.predict(chunk)
+    return predictions
+
+
+def train_position_model(model_name, position, train_store, val_store, registry_dir=DEFAULT_REGISTRY_DIR,
+                         cache_dir=None, random_state=42):
+    """
+    Fit one model type for one position on the dataset stores and register it.
+
+    Parameters:
+    model_name (str): One of MODEL_TYPES.
+    position (str): Position name, e.g. 'FWD'.
+    train_store (str): Training store directory from build_dataset_store.
+    val_store (str): Validation store directory from build_dataset_store.
+    registry_dir (str): Root directory of the registry.
+    cache_dir (str): ROCKET feature cache directory (see rocket_cache).
+    random_state (int): Seed of the ROCKET kernels.
+
+    Returns:
+    dict: The model's sidecar.
+    """
+    X_train, y_train = load_position_arrays(train_store, position)
+    X_val, y_val = load_position_arrays(val_store, position)
+    y_val = np.asarray(y_val)
+
+    start = time.perf_counter()
+    if model_name == 'xgboost':
+        from apply_xgboost import fit_predict_xgboost
+        y_pred, model = fit_predict_xgboost(X_train, y_train, X_val, y_val, return_model=True)
+    else:
+        from apply_rocket import fit_predict_rocket
+        y_pred, model = fit_predict_rocket(X_train, y_train, X_val, rocket_model=model_name, cache_dir=cache_dir,
+                                           random_state=random_state, return_model=True)
+    fit_seconds = time.perf_counter() - start
+
+    metadata = {
+        'mae': float(np.mean(np.abs(y_val - y_pred))),
+        'rmse': float(np.sqrt(np.mean((y_val - y_pred) ** 2))),
+        'n_train': len(y_train),
+        'n_val': len(y_val),
+        'fit_seconds': round(fit_seconds, 2),
+        'random_state': random_state,
+    }
+    save_model(model, position, model_name, X_train.shape[1], registry_dir, metadata)
+    _, sidecar = load_model(position, model_name, registry_dir)
+    return sidecar
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train per-position minutes models and save them to the model registry.")
+    parser.add_argument("--models", "-m", nargs="+", default=['rocket', 'xgboost'], choices=MODEL_TYPES, help="Model types to train")
+    parser.add_argument("--positions", "-p", nargs="+", default=['GK', 'DEF', 'MID', 'FWD'], help="Positions to train")
+    parser.add_argument("--train", default='../datasets/training_dictionary.pkl', help="Training dictionary pickle")
+    parser.add_argument("--val", default='../datasets/validation_dictionary.pkl', help="Validation dictionary pickle")
+    parser.add_argument("--registry_dir", default=DEFAULT_REGISTRY_DIR, help="Registry directory")
+    parser.add_argument("--cache_dir", default='../outputs/rocket_experiments/feature_cache', help="ROCKET feature cache directory")
+    args = parser.parse_args()
+
+    train_store = build_dataset_store(args.train, positions=args.positions)
+    val_store = build_dataset_store(args.val, positions=args.positions)
+
+    for model_name in args.models:
+        for position in args.positions:
+            sidecar = train_position_model(model_name, position, train_store, val_store, args.registry_dir, args.cache_dir)
+            print(f"Registered {model_name}-{position}: MAE={sidecar['mae']:.3f}, RMSE={sidecar['rmse']:.3f}")
+
+            # Time scoring of the whole validation set through the batched API
+            X_val, _ = load_position_arrays(val_store, position)
+            start = time.perf_counter()
+            predict_batch(position, X_val, model_name, args.registry_dir)
+            print(f"  predict_batch: {len(X_val)} windows in {time.perf_counter() - start:.2f}s")
+
+    print(list_models(args.registry_dir))
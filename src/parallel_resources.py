@@ -0,0 +1,82 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# Thread pool sizes read by OpenMP, the BLAS libraries, numexpr and numba
+THREAD_ENV_VARS = [
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+    'NUMBA_NUM_THREADS',
+]
+
+
+def available_cores():
+    """Number of cores this process may run on (respects CPU affinity / container limits)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS and Windows
+        return os.cpu_count() or 1
+
+
+def threads_per_worker(max_workers, n_cores=None):
+    """
+    Threads each worker may use so that workers x threads does not exceed the cores.
+
+    Parameters:
+    max_workers (int): Number of worker processes.
+    n_cores (int): Cores to share. Defaults to available_cores().
+
+    Returns:
+    int: At least 1.
+    """
+    if n_cores is None:
+        n_cores = available_cores()
+    return max(1, n_cores // max_workers)
+
+
+def limit_threads(n_threads):
+    """
+    Cap every thread pool of the current process at n_threads.
+
+    The environment variables cover libraries that are not loaded yet (and child
+    processes); threadpoolctl resizes BLAS/OpenMP pools that are already loaded;
+    numba's pool is resized if numba has been imported.
+    """
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(n_threads)
+
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(n_threads)
+    except ImportError:
+        pass
+
+    try:
+        import numba
+        numba.set_num_threads(min(n_threads, numba.config.NUMBA_NUM_THREADS))
+    except ImportError:
+        pass
+
+
+def init_worker(n_threads):
+    """ProcessPoolExecutor initializer: limit the worker's threads before it runs any job."""
+    limit_threads(n_threads)
+
+
+def make_executor(max_workers=4, n_threads=None):
+    """
+    ProcessPoolExecutor whose workers each use at most n_threads threads.
+
+    Parameters:
+    max_workers (int): Number of worker processes.
+    n_threads (int): Threads per worker. Defaults to threads_per_worker(max_workers).
+
+    Returns:
+    ProcessPoolExecutor: The executor; use it as a context manager.
+    """
+    if n_threads is None:
+        n_threads = threads_per_worker(max_workers)
+    print(f"Using {max_workers} workers x {n_threads} threads on {available_cores()} cores")
+    return ProcessPoolExecutor(max_workers=max_workers, initializer=init_worker, initargs=(n_threads,))
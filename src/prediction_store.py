@@ -0,0 +1,140 @@
+import argparse
+import glob
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Typed columns of the store: predictions and minutes as float32, ids as int32,
+# kickoff times as datetime64 in seconds
+KEY_DTYPES = {'player_id': np.int32, 'datetime': 'datetime64[s]', 'minutes': np.float32}
+PREDICTION_DTYPE = np.float32
+
+
+def _save_atomic(path, values):
+    """np.save through a temporary file, so concurrent jobs never read a partial file."""
+    tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+    np.save(tmp_path, values)
+    os.replace(tmp_path, path)
+
+
+def write_predictions(store_dir, position, column, y_pred, y_true, keys=None, metadata=None):
+    """
+    Append one job's predictions to the store.
+
+    The rows of a position are the same for every job (the validation windows), so
+    the key columns (player_id, datetime, minutes) are written once per position and
+    each job only adds its predictions as <position>/pred_<column>.npy with a
+    <position>/pred_<column>.json sidecar. Writing the same column again replaces it.
+
+    Parameters:
+    store_dir (str): Directory of the prediction store.
+    position (str): Position name, e.g. 'FWD'.
+    column (str): Model column in the collated output, e.g. 'rocket' or 'rocket_w10'.
+    y_pred (np.ndarray): Predictions, one per validation row.
+    y_true (np.ndarray): True minutes of the same rows.
+    keys (dict): 'out_player_id' and 'out_datetime' arrays of the rows (see
+                 dataset_store.load_position_keys).
+    metadata (dict): Settings and scores of the job, stored in the sidecar.
+
+    Returns:
+    str: Path of the predictions file.
+    """
+    position_dir = os.path.join(store_dir, position)
+    os.makedirs(position_dir, exist_ok=True)
+    keys = keys or {}
+
+    columns = {'minutes': y_true}
+    if 'out_player_id' in keys:
+        columns['player_id'] = keys['out_player_id']
+    if 'out_datetime' in keys:
+        columns['datetime'] = pd.to_datetime(keys['out_datetime']).to_numpy()
+
+    for name, values in columns.items():
+        values = np.asarray(values).astype(KEY_DTYPES[name])
+        if len(values) != len(y_pred):
+            raise ValueError(f"{name} has {len(values)} rows but there are {len(y_pred)} predictions")
+        path = os.path.join(position_dir, f'{name}.npy')
+        if os.path.exists(path):
+            existing = np.load(path, mmap_mode='r')
+            if len(existing) != len(values) or not np.array_equal(existing, values):
+                raise ValueError(f"{name} of {position} differs from the rows already in {store_dir}; "
+                                 f"predictions of different validation sets need separate stores")
+        else:
+            _save_atomic(path, values)
+
+    pred_path = os.path.join(position_dir, f'pred_{column}.npy')
+    _save_atomic(pred_path, np.asarray(y_pred, dtype=PREDICTION_DTYPE))
+    sidecar = {'column': column, 'position': position, 'n_rows': len(y_pred),
+               'timestamp': datetime.now().isoformat(), **(metadata or {})}
+    with open(os.path.join(position_dir, f'pred_{column}.json'), 'w') as f:
+        json.dump(sidecar, f, indent=2, default=str)
+    return pred_path
+
+
+def list_predictions(store_dir):
+    """
+    Sidecars of every job in the store.
+
+    Returns:
+    pd.DataFrame: One row per position and column with the job's metadata.
+    """
+    rows = []
+    for path in sorted(glob.glob(os.path.join(store_dir, '*', 'pred_*.json'))):
+        with open(path) as f:
+            rows.append(json.load(f))
+    return pd.DataFrame(rows)
+
+
+def read_predictions(store_dir, positions=None, columns=None):
+    """
+    Read the store in the dashboard's layout: player_id, datetime, minutes, <model columns>.
+
+    Positions are stacked; a model missing for a position is NaN there.
+
+    Parameters:
+    store_dir (str): Directory of the prediction store.
+    positions (list): Positions to read. Defaults to all.
+    columns (list): Model columns to read. Defaults to all.
+
+    Returns:
+    pd.DataFrame: One row per validation sample.
+    """
+    if positions is None:
+        positions = sorted(name for name in os.listdir(store_dir) if os.path.isdir(os.path.join(store_dir, name)))
+
+    frames = []
+    for position in positions:
+        position_dir = os.path.join(store_dir, position)
+        missing = [name for name in KEY_DTYPES if not os.path.exists(os.path.join(position_dir, f'{name}.npy'))]
+        if missing:
+            raise ValueError(f"{position} predictions have no {missing} columns; rebuild the validation "
+                             f"store from a dictionary with out_player_id and out_datetime")
+
+        frame = {name: np.load(os.path.join(position_dir, f'{name}.npy')) for name in KEY_DTYPES}
+        for path in sorted(glob.glob(os.path.join(position_dir, 'pred_*.npy'))):
+            column = os.path.basename(path)[len('pred_'):-len('.npy')]
+            if columns is None or column in columns:
+                frame[column] = np.load(path)
+        frames.append(pd.DataFrame(frame))
+
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a prediction store as a dashboard CSV.")
+    parser.add_argument("--store", "-s", default='../outputs/rocket_experiments/predictions',
+                        help="Directory of the prediction store")
+    parser.add_argument("--positions", "-p", nargs="+", default=None, help="Positions to export")
+    parser.add_argument("--columns", "-c", nargs="+", default=None, help="Model columns to export")
+    parser.add_argument("--output", "-o", default='../results/collated/rocket_predictions.csv', help="Output CSV")
+    args = parser.parse_args()
+
+    print(list_predictions(args.store).to_string(index=False))
+    df = read_predictions(args.store, args.positions, args.columns)
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    # The dashboard drops the first column, so the index is written
+    df.to_csv(args.output)
+    print(f"Saved {len(df)} rows to {args.output}")
@@ -0,0 +1,337 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import Ridge, RidgeCV
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+try:
+    from sktime.transformations.rocket import MiniRocket, MultiRocket, Rocket
+except ImportError:  # older sktime versions
+    from sktime.transformations.panel.rocket import MiniRocket, MultiRocket, Rocket
+
+# Same transforms and ridge alphas as sktime's RocketRegressor
+ROCKET_TRANSFORMS = {'rocket': Rocket, 'minirocket': MiniRocket, 'multirocket': MultiRocket}
+DEFAULT_ALPHAS = np.logspace(-3, 3, 10)
+# Shortest lag window each transform accepts: MiniROCKET's kernels span 9 time points,
+# and MultiROCKET also applies them to the first differences (one point shorter)
+MIN_WINDOW_LENGTH = {'rocket': 1, 'minirocket': 9, 'multirocket': 10}
+# Size the feature cache is pruned to after each new entry (least recently used entries go first)
+MAX_CACHE_GB = 20
+
+
+def array_hash(X):
+    """
+    Content hash of an array: its dtype, shape and bytes.
+
+    Parameters:
+    X (np.ndarray): Array to hash (memory-mapped arrays are fine).
+
+    Returns:
+    str: Hex sha256 digest.
+    """
+    X = np.ascontiguousarray(X)
+    h = hashlib.sha256()
+    h.update(f'{X.dtype.str}{X.shape}'.encode())
+    h.update(memoryview(X).cast('B'))
+    return h.hexdigest()
+
+
+def make_rocket_transform(rocket_model='rocket', num_kernels=10000, random_state=42, n_jobs=1):
+    """Create the sktime ROCKET, MiniROCKET or MultiROCKET transform."""
+    if rocket_model not in ROCKET_TRANSFORMS:
+        raise ValueError(f"Unknown rocket_model {rocket_model}, must be one of {list(ROCKET_TRANSFORMS)}")
+    return ROCKET_TRANSFORMS[rocket_model](num_kernels=num_kernels, random_state=random_state, n_jobs=n_jobs)
+
+
+def check_window_length(rocket_model, window_length):
+    """
+    Raise a ValueError if the lag windows are too short for the transform.
+
+    Parameters:
+    rocket_model (str): 'rocket', 'minirocket' or 'multirocket'.
+    window_length (int): Number of time points per window.
+    """
+    min_length = MIN_WINDOW_LENGTH.get(rocket_model, 1)
+    if window_length < min_length:
+        raise ValueError(f"{rocket_model} needs lag windows of at least {min_length} weeks, "
+                         f"got {window_length}; use a longer window_length or another model")
+
+
+def rocket_cache_key(X_train, X_val, rocket_model, num_kernels, random_state):
+    """
+    Cache key of one (train, validation) feature pair.
+
+    The validation features depend on the training windows too (MiniROCKET fits its
+    biases on the training data), so both arrays are part of the key.
+    """
+    params = {
+        'train': array_hash(X_train),
+        'val': array_hash(X_val),
+        'rocket_model': rocket_model,
+        'num_kernels': num_kernels,
+        'random_state': random_state,
+        'dtype': 'float32',
+    }
+    key = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:24]
+    return key, params
+
+
+def _to_panel(X):
+    """2D (samples x time points) windows as the 3D (samples x 1 x time points) panel sktime expects."""
+    return np.asarray(X, dtype=np.float64)[:, None, :]
+
+
+def rocket_features(X_train, X_val, rocket_model='rocket', num_kernels=10000, random_state=42,
+                    cache_dir=None, n_jobs=1, max_cache_gb=MAX_CACHE_GB):
+    """
+    ROCKET feature matrices of the training and validation windows, cached on disk.
+
+    The transform is fitted on the training windows and applied to both arrays. With
+    a cache_dir, the results are stored as float32 .npy files under a key built from
+    the content of both arrays, the transform, num_kernels and random_state; later
+    calls with the same inputs load them (memory-mapped) instead of running the
+    convolutions. Caching needs a fixed integer random_state, otherwise the kernels
+    differ per run. After a new entry is written the cache is pruned to max_cache_gb,
+    least recently used entries first (see prune_rocket_cache).
+
+    Parameters:
+    X_train (np.ndarray): 2D training lag windows.
+    X_val (np.ndarray): 2D validation lag windows.
+    rocket_model (str): 'rocket', 'minirocket' or 'multirocket'.
+    num_kernels (int): Number of kernels.
+    random_state (int): Seed of the kernels. None disables the cache.
+    cache_dir (str): Cache directory, or None to always compute.
+    n_jobs (int): Threads used by the transform.
+    max_cache_gb (float): Size limit of the cache directory, or None for no limit.
+
+    Returns:
+    tuple: (F_train, F_val) float32 feature matrices.
+    """
+    if cache_dir is not None and random_state is not None:
+        key, params = rocket_cache_key(X_train, X_val, rocket_model, num_kernels, random_state)
+        entry_dir = os.path.join(cache_dir, key)
+        train_file = os.path.join(entry_dir, 'train.npy')
+        val_file = os.path.join(entry_dir, 'val.npy')
+        params_file = os.path.join(entry_dir, 'params.json')
+        if os.path.exists(params_file):
+            print(f"Loading cached {rocket_model} features ({key})")
+            try:
+                # The mtime of params.json is the entry's last use, for pruning
+                os.utime(params_file)
+                return np.load(train_file, mmap_mode='r'), np.load(val_file, mmap_mode='r')
+            except FileNotFoundError:
+                # Pruned by another process in the meantime; compute it again
+                pass
+    else:
+        entry_dir = None
+
+    transform = make_rocket_transform(rocket_model, num_kernels, random_state, n_jobs)
+    F_train = np.asarray(transform.fit_transform(_to_panel(X_train)), dtype=np.float32)
+    F_val = np.asarray(transform.transform(_to_panel(X_val)), dtype=np.float32)
+
+    if entry_dir is not None:
+        os.makedirs(entry_dir, exist_ok=True)
+        np.save(train_file, F_train)
+        np.save(val_file, F_val)
+        # params.json is written last and marks the entry as complete
+        with open(params_file, 'w') as f:
+            json.dump(params, f, indent=2)
+        if max_cache_gb is not None:
+            prune_rocket_cache(cache_dir, max_cache_gb, keep=(key,))
+
+    return F_train, F_val
+
+
+def rocket_cache_entries(cache_dir):
+    """
+    Complete entries of a feature cache, least recently used first.
+
+    Entries without params.json are still being written (or were interrupted) and
+    are left out.
+
+    Returns:
+    list: (key, size in bytes, last use as a timestamp) tuples.
+    """
+    entries = []
+    if not os.path.isdir(cache_dir):
+        return entries
+    for key in os.listdir(cache_dir):
+        entry_dir = os.path.join(cache_dir, key)
+        try:
+            last_used = os.path.getmtime(os.path.join(entry_dir, 'params.json'))
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+        except (FileNotFoundError, NotADirectoryError):
+            continue
+        entries.append((key, size, last_used))
+    return sorted(entries, key=lambda entry: entry[2])
+
+
+def prune_rocket_cache(cache_dir, max_cache_gb=MAX_CACHE_GB, keep=()):
+    """
+    Delete the least recently used cache entries until the cache fits in max_cache_gb.
+
+    Parameters:
+    cache_dir (str): Cache directory of rocket_features.
+    max_cache_gb (float): Size limit in GB (0 empties the cache).
+    keep (tuple): Keys never deleted, e.g. the entry just written.
+
+    Returns:
+    list: Keys of the deleted entries.
+    """
+    entries = rocket_cache_entries(cache_dir)
+    total = sum(size for _, size, _ in entries)
+    deleted = []
+    for key, size, _ in entries:
+        if total <= max_cache_gb * 1024 ** 3:
+            break
+        if key in keep:
+            continue
+        # Processes that still have the files memory-mapped keep reading them
+        shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+        total -= size
+        deleted.append(key)
+    return deleted
+
+
+def write_rocket_features(path, X_fit, X, rocket_model='rocket', num_kernels=10000, random_state=42, n_jobs=1,
+                          chunk_size=2000):
+    """
+    Fit a transform on X_fit and write the features of every window in X to a float32 .npy file.
+
+    The windows are transformed `chunk_size` rows at a time straight into a
+    memory-mapped file, so the full feature matrix is never held in memory and
+    worker processes can attach to it with np.load(path, mmap_mode='r').
+
+    Parameters:
+    path (str): Output .npy file.
+    X_fit (np.ndarray): 2D windows the transform is fitted on (MiniROCKET's biases
+                        depend on them; ROCKET only uses their length).
+    X (np.ndarray): 2D windows to transform.
+    rocket_model, num_kernels, random_state, n_jobs: See make_rocket_transform.
+    chunk_size (int): Windows transformed per call.
+
+    Returns:
+    str: The path.
+    """
+    transform = make_rocket_transform(rocket_model, num_kernels, random_state, n_jobs).fit(_to_panel(X_fit))
+    features = None
+    for start in range(0, len(X), chunk_size):
+        chunk = np.asarray(transform.transform(_to_panel(X[start:start + chunk_size])), dtype=np.float32)
+        if features is None:
+            features = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32,
+                                                 shape=(len(X), chunk.shape[1]))
+        features[start:start + len(chunk)] = chunk
+    features.flush()
+    del features
+    return path
+
+
+def fit_predict_ridge(F_train, y_train, F_val, alphas=DEFAULT_ALPHAS):
+    """
+    Fit the RocketRegressor head (StandardScaler(with_mean=False) + RidgeCV) on
+    ROCKET features and predict the validation rows.
+
+    The features may be stored as float32; the head is fitted in float64 like
+    RocketRegressor, since a float32 fit changes the predictions noticeably.
+    """
+    reg = make_pipeline(StandardScaler(with_mean=False), RidgeCV(alphas=alphas))
+    reg.fit(np.asarray(F_train, dtype=np.float64), np.asarray(y_train))
+    return reg.predict(np.asarray(F_val, dtype=np.float64))
+
+
+def ridge_alpha_sweep(F_train, y_train, F_val, y_val, alphas=DEFAULT_ALPHAS):
+    """
+    Validation error of a ridge regression on ROCKET features for each alpha.
+
+    The features are scaled once and reused for every alpha, so the sweep costs a
+    few ridge fits on top of one (possibly cached) transform.
+
+    Parameters:
+    F_train (np.ndarray): Training features from rocket_features.
+    y_train (np.ndarray): Training target minutes.
+    F_val (np.ndarray): Validation features from rocket_features.
+    y_val (np.ndarray): Validation target minutes.
+    alphas (list): Ridge regularisation strengths to try.
+
+    Returns:
+    pd.DataFrame: One row per alpha with columns alpha, mae and rmse.
+    """
+    F_train = np.asarray(F_train, dtype=np.float64)
+    scaler = StandardScaler(with_mean=False).fit(F_train)
+    F_train_scaled = scaler.transform(F_train)
+    F_val_scaled = scaler.transform(np.asarray(F_val, dtype=np.float64))
+    y_train = np.asarray(y_train)
+    y_val = np.asarray(y_val)
+
+    rows = []
+    for alpha in alphas:
+        y_pred = Ridge(alpha=alpha).fit(F_train_scaled, y_train).predict(F_val_scaled)
+        rows.append({
+            'alpha': alpha,
+            'mae': np.mean(np.abs(y_val - y_pred)),
+            'rmse': np.sqrt(np.mean((y_val - y_pred) ** 2)),
+        })
+    return pd.DataFrame(rows)
+
+
+class RocketRidgeModel:
+    """
+    Fitted ROCKET transform plus ridge head, usable like a regressor.
+
+    This is what fit_predict_rocket returns when the features came from the cache:
+    the transform is refitted on the training windows (cheap, no convolutions over
+    the data for Rocket) so new windows can be scored later.
+    """
+
+    def __init__(self, transform, head):
+        self.transform = transform
+        self.head = head
+
+    def predict(self, X):
+        """Predict minutes for 2D lag windows."""
+        return self.head.predict(np.asarray(self.transform.transform(_to_panel(X)), dtype=np.float64))
+
+
+def fit_rocket_ridge_model(X_train, y_train, F_train, rocket_model='rocket', num_kernels=10000,
+                           random_state=42, alphas=DEFAULT_ALPHAS, n_jobs=1):
+    """
+    Build a RocketRidgeModel from (cached) training features.
+
+    The transform is fitted on X_train with the same settings and seed that produced
+    F_train, so it generates the same kernels.
+    """
+    transform = make_rocket_transform(rocket_model, num_kernels, random_state, n_jobs).fit(_to_panel(X_train))
+    head = make_pipeline(StandardScaler(with_mean=False), RidgeCV(alphas=alphas))
+    head.fit(np.asarray(F_train, dtype=np.float64), np.asarray(y_train))
+    return RocketRidgeModel(transform, head)
+
+
+def fit_rocket_model(X_train, y_train, rocket_model='rocket', num_kernels=10000, random_state=42,
+                     alphas=DEFAULT_ALPHAS, n_jobs=1):
+    """Fit transform and ridge head on training windows without the cache; returns a RocketRidgeModel."""
+    transform = make_rocket_transform(rocket_model, num_kernels, random_state, n_jobs)
+    F_train = np.asarray(transform.fit_transform(_to_panel(X_train)), dtype=np.float64)
+    head = make_pipeline(StandardScaler(with_mean=False), RidgeCV(alphas=alphas))
+    head.fit(F_train, np.asarray(y_train))
+    return RocketRidgeModel(transform, head)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List or prune the ROCKET feature cache.")
+    parser.add_argument("--cache_dir", default='../outputs/rocket_experiments/feature_cache',
+                        help="ROCKET feature cache directory")
+    parser.add_argument("--max_gb", type=float, default=None,
+                        help=f"Delete least recently used entries until the cache fits (e.g. {MAX_CACHE_GB}; 0 empties it)")
+    args = parser.parse_args()
+
+    entries = rocket_cache_entries(args.cache_dir)
+    print(f"{len(entries)} entries, {sum(size for _, size, _ in entries) / 1024 ** 3:.2f} GB in {args.cache_dir}")
+    if args.max_gb is not None:
+        deleted = prune_rocket_cache(args.cache_dir, args.max_gb)
+        print(f"Deleted {len(deleted)} entries")
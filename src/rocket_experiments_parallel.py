@@ -1,153 +1,201 @@
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import os
 from datetime import datetime
-from concurrent.futures import ProcessPoolExecutor, as_completed
-import pickle
 np.random.seed(42)
 
 from sktime.regression.kernel_based import RocketRegressor
-from apply_rocket import apply_rocket
+from apply_rocket import fit_predict_rocket
+from dataset_store import build_dataset_store, load_position_arrays, load_position_keys, position_version
+from experiment_scheduler import experiment_grid, run_experiments
+from instrumentation import StageTimer, append_trace_events, export_chrome_trace, stage_report
+from parallel_resources import threads_per_worker
+from prediction_store import write_predictions
 from sklearn.metrics import mean_absolute_error, root_mean_squared_error
 
-def run_single_experiment(model, position, train_dict_path, val_dict_path, results_dir):
-    """Run a single experiment - this function will be executed in parallel"""
+def run_single_experiment(model, position, train_store, val_store, results_dir, cache_dir=None, random_state=42,
+                          window_length=None, n_jobs=1, trace_path=None):
+    """Run a single experiment - this function will be executed in parallel
+
+    window_length uses only the most recent weeks of each lag window (all by default).
+    Predictions go to the prediction store in {results_dir}/predictions, under a
+    model column named after the model and its non-default settings.
+
+    The wall time, CPU time and peak RSS of every stage (load, transform/fit,
+    predict, metrics, save) are added to the result as '<stage>_seconds',
+    '<stage>_cpu_seconds' and '<stage>_peak_rss_mb' columns, and appended to the
+    JSONL trace_path if given.
+    """
     
-    # Load data within each process
-    with open(train_dict_path, 'rb') as f:
-        train_dict = pickle.load(f)
-    with open(val_dict_path, 'rb') as f:
-        val_dict = pickle.load(f)
+    # Model column and run name, with the non-default settings
+    column = model
+    if window_length is not None:
+        column += f'_w{window_length}'
+    if random_state != 42:
+        column += f'_seed{random_state}'
+    run_name = f'{column}_{position}'
+    timer = StageTimer(run_name)
     
     try:
-        print(f"Starting {model}-{position}...")
+        print(f"Starting {run_name}...")
+        
+        # Attach to the memory-mapped arrays for this position only
+        with timer.stage('load'):
+            X_train, y_train = load_position_arrays(train_store, position)
+            X_val, y_val = load_position_arrays(val_store, position)
+            if window_length is not None:
+                X_train = X_train[:, -window_length:]
+                X_val = X_val[:, -window_length:]
         
         # Run the experiment
-        y_pred, y_val = apply_rocket(train_dict, val_dict, 
-                                   position=position, 
-                                   rocket_model=model)
+        y_pred = fit_predict_rocket(X_train, y_train, X_val, rocket_model=model,
+                                    cache_dir=cache_dir, random_state=random_state, n_jobs=n_jobs, timer=timer)
         
-        mae = mean_absolute_error(y_val, y_pred)
-        rmse = root_mean_squared_error(y_val, y_pred)
+        with timer.stage('metrics'):
+            y_val = np.asarray(y_val)
+            mae = mean_absolute_error(y_val, y_pred)
+            rmse = root_mean_squared_error(y_val, y_pred)
         
-        # Save detailed predictions
-        pred_file = f'{results_dir}/predictions_{model}_{position}.pkl'
-        with open(pred_file, 'wb') as f:
-            pickle.dump({
-                'predictions': y_pred, 
-                'actual': y_val,
-                'model': model,
-                'position': position,
-                'timestamp': datetime.now().isoformat()
-            }, f)
+        # Save detailed predictions with the player ids and dates of the validation rows
+        with timer.stage('save'):
+            write_predictions(f'{results_dir}/predictions', position, column, y_pred, y_val,
+                              keys=load_position_keys(val_store, position),
+                              metadata={'model': model, 'window_length': window_length,
+                                        'random_state': random_state, 'mae': mae, 'rmse': rmse})
         
         result = {
             'model': model,
             'position': position,
+            'window_length': window_length,
+            'random_state': random_state,
             'mae': mae,
             'rmse': rmse,
             'n_samples': len(y_val),
             'timestamp': datetime.now().isoformat(),
-            'status': 'completed'
+            'status': 'completed',
+            **timer.summary()
         }
         
-        print(f"Completed {model}-{position}: RMSE={rmse:.3f}, MAE={mae:.3f}")
+        print(f"Completed {run_name}: RMSE={rmse:.3f}, MAE={mae:.3f} ({result['total_seconds']:.1f}s)")
         return result
         
     except Exception as e:
-        print(f"Error in {model}-{position}: {e}")
-        return {
+        print(f"Error in {run_name}: {e}")
+        result = {
             'model': model,
             'position': position,
+            'window_length': window_length,
+            'random_state': random_state,
             'mae': None,
             'rmse': None,
             'n_samples': None,
             'timestamp': datetime.now().isoformat(),
             'status': 'error',
-            'error_message': str(e)
+            'error_message': str(e),
+            **timer.summary()
         }
-
-def run_rocket_experiments_parallel(max_workers=4):
-    """Run experiments in parallel"""
+        return result
     
-    positions = ['GK','FWD']
-    rocket_models = ['rocket']
+    finally:
+        if trace_path is not None:
+            append_trace_events(trace_path, timer.trace_events())
+
+def run_rocket_experiments_parallel(max_workers=4, use_feature_cache=True, rocket_models=('rocket',),
+                                    positions=('GK', 'FWD'), window_lengths=(None,), random_states=(42,),
+                                    retry_errors=False, n_threads=None):
+    """Run experiments in parallel
+
+    Every (model, position, window length, seed) combination is fingerprinted,
+    together with the content version of that position's training and validation
+    data, and tracked
+    in {results_dir}/rocket_jobs.jsonl, so finished experiments are skipped, an
+    interrupted sweep resumes where it stopped and rebuilt datasets run again.
+    Each finished job appends one row to rocket_results_summary.csv instead of
+    rewriting it.
+
+    With use_feature_cache, ROCKET features are stored under {results_dir}/feature_cache
+    and reruns on unchanged data skip the convolution stage.
+
+    n_threads caps the BLAS/OpenMP/numba threads of each worker (and the ROCKET
+    transform's n_jobs); by default the cores are split evenly between the workers
+    so that max_workers x n_threads does not oversubscribe the machine.
+
+    The stage timings of every job are appended to {results_dir}/rocket_trace.jsonl
+    and exported as rocket_trace.json, which opens in chrome://tracing or Perfetto.
+    """
     
     # Create results directory
     results_dir = '../outputs/rocket_experiments'
     os.makedirs(results_dir, exist_ok=True)
+    cache_dir = f'{results_dir}/feature_cache' if use_feature_cache else None
     
     # File paths for data
     train_dict_path = '../datasets/training_dictionary.pkl'
     val_dict_path = '../datasets/validation_dictionary.pkl'
     
-    # Initialize or load existing results DataFrame
+    # Convert the pickles to memory-mapped arrays once; workers attach to these
+    train_store = build_dataset_store(train_dict_path, positions=list(positions))
+    val_store = build_dataset_store(val_dict_path, positions=list(positions))
+    
     results_file = f'{results_dir}/rocket_results_summary.csv'
-    if os.path.exists(results_file):
-        results_df = pd.read_csv(results_file)
-        print(f"Loaded existing results with {len(results_df)} entries")
-    else:
-        results_df = pd.DataFrame()
-        print("Starting fresh experiments")
-    
-    # Create list of experiments to run
-    experiments_to_run = []
-    for model in rocket_models:
-        for position in positions:
- 
-            experiments_to_run.append((model, position))
-    
-    print(f"\nRunning {len(experiments_to_run)} experiments in parallel with {max_workers} workers...")
-    print("Experiments to run:", [f"{m}-{p}" for m, p in experiments_to_run])
-    
-    # Run experiments in parallel
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all jobs
-        future_to_experiment = {
-            executor.submit(run_single_experiment, model, position, 
-                          train_dict_path, val_dict_path, results_dir): (model, position)
-            for model, position in experiments_to_run
-        }
-        
-        # Process completed jobs as they finish
-        for future in as_completed(future_to_experiment):
-            model, position = future_to_experiment[future]
-            
-            try:
-                result = future.result()
-                
-                # Add result to DataFrame
-                new_result = pd.DataFrame([result])
-                results_df = pd.concat([results_df, new_result], ignore_index=True)
-                
-                # Save incrementally
-                results_df.to_csv(results_file, index=False)
-                results_df.to_pickle(f'{results_dir}/rocket_results_summary.pkl')
-                
-                print(f"✓ Saved results for {model}-{position}")
-                
-            except Exception as e:
-                print(f"✗ Failed to process {model}-{position}: {e}")
+    log_path = f'{results_dir}/rocket_jobs.jsonl'
+    trace_path = f'{results_dir}/rocket_trace.jsonl'
+    
+    # Create list of experiments; the scheduler skips the ones already done
+    experiments = experiment_grid(model=list(rocket_models), position=list(positions),
+                                  window_length=list(window_lengths), random_state=list(random_states))
+    
+    if n_threads is None:
+        n_threads = threads_per_worker(max_workers)
+    
+    # Only a change in a position's own data reruns its experiments
+    data_versions = {position: f'{position_version(train_store, position)}-{position_version(val_store, position)}'
+                     for position in positions}
+    
+    print(f"\nScheduling {len(experiments)} experiments with {max_workers} workers...")
+    run_experiments(experiments, run_single_experiment, log_path, results_file, max_workers=max_workers,
+                    retry_errors=retry_errors, n_threads=n_threads,
+                    data_version=lambda config: data_versions[config['position']],
+                    train_store=train_store, val_store=val_store,
+                    results_dir=results_dir, cache_dir=cache_dir, n_jobs=n_threads, trace_path=trace_path)
+    
+    # Per-stage totals of every job so far, and a trace for chrome://tracing or Perfetto
+    for stage in stage_report(trace_path):
+        print(f"  {stage['stage']:10s} {stage['wall_seconds']:8.1f}s wall {stage['cpu_seconds']:8.1f}s CPU "
+              f"({stage['share']:.0%})")
+    n_events = export_chrome_trace(trace_path, f'{results_dir}/rocket_trace.json')
+    print(f"Saved {n_events} trace events to {results_dir}/rocket_trace.json")
+    
+    # Read the summary once at the end instead of rewriting it after every job
+    results_df = pd.read_csv(results_file) if os.path.exists(results_file) else pd.DataFrame()
+    results_df.to_pickle(f'{results_dir}/rocket_results_summary.pkl')
     
     return results_df
 
-# Run parallel experiments
-results_df = run_rocket_experiments_parallel(max_workers=4)  # Adjust based on your CPU cores
+if __name__ == "__main__":
+    # Run parallel experiments
+    parser = argparse.ArgumentParser(description="Run the ROCKET experiments in parallel.")
+    parser.add_argument("--workers", "-w", type=int, default=4, help="Number of worker processes")
+    parser.add_argument("--threads", type=int, default=None, help="Threads per worker (default: cores // workers)")
+    args = parser.parse_args()
+    
+    results_df = run_rocket_experiments_parallel(max_workers=args.workers, n_threads=args.threads)
 
-# Display final summary
-print("\n" + "="*50)
-print("FINAL RESULTS SUMMARY")
-print("="*50)
+    # Display final summary
+    print("\n" + "="*50)
+    print("FINAL RESULTS SUMMARY")
+    print("="*50)
 
-completed_results = results_df[results_df['status'] == 'completed']
-if len(completed_results) > 0:
-    print("\nRMSE by Position and Model:")
-    rmse_pivot = completed_results.pivot(index='position', columns='model', values='rmse')
-    print(rmse_pivot.round(3))
-    
-    print("\nMAE by Position and Model:")
-    mae_pivot = completed_results.pivot(index='position', columns='model', values='mae')
-    print(mae_pivot.round(3))
-else:
-    print("No completed results found")
\ No newline at end of file
+    completed_results = results_df[results_df['status'] == 'completed'] if 'status' in results_df else results_df
+    if len(completed_results) > 0:
+        print("\nRMSE by Position and Model:")
+        rmse_pivot = completed_results.pivot_table(index='position', columns='model', values='rmse')
+        print(rmse_pivot.round(3))
+    
+        print("\nMAE by Position and Model:")
+        mae_pivot = completed_results.pivot_table(index='position', columns='model', values='mae')
+        print(mae_pivot.round(3))
+    else:
+        print("No completed results found")
\ No newline at end of file
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+
+def feature_name(column, window, stat):
+    """Name of a lagged rolling feature, e.g. 'minutes_last_5_mean'."""
+    return f'{column}_last_{window}_{stat}'
+
+
+def group_row_starts(group_codes):
+    """
+    For a frame sorted by group, return the index of each row's first group row.
+
+    Parameters:
+    group_codes (np.ndarray): Integer group code per row, contiguous per group.
+
+    Returns:
+    np.ndarray: Start index of the group each row belongs to.
+    """
+    n = len(group_codes)
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = group_codes[1:] != group_codes[:-1]
+    start_positions = np.flatnonzero(is_start)
+    return start_positions[np.cumsum(is_start) - 1]
+
+
+def lag_window_matrix(values, row_starts, window):
+    """
+    Gather the previous `window` values of each row within its group.
+
+    Row i of the result holds values[i - window], ..., values[i - 1] (oldest first),
+    with NaN where the window reaches back past the start of the group.
+
+    Parameters:
+    values (np.ndarray): 1D array sorted by group and time.
+    row_starts (np.ndarray): Output of group_row_starts.
+    window (int): Number of previous values to gather.
+
+    Returns:
+    np.ndarray: 2D float array of shape (len(values), window).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    rows = np.arange(len(values))
+    idx = rows[:, None] - window + np.arange(window)[None, :]
+    valid = idx >= row_starts[:, None]
+    out = values[np.where(valid, idx, 0)]
+    out[~valid] = np.nan
+    return out
+
+
+def _window_sums(values, row_starts, window):
+    """Sum and count of the non-NaN values in each row's lagged window via prefix sums."""
+    rows = np.arange(len(values))
+    isnan = np.isnan(values)
+    csum = np.concatenate([[0.0], np.cumsum(np.where(isnan, 0.0, values))])
+    ccount = np.concatenate([[0], np.cumsum(~isnan)])
+    lo = np.maximum(row_starts, rows - window)
+    return csum[rows] - csum[lo], ccount[rows] - ccount[lo]
+
+
+def _window_medians(matrix, counts):
+    """Row medians ignoring NaN; sorting pushes NaN to the end of each row."""
+    ordered = np.sort(matrix, axis=1)
+    rows = np.arange(len(ordered))
+    lo = np.maximum((counts - 1) // 2, 0)
+    hi = np.maximum(counts // 2, 0)
+    medians = (ordered[rows, lo] + ordered[rows, hi]) / 2
+    medians[counts == 0] = np.nan
+    return medians
+
+
+def _window_std(matrix, means, counts):
+    """Row sample standard deviations (ddof=1) ignoring NaN."""
+    squares = np.nansum((matrix - means[:, None]) ** 2, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 1, np.sqrt(squares / (counts - 1)), np.nan)
+
+
+def window_matrix_stat(matrix, stat):
+    """
+    Reduce each row of a lag-window matrix (see lag_window_matrix) to one statistic.
+
+    NaN entries are ignored and rows without any values give NaN, like
+    `rolling(window, min_periods=1)`.
+
+    Parameters:
+    matrix (np.ndarray): 2D array of previous values, one row per sample.
+    stat (str): One of 'mean', 'median', 'std', 'sum'.
+
+    Returns:
+    np.ndarray: 1D array with the statistic per row.
+    """
+    counts = np.sum(~np.isnan(matrix), axis=1)
+    sums = np.nansum(matrix, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan)
+
+    if stat == 'mean':
+        return means
+    if stat == 'sum':
+        return np.where(counts > 0, sums, np.nan)
+    if stat == 'median':
+        return _window_medians(matrix, counts)
+    if stat == 'std':
+        return _window_std(matrix, means, counts)
+    raise ValueError(f"Unknown statistic: {stat}")
+
+
+def rolling_features(df, columns=('minutes',), windows=(3, 5, 10, 'season'),
+                     stats=('mean', 'median', 'std', 'sum'), group_col='player',
+                     order_cols=('week',), season_col='season'):
+    """
+    Compute lagged rolling features for many columns and window sizes in one pass.
+
+    Every feature only uses a player's previous rows (the current row is excluded),
+    matching `x.shift(1).rolling(window, min_periods=1)` within each player. The
+    frame is sorted once and group boundaries are computed once; each feature is
+    then a vectorized NumPy operation instead of a per-player Python lambda.
+
+    Parameters:
+    df (pd.DataFrame): Per-player, per-week data.
+    columns (list): Columns to compute features for, e.g. ['minutes', 'xG'].
+    windows (list): Window sizes in weeks. 'season' means season-to-date.
+    stats (list): Any of 'mean', 'median', 'std', 'sum'.
+    group_col (str): Column identifying the player.
+    order_cols (list): Columns giving the time order within a player.
+    season_col (str): Column identifying the season, used by the 'season' window.
+
+    Returns:
+    pd.DataFrame: The sorted frame with one '{column}_last_{window}_{stat}' column per feature.
+    """
+    group_cols = [group_col]
+    if 'season' in windows and season_col in order_cols:
+        order_cols = [col for col in order_cols if col != season_col]
+    if 'season' in windows:
+        group_cols.append(season_col)
+
+    df = df.sort_values(group_cols + list(order_cols), kind='mergesort')
+
+    player_starts = group_row_starts(pd.factorize(df[group_col])[0])
+    if 'season' in windows:
+        season_codes = pd.MultiIndex.from_frame(df[group_cols]).factorize()[0]
+        season_starts = group_row_starts(season_codes)
+
+    new_columns = {}
+    for column in columns:
+        values = df[column].to_numpy(dtype=np.float64)
+
+        for window in windows:
+            if window == 'season':
+                row_starts = season_starts
+                size = int(np.max(np.arange(len(values)) - row_starts, initial=0))
+            else:
+                row_starts = player_starts
+                size = window
+
+            sums, counts = _window_sums(values, row_starts, size)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = np.where(counts > 0, sums / counts, np.nan)
+
+            if 'median' in stats or 'std' in stats:
+                matrix = lag_window_matrix(values, row_starts, size)
+
+            for stat in stats:
+                if stat == 'mean':
+                    result = means
+                elif stat == 'sum':
+                    result = np.where(counts > 0, sums, np.nan)
+                elif stat == 'median':
+                    result = _window_medians(matrix, counts)
+                elif stat == 'std':
+                    result = _window_std(matrix, means, counts)
+                else:
+                    raise ValueError(f"Unknown statistic: {stat}")
+
+                new_columns[feature_name(column, window, stat)] = result
+
+    return df.assign(**new_columns)
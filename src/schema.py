@@ -0,0 +1,186 @@
+import argparse
+import glob
+import os
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Resolved from this file, so the dashboard finds it when run from the repo root too
+DEFAULT_SOURCE_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                                                   'data_from_airsenal'))
+
+# Column kinds of the player-minutes style frames. Lag and target columns share
+# their source column's kind: 'minutes_3' and 'out_minutes' are both 'count'.
+#   team:     categorical with the shared dictionary of all team codes (team_categories)
+#   category: categorical; frames compacted together share one dictionary
+#   count:    smallest signed integer type of at least 16 bits that holds the values
+#             (float32 if there are NaNs); int8/uint8 would wrap in ordinary
+#             arithmetic such as minutes * 2 or minutes - 90
+#   float:    float32
+#   flag:     bool
+COLUMN_KINDS = {
+    'team': 'team', 'opponent': 'team', 'player_team': 'team', 'home_team': 'team', 'away_team': 'team',
+    'player': 'category', 'player_name': 'category', 'name': 'category', 'position': 'category',
+    'reason': 'category', 'home_or_away': 'category',
+    # Seasons stay numeric (e.g. 2425) so comparisons and filters on them keep working
+    'season': 'count',
+    'player_id': 'count', 'match_id': 'count', 'fixture_id': 'count', 'result_id': 'count',
+    'week': 'count', 'gameweek': 'count', 'minutes': 'count', 'goals': 'count', 'assists': 'count',
+    'goals_conceded': 'count', 'team_goals': 'count', 'bps': 'count', 'bonus': 'count', 'points': 'count',
+    'xG': 'float', 'xA': 'float', 'xGC': 'float',
+    'expected_goals': 'float', 'expected_assists': 'float', 'expected_goals_conceded': 'float',
+    'injured_or_suspended': 'flag',
+}
+
+_INT_TYPES = [np.int16, np.int32, np.int64]
+
+
+def column_kind(column):
+    """Kind of a column, looking through the 'out_' prefix and '_<lag>' suffix of window columns."""
+    name = column[4:] if column.startswith('out_') else column
+    if name not in COLUMN_KINDS:
+        name = re.sub(r'_\d+$', '', name)
+    return COLUMN_KINDS.get(name)
+
+
+@lru_cache(maxsize=None)
+def team_categories(source_dir=DEFAULT_SOURCE_DIR):
+    """
+    Shared dictionary of every team code in the teams_<season>.csv files.
+
+    Returns:
+    pd.CategoricalDtype: Sorted team codes, so codes mean the same team in every frame.
+    """
+    paths = glob.glob(os.path.join(source_dir, 'teams_*.csv'))
+    teams = sorted(set().union(*(pd.read_csv(path)['name'] for path in paths))) if paths else []
+    return pd.CategoricalDtype(teams)
+
+
+def smallest_int_dtype(values):
+    """Smallest integer dtype of _INT_TYPES holding every value, or None if the values are not all integers."""
+    values = np.asarray(values)
+    if values.size == 0:
+        return np.dtype(_INT_TYPES[0])
+    if values.dtype.kind == 'f' and (np.isnan(values).any() or not np.all(values == np.round(values))):
+        return None
+    low, high = values.min(), values.max()
+    for dtype in _INT_TYPES:
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def shared_categories(frames, column):
+    """Union of a column's values over several frames, as one categorical dtype."""
+    values = set()
+    for df in frames:
+        if column in df.columns:
+            values.update(df[column].dropna().astype(str).unique())
+    return pd.CategoricalDtype(sorted(values))
+
+
+def compact_frame(df, categories=None, source_dir=DEFAULT_SOURCE_DIR):
+    """
+    Convert a frame's columns to compact dtypes according to COLUMN_KINDS.
+
+    Team columns use the shared team dictionary; other categorical columns use the
+    dtype given in `categories` (see compact_frames) or their own values. Counts
+    are downcast to the smallest signed integer type of at least 16 bits that
+    holds them, so nothing is clipped and arithmetic on them doesn't wrap; columns with missing or fractional values become float32. Columns
+    of unknown kind are left as they are.
+
+    Parameters:
+    df (pd.DataFrame): Frame to convert (not modified).
+    categories (dict): Optional column -> pd.CategoricalDtype to share between frames.
+    source_dir (str): Directory of the teams_<season>.csv files.
+
+    Returns:
+    pd.DataFrame: The converted copy.
+    """
+    categories = categories or {}
+    converted = {}
+    for col in df.columns:
+        kind = column_kind(col)
+        values = df[col]
+        if kind == 'team':
+            teams = team_categories(source_dir)
+            unknown = set(values.dropna().astype(str).unique()) - set(teams.categories)
+            dtype = pd.CategoricalDtype(list(teams.categories) + sorted(unknown)) if unknown else teams
+            converted[col] = values.astype(str).where(values.notna()).astype(dtype)
+        elif kind == 'category':
+            dtype = categories.get(col, 'category')
+            converted[col] = values.astype(str).where(values.notna()).astype(dtype)
+        elif kind == 'count' and pd.api.types.is_numeric_dtype(values):
+            dtype = smallest_int_dtype(values.to_numpy(dtype=np.float64))
+            converted[col] = values.astype(dtype if dtype is not None else np.float32)
+        elif kind == 'float' and pd.api.types.is_numeric_dtype(values):
+            converted[col] = values.astype(np.float32)
+        elif kind == 'flag' and values.notna().all():
+            converted[col] = values.astype(bool)
+    return df.assign(**converted)
+
+
+def compact_frames(frames, source_dir=DEFAULT_SOURCE_DIR):
+    """
+    Compact several frames (e.g. seasons or positions) with shared category dictionaries,
+    so they can be concatenated without falling back to strings.
+
+    Parameters:
+    frames (dict or list): Frames to convert.
+
+    Returns:
+    dict or list: The converted frames, in the same container type.
+    """
+    items = list(frames.values()) if isinstance(frames, dict) else list(frames)
+    columns = {col for df in items for col in df.columns if column_kind(col) == 'category'}
+    categories = {col: shared_categories(items, col) for col in columns}
+    converted = [compact_frame(df, categories, source_dir) for df in items]
+    return dict(zip(frames, converted)) if isinstance(frames, dict) else converted
+
+
+def memory_report(before, after):
+    """
+    Memory per column of a frame before and after compact_frame.
+
+    Returns:
+    pd.DataFrame: dtype and MB before/after per column, plus a 'total' row.
+    """
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'mb_before': before.memory_usage(deep=True, index=False) / 1e6,
+        'dtype_after': after.dtypes.astype(str),
+        'mb_after': after.memory_usage(deep=True, index=False) / 1e6,
+    })
+    report.loc['total'] = ['', report['mb_before'].sum(), '', report['mb_after'].sum()]
+    report['ratio'] = report['mb_before'] / report['mb_after']
+    return report.round(3)
+
+
+def read_player_minutes(path, source_dir=DEFAULT_SOURCE_DIR):
+    """Read a player_minutes_with_extra_columns_<season>.csv file with compact dtypes."""
+    df = pd.read_csv(path)
+    df = df.loc[:, ~df.columns.str.startswith('Unnamed:')]
+    return compact_frame(df, source_dir=source_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report the memory saved by the compact dtype schema.")
+    parser.add_argument("--source_dir", default=DEFAULT_SOURCE_DIR, help="Directory of the raw season files")
+    args = parser.parse_args()
+
+    # All-seasons player history: every position's player_history file plus the 2425 minutes
+    history = {}
+    for path in sorted(glob.glob(os.path.join(args.source_dir, 'player_history_*.csv'))):
+        position = os.path.basename(path)[len('player_history_'):-len('.csv')]
+        history[position] = pd.read_csv(path).assign(position=position)
+    datasets = {'player_history (all positions)': pd.concat(history.values(), ignore_index=True)}
+    for path in sorted(glob.glob(os.path.join(args.source_dir, 'player_minutes_with_extra_columns_*.csv'))):
+        df = pd.read_csv(path)
+        datasets[os.path.basename(path)] = df.loc[:, ~df.columns.str.startswith('Unnamed:')]
+
+    for name, df in datasets.items():
+        print(f"\n{name}: {len(df)} rows")
+        print(memory_report(df, compact_frame(df, source_dir=args.source_dir)).to_string())
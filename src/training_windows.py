@@ -0,0 +1,266 @@
+import argparse
+import json
+import os
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from dataset_store import write_position_arrays
+from rolling_features import group_row_starts
+from schema import compact_frame, compact_frames
+
+# Feature family -> source columns. A family contributes the columns the history
+# actually has, e.g. the airsenal scores use 'expected_goals' where the 2425
+# scrape uses 'xG'.
+FEATURE_FAMILIES = {
+    'minutes': ['minutes'],
+    'points': ['points'],
+    'bonus': ['bonus', 'bps'],
+    'xg': ['xG', 'xA', 'xGC', 'expected_goals', 'expected_assists', 'expected_goals_conceded'],
+}
+
+
+def resolve_feature_columns(history, features=('minutes',)):
+    """
+    Expand feature families into the history's columns.
+
+    Parameters:
+    history (pd.DataFrame): Per-player history.
+    features (list): Keys of FEATURE_FAMILIES or plain column names.
+
+    Returns:
+    list: Column names, 'minutes' first.
+    """
+    columns = []
+    for feature in features:
+        if feature in FEATURE_FAMILIES:
+            found = [col for col in FEATURE_FAMILIES[feature] if col in history.columns]
+            if not found:
+                raise ValueError(f"None of the {feature} columns {FEATURE_FAMILIES[feature]} are in the history")
+        elif feature in history.columns:
+            found = [feature]
+        else:
+            raise ValueError(f"Unknown feature {feature}, must be a column or one of {list(FEATURE_FAMILIES)}")
+        columns += [col for col in found if col not in columns]
+
+    if 'minutes' in columns:
+        columns.remove('minutes')
+    return ['minutes'] + columns
+
+
+def window_targets(group_codes, window_length):
+    """
+    Rows that can be a target: rows preceded by at least `window_length` rows of the same group.
+
+    Parameters:
+    group_codes (np.ndarray): Integer group code per row, contiguous per group.
+    window_length (int): Number of previous rows per window.
+
+    Returns:
+    np.ndarray: Sorted row indices of the targets.
+    """
+    rows = np.arange(len(group_codes))
+    return np.flatnonzero(rows - group_row_starts(group_codes) >= window_length)
+
+
+def lag_windows(values, targets, window_length):
+    """
+    The `window_length` values before each target row, oldest first.
+
+    sliding_window_view gives a strided (copy-free) view whose row j holds
+    values[j:j + window_length]; the window of target i is row i - window_length.
+
+    Parameters:
+    values (np.ndarray): 1D array sorted by group and time.
+    targets (np.ndarray): Output of window_targets.
+    window_length (int): Number of previous values per window.
+
+    Returns:
+    np.ndarray: 2D array of shape (len(targets), window_length).
+    """
+    view = sliding_window_view(np.asarray(values, dtype=np.float64), window_length)
+    return view[targets - window_length]
+
+
+def build_position_windows(history, window_length=5, features=('minutes',), player_col='player_id',
+                           order_cols=('season', 'datetime'), season_col='season', within_season=True):
+    """
+    Lag-window frame of one position in the training_dictionary layout.
+
+    Every row of a player with `window_length` earlier rows (of the same season if
+    within_season) becomes a sample: '<column>_0' ... '<column>_<k-1>' hold the
+    previous rows' values (oldest first) for every feature column, and 'out_<column>'
+    holds every column of the target row itself (out_minutes is the target).
+
+    Parameters:
+    history (pd.DataFrame): One row per player per fixture, all of one position.
+    window_length (int): Number of previous matches per window.
+    features (list): Keys of FEATURE_FAMILIES or column names.
+    player_col (str): Column identifying the player.
+    order_cols (list): Columns giving the time order within a player.
+    season_col (str): Column identifying the season.
+    within_season (bool): Only use windows that do not cross a season boundary.
+
+    Returns:
+    pd.DataFrame: One row per sample.
+    """
+    columns = resolve_feature_columns(history, features)
+    history = history.sort_values([player_col] + list(order_cols), kind='mergesort')
+
+    group_cols = [player_col, season_col] if within_season and season_col in history.columns else [player_col]
+    group_codes = pd.MultiIndex.from_frame(history[group_cols]).factorize()[0]
+    targets = window_targets(group_codes, window_length)
+
+    frame = {}
+    for col in columns:
+        windows = lag_windows(history[col].to_numpy(dtype=np.float64), targets, window_length)
+        for i in range(window_length):
+            frame[f'{col}_{i}'] = windows[:, i]
+
+    target_rows = history.iloc[targets]
+    for col in history.columns:
+        frame[f'out_{col}'] = target_rows[col].to_numpy()
+    return pd.DataFrame(frame)
+
+
+def split_by_player(df, val_fraction=0.2, seed=0, player_col='out_player_id'):
+    """
+    Split samples into training and validation sets with every player on one side.
+
+    Returns:
+    tuple: (train_df, val_df)
+    """
+    players = df[player_col].unique()
+    rng = np.random.default_rng(seed)
+    val_players = rng.choice(players, size=int(round(len(players) * val_fraction)), replace=False)
+    is_val = df[player_col].isin(val_players).to_numpy()
+    return df[~is_val].reset_index(drop=True), df[is_val].reset_index(drop=True)
+
+
+def build_training_dictionaries(history, window_length=5, features=('minutes',), position_col='position',
+                                player_col='player_id', order_cols=('season', 'datetime'), season_col='season',
+                                within_season=True, val_fraction=0.2, val_seasons=None, seed=0, compact=True):
+    """
+    Training and validation dictionaries ({position: frame}) from a per-player history.
+
+    Samples are split by player (val_fraction of the players go to validation)
+    or, if val_seasons is given, by the season of the target row. With compact,
+    the frames use the dtypes of schema.compact_frames (small integer windows,
+    categorical names and teams shared by all positions and both dictionaries).
+
+    Parameters:
+    history (pd.DataFrame): One row per player per fixture with a position column.
+    window_length (int): Number of previous matches per window.
+    features (list): Keys of FEATURE_FAMILIES or column names.
+    position_col (str): Column with the player's position.
+    player_col, order_cols, season_col, within_season: See build_position_windows.
+    val_fraction (float): Fraction of players in the validation set.
+    val_seasons (list): Seasons whose targets form the validation set.
+    seed (int): Seed of the player split.
+    compact (bool): Convert the frames to compact dtypes.
+
+    Returns:
+    tuple: (train_dict, val_dict)
+    """
+    train_dict, val_dict = {}, {}
+    for position, position_history in history.groupby(position_col, sort=True):
+        df = build_position_windows(position_history, window_length, features, player_col, order_cols,
+                                    season_col, within_season)
+        if val_seasons is not None:
+            is_val = df[f'out_{season_col}'].astype(str).isin([str(s) for s in val_seasons]).to_numpy()
+            train_dict[position] = df[~is_val].reset_index(drop=True)
+            val_dict[position] = df[is_val].reset_index(drop=True)
+        else:
+            train_dict[position], val_dict[position] = split_by_player(df, val_fraction, seed, f'out_{player_col}')
+
+    if compact:
+        frames = compact_frames({**{('train', p): df for p, df in train_dict.items()},
+                                 **{('val', p): df for p, df in val_dict.items()}})
+        train_dict = {p: frames[('train', p)] for p in train_dict}
+        val_dict = {p: frames[('val', p)] for p in val_dict}
+    return train_dict, val_dict
+
+
+def write_window_store(data_dict, store_dir, window_length, features=('minutes',)):
+    """
+    Write a dictionary's windows as a memory-mappable store (see dataset_store).
+
+    The minutes windows and out_minutes are the store's X and y, so
+    load_position_arrays works unchanged; every other feature column's windows
+    are saved as '<position>_<column>.npy', and out_player_id/out_datetime as keys.
+
+    Parameters:
+    data_dict (dict): {position: frame} from build_training_dictionaries.
+    store_dir (str): Output directory.
+    window_length (int): Window length the frames were built with.
+    features (list): Feature columns of the frames.
+
+    Returns:
+    str: The store directory.
+    """
+    meta = {'source': 'training_windows', 'positions': [], 'columns': {}, 'features': list(features)}
+    for position, df in data_dict.items():
+        minutes_columns = [f'minutes_{i}' for i in range(window_length)]
+        keys = {col: df[[f'{col}_{i}' for i in range(window_length)]].to_numpy(dtype=np.float64)
+                for col in features if col != 'minutes'}
+        if 'out_player_id' in df.columns:
+            keys['out_player_id'] = df['out_player_id'].to_numpy()
+        if 'out_datetime' in df.columns:
+            keys['out_datetime'] = pd.to_datetime(df['out_datetime']).to_numpy()
+        write_position_arrays(store_dir, position, df[minutes_columns].to_numpy(), df['out_minutes'].to_numpy(), keys)
+        meta['positions'].append(position)
+        meta['columns'][position] = minutes_columns
+
+    with open(os.path.join(store_dir, 'store.json'), 'w') as f:
+        json.dump(meta, f, indent=2)
+    return store_dir
+
+
+def _read_history(path):
+    """Per-player history from a CSV or Parquet file, with compact dtypes."""
+    if path.endswith('.parquet'):
+        return compact_frame(pd.read_parquet(path))
+    return compact_frame(pd.read_csv(path))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the training/validation lag-window dictionaries.")
+    parser.add_argument("--input", "-i", required=True, help="CSV or Parquet history, one row per player per fixture")
+    parser.add_argument("--window_length", "-k", type=int, nargs="+", default=[5],
+                        help="Window lengths; one pair of dictionaries is written per length")
+    parser.add_argument("--features", "-f", nargs="+", default=['minutes'],
+                        help=f"Feature families ({', '.join(FEATURE_FAMILIES)}) or columns")
+    parser.add_argument("--order_cols", nargs="+", default=['season', 'datetime'], help="Time order within a player")
+    parser.add_argument("--across_seasons", action="store_true", help="Allow windows that cross seasons")
+    parser.add_argument("--val_fraction", type=float, default=0.2, help="Fraction of players used for validation")
+    parser.add_argument("--val_seasons", nargs="+", default=None, help="Validate on these seasons instead")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the player split")
+    parser.add_argument("--format", choices=['pickle', 'store', 'both'], default='both',
+                        help="Write pickled dictionaries, memory-mappable stores, or both")
+    parser.add_argument("--output_dir", "-o", default='../datasets', help="Output directory")
+    args = parser.parse_args()
+
+    history = _read_history(args.input)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    for window_length in args.window_length:
+        start = time.perf_counter()
+        train_dict, val_dict = build_training_dictionaries(
+            history, window_length, args.features, order_cols=args.order_cols,
+            within_season=not args.across_seasons, val_fraction=args.val_fraction,
+            val_seasons=args.val_seasons, seed=args.seed)
+        features = resolve_feature_columns(history, args.features)
+        print(f"{window_length}-week windows built in {time.perf_counter() - start:.2f}s: "
+              + ", ".join(f"{p} {len(train_dict[p])}/{len(val_dict[p])}" for p in train_dict))
+
+        for name, data_dict in [('training', train_dict), ('validation', val_dict)]:
+            base = os.path.join(args.output_dir, f'{name}_dictionary_{window_length}_weeks')
+            if args.format in ('pickle', 'both'):
+                with open(f'{base}.pkl', 'wb') as f:
+                    pickle.dump(data_dict, f)
+            if args.format in ('store', 'both'):
+                write_window_store(data_dict, base, window_length, features)
+            print(f"  Saved {base}")
@@ -1,14 +1,17 @@
 import pandas as pd
 
+from rolling_features import feature_name, rolling_features
+
 def last_weeks_avg(df, weeks=5):
 
-    # Sort by player and week to ensure correct rolling calculation
-    df = df.sort_values(['player', 'week', 'date'])
+    # Sort by player and week, then compute the lagged rolling mean/median in one vectorized pass
+    df = rolling_features(df, columns=['minutes'], windows=[weeks], stats=['mean', 'median'],
+                          group_col='player', order_cols=['week', 'date'])
 
-    df[f'avg_weeks_last_{weeks}_mean'] = df.groupby('player')['minutes'].transform(
-        lambda x: x.shift(1).rolling(window=weeks, min_periods=1).mean())
-    df[f'avg_weeks_last_{weeks}_median'] = df.groupby('player')['minutes'].transform(
-        lambda x: x.shift(1).rolling(window=weeks, min_periods=1).median())
+    df = df.rename(columns={
+        feature_name('minutes', weeks, 'mean'): f'avg_weeks_last_{weeks}_mean',
+        feature_name('minutes', weeks, 'median'): f'avg_weeks_last_{weeks}_median',
+    })
     
     return df
 